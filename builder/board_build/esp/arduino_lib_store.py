@@ -0,0 +1,206 @@
+# Copyright 2014-present PlatformIO <contact@platformio.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local store of compiled Arduino IDF library sets.
+
+With `custom_sdkconfig`, espidf.py compiles the IDF libraries and copies
+them over the Arduino libs package (`idf_lib_copy`). The Arduino build
+script reads its libraries from that fixed location, so a set cannot be
+linked in place from elsewhere. Instead, every compiled set, and the stock
+set it replaced, is kept here keyed by the custom sdkconfig MD5 that
+espidf.py already writes to sdkconfig.defaults. Switching envs then
+swaps the files back in with a copy instead of reinstalling the framework
+and rebuilding IDF.
+
+Layout: <root>/<key>/{meta.json, files/<path relative to the libs dir>}.
+Sets are evicted least recently used first once the store grows past its
+disk budget; stock sets are never evicted.
+"""
+
+import glob
+import json
+import os
+import shutil
+import time
+
+STOCK = "stock"
+DEFAULT_BUDGET = 2 * 1024 * 1024 * 1024
+
+
+def parse_budget(value):
+    """Parse a size such as "2GB", "500MB" or a byte count."""
+    value = str(value).strip().upper().rstrip("B")
+    for suffix, scale in (("K", 1 << 10), ("M", 1 << 20), ("G", 1 << 30)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * scale)
+    return int(value)
+
+
+def from_env(env):
+    """The store under the PlatformIO core dir, sized by the project option
+    custom_arduino_libs_store_size (default 2GB)."""
+    budget = DEFAULT_BUDGET
+    option = env.GetProjectOption("custom_arduino_libs_store_size", "")
+    if option:
+        budget = parse_budget(option)
+    root = os.path.join(env.subst("$PROJECT_CORE_DIR"), ".cache", "arduino-idf-libs")
+    return LibStore(root, budget)
+
+
+def framework_version(framework_dir):
+    try:
+        with open(os.path.join(framework_dir, "package.json")) as fp:
+            return json.load(fp).get("version", "unknown")
+    except (OSError, ValueError):
+        return "unknown"
+
+
+def sdkconfig_hash(sdkconfig_defaults):
+    """The custom sdkconfig MD5 espidf.py writes as "# TASMOTA__<hash>"."""
+    try:
+        with open(sdkconfig_defaults) as fp:
+            line = fp.readline()
+    except OSError:
+        return None
+    if line.startswith("# TASMOTA__"):
+        return line.split("__")[1].strip()
+    return None
+
+
+def set_key(framework_version, chip_variant, sdkconfig_hash):
+    """Store key of one library set; sdkconfig_hash is STOCK for stock libs."""
+    return "%s-%s-%s" % (framework_version, chip_variant, sdkconfig_hash)
+
+
+def set_files(libs_dir, chip_variant, memory_variant):
+    """Paths (relative to libs_dir) that idf_lib_copy() overwrites."""
+    chip_dir = os.path.join(libs_dir, chip_variant)
+    patterns = [
+        os.path.join(chip_dir, "lib", "*.a"),
+        os.path.join(chip_dir, "ld", "memory.ld"),
+        os.path.join(chip_dir, memory_variant, "*.a"),
+        os.path.join(chip_dir, memory_variant, "include", "sdkconfig.h"),
+        os.path.join(chip_dir, "sdkconfig"),
+        os.path.join(libs_dir, "sdkconfig"),
+    ]
+    files = []
+    for pattern in patterns:
+        files.extend(glob.glob(pattern))
+    return sorted(os.path.relpath(f, libs_dir) for f in files if os.path.isfile(f))
+
+
+class LibStore(object):
+    def __init__(self, root, budget=DEFAULT_BUDGET):
+        self.root = root
+        self.budget = budget
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, key, "meta.json")
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key)) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        tmp = self._meta_path(key) + ".tmp"
+        with open(tmp, "w") as fp:
+            json.dump(meta, fp, indent=1)
+        os.replace(tmp, self._meta_path(key))
+
+    def has(self, key):
+        return self._read_meta(key) is not None
+
+    def save(self, key, libs_dir, files, extra_files=None):
+        """Copy files (relative to libs_dir) into the store as set key.
+
+        extra_files maps a name to an absolute path stored alongside, for
+        project files such as the sdkconfig.defaults carrying the hash.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, ".%s.%d" % (key, os.getpid()))
+        shutil.rmtree(staging, ignore_errors=True)
+        size = 0
+        for rel in files:
+            dst = os.path.join(staging, "files", rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(os.path.join(libs_dir, rel), dst)
+            size += os.path.getsize(dst)
+        extras = {}
+        for name, path in (extra_files or {}).items():
+            if os.path.isfile(path):
+                os.makedirs(os.path.join(staging, "extra"), exist_ok=True)
+                shutil.copyfile(path, os.path.join(staging, "extra", name))
+                extras[name] = True
+        now = time.time()
+        with open(os.path.join(staging, "meta.json"), "w") as fp:
+            json.dump({"files": files, "extra": sorted(extras), "size": size,
+                       "created": now, "last_used": now}, fp, indent=1)
+        target = os.path.join(self.root, key)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        self.evict(keep=key)
+
+    def restore(self, key, libs_dir, extra_targets=None):
+        """Copy set key back over libs_dir; return False if it is unknown.
+
+        Files written by other sets but absent from this one (the top-level
+        sdkconfig marker of a custom set, or libraries a custom set added
+        to a library dir, say) are removed, so the files set_files() covers
+        end up exactly as they were when the set was saved.
+        """
+        meta = self._read_meta(key)
+        if meta is None:
+            return False
+        src_root = os.path.join(self.root, key, "files")
+        saved = set(meta["files"])
+        # set_files() takes every *.a of its library dirs, so any other
+        # archive found there now came from another set
+        for lib_dir in {os.path.dirname(rel) for rel in saved if rel.endswith(".a")}:
+            for path in glob.glob(os.path.join(libs_dir, lib_dir, "*.a")):
+                if os.path.relpath(path, libs_dir) not in saved:
+                    os.remove(path)
+        for rel in meta["files"]:
+            dst = os.path.join(libs_dir, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copyfile(os.path.join(src_root, rel), dst)
+        if "sdkconfig" not in meta["files"]:
+            top = os.path.join(libs_dir, "sdkconfig")
+            if os.path.isfile(top):
+                os.remove(top)
+        for name, path in (extra_targets or {}).items():
+            if name in meta.get("extra", []):
+                shutil.copyfile(os.path.join(self.root, key, "extra", name), path)
+        meta["last_used"] = time.time()
+        self._write_meta(key, meta)
+        return True
+
+    def evict(self, keep=None):
+        """Drop least recently used custom sets until within the budget."""
+        sets = []
+        for key in os.listdir(self.root):
+            meta = self._read_meta(key)
+            if meta is not None:
+                sets.append((meta["last_used"], key, meta["size"]))
+        total = sum(size for _, _, size in sets)
+        for _, key, size in sorted(sets):
+            if total <= self.budget:
+                break
+            if key == keep or key.endswith("-" + STOCK):
+                continue
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
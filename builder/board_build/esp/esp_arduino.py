@@ -27,6 +27,7 @@ kinds of creative coding, interactive objects, spaces or physical experiences.
 http://arduino.cc/en/Reference/HomePage
 """
 
+import hashlib
 import json
 import os
 import shutil
@@ -85,9 +86,41 @@ if "framework-arduinoespressif32" in FRAMEWORK_DIR:
     )
 
 
+ARDUINO_PYTHON_DEPS = {"wheel": ">=0.35.1", "zopfli": ">=0.2.2", "tasmota-metrics": ">=0.4.3"}
+
+
+def _python_deps_stamp():
+    # The real interpreter behind $PYTHONEXE (path, size, mtime) and the
+    # dependency spec: while both are unchanged, so are the checked packages
+    python_exe = os.path.realpath(env.subst("$PYTHONEXE"))
+    try:
+        stat = os.stat(python_exe)
+    except OSError:
+        return None
+    return {
+        "interpreter": [python_exe, stat.st_size, int(stat.st_mtime)],
+        "deps_hash": hashlib.sha1(
+            json.dumps(ARDUINO_PYTHON_DEPS, sort_keys=True).encode("utf8")
+        ).hexdigest(),
+    }
+
+
 def install_python_deps():
     import tempfile
 
+    # Kept in the penv next to $PYTHONEXE's bin/Scripts dir
+    stamp_file = join(
+        os.path.dirname(os.path.dirname(env.subst("$PYTHONEXE"))),
+        "pio-arduino-deps.json",
+    )
+    stamp = _python_deps_stamp()
+    try:
+        with open(stamp_file, "r", encoding="utf8") as fp:
+            if stamp is not None and json.load(fp) == stamp:
+                return
+    except (OSError, ValueError):
+        pass
+
     try:
         subprocess.check_output(
             [env.subst("$PYTHONEXE"), "-m", "pip", "--version"],
@@ -125,7 +158,7 @@ def install_python_deps():
 
         return result
 
-    deps = {"wheel": ">=0.35.1", "zopfli": ">=0.2.2", "tasmota-metrics": ">=0.4.3"}
+    deps = ARDUINO_PYTHON_DEPS
 
     installed_packages = _get_installed_pip_packages()
     packages_to_install = []
@@ -138,7 +171,7 @@ def install_python_deps():
                 packages_to_install.append(package)
 
     if packages_to_install:
-        env.Execute(
+        if env.Execute(
             env.VerboseAction(
                 (
                     '"$PYTHONEXE" -m pip install -U '
@@ -146,7 +179,15 @@ def install_python_deps():
                 ),
                 "Installing Arduino Python dependencies",
             )
-        )
+        ):
+            return
+
+    if stamp is not None:
+        try:
+            with open(stamp_file, "w", encoding="utf8") as fp:
+                json.dump(stamp, fp, indent=2)
+        except OSError:
+            pass
     return
 
 
@@ -205,7 +246,49 @@ def call_compile_libs():
     SConscript("espidf.py")
 
 
-if check_reinstall_frwrk() == True:
+def restore_stored_libs():
+    # Swap in a previously compiled (or the stock) library set from the
+    # local store instead of reinstalling the framework and rebuilding IDF
+    import importlib.util
+
+    if "arduino_lib_store" not in sys.modules:
+        store_file = join(platform.get_dir(), "builder", "board_build", "esp", "arduino_lib_store.py")
+        spec = importlib.util.spec_from_file_location("arduino_lib_store", store_file)
+        sys.modules["arduino_lib_store"] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules["arduino_lib_store"])
+    lib_store = sys.modules["arduino_lib_store"]
+
+    libs_dir = platform.get_package_dir("framework-arduinoespressif32-libs") or join(
+        FRAMEWORK_DIR, "tools", "esp32-arduino-libs"
+    )
+    chip_variant = board.get("build.chip_variant", "").lower() or mcu
+    if flag_custom_sdkconfig == True:
+        sdkconfig_hash = get_MD5_hash(entry_custom_sdkconfig.strip() + mcu)
+    else:
+        sdkconfig_hash = lib_store.STOCK
+    key = lib_store.set_key(
+        lib_store.framework_version(FRAMEWORK_DIR), chip_variant, sdkconfig_hash
+    )
+    store = lib_store.from_env(env)
+    if not store.has(key):
+        return False
+    sdkconfig_orig = join(libs_dir, chip_variant, "sdkconfig.orig")
+    if flag_custom_sdkconfig == True and not os.path.isfile(sdkconfig_orig):
+        shutil.copyfile(join(libs_dir, chip_variant, "sdkconfig"), sdkconfig_orig)
+    if not store.restore(
+        key, libs_dir, {"sdkconfig.defaults": join(env.subst("$PROJECT_DIR"), "sdkconfig.defaults")}
+    ):
+        return False
+    if flag_custom_sdkconfig == False and os.path.isfile(sdkconfig_orig):
+        os.remove(sdkconfig_orig)
+    print("*** Restored stored Arduino IDF libs (%s) ***" % key)
+    return True
+
+
+framework_reinstall = check_reinstall_frwrk()
+if framework_reinstall == True and restore_stored_libs() == True:
+    flag_custom_sdkconfig = False
+elif framework_reinstall == True:
     print("*** Reinstall Arduino framework ***")
     shutil.rmtree(platform.get_package_dir("framework-arduinoespressif32"))
     ARDUINO_FRMWRK_URL = str(
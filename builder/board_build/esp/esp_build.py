@@ -17,6 +17,7 @@
 # https://github.com/pioarduino/platform-espressif32
 # Modified by Seeed Studio.
 
+import importlib.util
 import re
 import sys
 from os.path import dirname, isdir, isfile, join
@@ -34,6 +35,15 @@ Import("env")
 platform = env.PioPlatform()
 config = env.GetProjectConfig()
 
+# Shared with espidf.py, which may already have loaded it
+if "esp_partitions" not in sys.modules:
+    _pt_spec = importlib.util.spec_from_file_location(
+        "esp_partitions",
+        join(platform.get_dir(), "builder", "board_build", "esp", "esp_partitions.py"))
+    sys.modules["esp_partitions"] = importlib.util.module_from_spec(_pt_spec)
+    _pt_spec.loader.exec_module(sys.modules["esp_partitions"])
+esp_partitions = sys.modules["esp_partitions"]
+
 
 def _get_python_executable(env):
     candidate = get_pythonexe_path() or ""
@@ -229,8 +239,8 @@ def _parse_size(value):
     return value
 
 
-def _parse_partitions(env):
-    # print("in main py _parse_partitions")
+def _partition_table(env):
+    # print("in main py _partition_table")
     partitions_csv = env.subst("$PARTITIONS_TABLE_CSV")
     if not isfile(partitions_csv):
         sys.stderr.write("Could not find the file %s with partitions "
@@ -238,56 +248,50 @@ def _parse_partitions(env):
         env.Exit(1)
         return
 
-    result = []
-    next_offset = 0
+    offset = env.get("PARTITIONS_TABLE_OFFSET") or board.get(
+        "upload.partition_table_offset", "0x8000")
+    try:
+        return esp_partitions.load(partitions_csv, offset)
+    except esp_partitions.PartitionTableError as e:
+        sys.stderr.write("Error: %s: %s\n" % (partitions_csv, e))
+        env.Exit(1)
+
+
+def _apply_app_offset(env, table):
     app_offset = int(board.get("upload.offset_address", "0x10000"), 16) # default 0x10000
-    with open(partitions_csv) as fp:
-        for line in fp.readlines():
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
-            tokens = [t.strip() for t in line.split(",")]
-            if len(tokens) < 5:
-                continue
-            bound = 0x10000 if tokens[1] in ("0", "app") else 4
-            calculated_offset = (next_offset + bound - 1) & ~(bound - 1)
-            partition = {
-                "name": tokens[0],
-                "type": tokens[1],
-                "subtype": tokens[2],
-                "offset": tokens[3] or calculated_offset,
-                "size": tokens[4],
-                "flags": tokens[5] if len(tokens) > 5 else None
-            }
-            result.append(partition)
-            next_offset = _parse_size(partition["offset"])
-            if (partition["subtype"] == "ota_0"):
-                app_offset = next_offset
-            next_offset = next_offset + _parse_size(partition["size"])
+    ota_0 = table.find("app", "ota_0")
+    if ota_0:
+        app_offset = ota_0.offset
     # Configure application partition offset
     env.Replace(ESP32_APP_OFFSET=str(hex(app_offset)))
     # Propagate application offset to debug configurations
     env["INTEGRATION_EXTRA_DATA"].update({"application_offset": str(hex(app_offset))})
-    return result
+
+
+def _parse_partitions(env):
+    # print("in main py _parse_partitions")
+    table = _partition_table(env)
+    if table is None:
+        return
+    _apply_app_offset(env, table)
+    return [p.as_dict() for p in table]
 
 
 def _update_max_upload_size(env):
     # print("in main py _update_max_upload_size")
     if not env.get("PARTITIONS_TABLE_CSV"):
         return
-    sizes = {
-        p["subtype"]: _parse_size(p["size"]) for p in _parse_partitions(env)
-        if p["type"] in ("0", "app")
-    }
-
-    partitions = {p["name"]: p for p in _parse_partitions(env)}
+    table = _partition_table(env)
+    if table is None:
+        return
+    _apply_app_offset(env, table)
 
     # User-specified partition name has the highest priority
     custom_app_partition_name = board.get("build.app_partition_name", "")
     if custom_app_partition_name:
-        selected_partition = partitions.get(custom_app_partition_name, {})
+        selected_partition = table.find(name=custom_app_partition_name)
         if selected_partition:
-            board.update("upload.maximum_size", _parse_size(selected_partition["size"]))
+            board.update("upload.maximum_size", selected_partition.size)
             return
         else:
             print(
@@ -295,10 +299,9 @@ def _update_max_upload_size(env):
                 "table! Default partition will be used!" % custom_app_partition_name
             )
 
-    for p in partitions.values():
-        if p["type"] in ("0", "app") and p["subtype"] in ("ota_0"):
-            board.update("upload.maximum_size", _parse_size(p["size"]))
-            break
+    ota_0 = table.find("app", "ota_0")
+    if ota_0:
+        board.update("upload.maximum_size", ota_0.size)
 
 
 
@@ -314,10 +317,12 @@ def _to_unix_slashes(path):
 
 def fetch_fs_size(env):
     # print("in main py fetch_fs_size")
+    table = _partition_table(env)
     fs = None
-    for p in _parse_partitions(env):
-        if p["type"] == "data" and p["subtype"] in ("spiffs", "fat", "littlefs"):
-            fs = p
+    if table:
+        _apply_app_offset(env, table)
+        # The last filesystem partition wins, as before
+        fs = (table.find_all("data", ("spiffs", "fat", "littlefs")) or [None])[-1]
     if not fs:
         sys.stderr.write(
             "Could not find the any filesystem section in the partitions "
@@ -325,8 +330,8 @@ def fetch_fs_size(env):
         )
         env.Exit(1)
         return
-    env["FS_START"] = _parse_size(fs["offset"])
-    env["FS_SIZE"] = _parse_size(fs["size"])
+    env["FS_START"] = fs.offset
+    env["FS_SIZE"] = fs.size
     env["FS_PAGE"] = int("0x100", 16)
     env["FS_BLOCK"] = int("0x1000", 16)
 
@@ -517,11 +522,19 @@ if env.get("PIOMAINPROG"):
 target_size = env.AddPlatformTarget(
     "size",
     target_elf,
-    env.VerboseAction("$SIZEPRINTCMD", "Calculating size $SOURCE"),
+    env.VerboseAction(env.PrintProgramSize, "Calculating size $SOURCE"),
     "Program Size",
     "Calculate program size",
 )
 
+env.AddPlatformTarget(
+    "sizereport",
+    target_elf,
+    env.VerboseAction(env.WriteSizeReport, "Writing size report $SOURCE"),
+    "Size Report",
+    "Record per-symbol sizes and show the growth since the last build",
+)
+
 #
 # Target: Upload firmware or FS image
 #
@@ -0,0 +1,223 @@
+# Copyright 2014-present PlatformIO <contact@platformio.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process ESP partition table model.
+
+Parses a partition CSV once with the same rules as ESP-IDF's
+components/partition_table/gen_esp32part.py (type/subtype names, size
+suffixes, automatic offsets and alignment) and answers the lookups that
+used to spawn parttool.py or re-read the CSV. Tables are memoized per
+(CSV path, mtime, table offset), so every script in one SCons run shares
+the same parse.
+
+espidf.py and esp_build.py load it once under sys.modules["esp_partitions"]
+so they share the same module object, and therefore the same cache.
+"""
+
+import os
+
+PARTITION_TABLE_SIZE = 0x1000
+
+TYPES = {
+    "app": 0x00,
+    "data": 0x01,
+    "bootloader": 0x02,
+    "partition_table": 0x03,
+}
+
+SUBTYPES = {
+    0x00: dict(
+        {"factory": 0x00, "test": 0x20},
+        **{"ota_%d" % i: 0x10 + i for i in range(16)}
+    ),
+    0x01: {
+        "ota": 0x00,
+        "phy": 0x01,
+        "nvs": 0x02,
+        "coredump": 0x03,
+        "nvs_keys": 0x04,
+        "efuse": 0x05,
+        "undefined": 0x06,
+        "esphttpd": 0x80,
+        "fat": 0x81,
+        "spiffs": 0x82,
+        "littlefs": 0x83,
+    },
+    0x02: {"primary": 0x00, "ota": 0x01, "recovery": 0x02},
+    0x03: {"primary": 0x00, "ota": 0x01},
+}
+
+ALIGNMENT = {0x00: 0x10000, 0x01: 0x1000}
+
+_cache = {}
+
+
+class PartitionTableError(ValueError):
+    pass
+
+
+def parse_int(value):
+    """Parse a CSV number the way gen_esp32part.py does (K/M suffixes)."""
+    value = value.strip()
+    for suffix, scale in (("K", 1024), ("M", 1024 * 1024)):
+        if value.upper().endswith(suffix):
+            return parse_int(value[:-1]) * scale
+    return int(value, 0)
+
+
+def _parse_type(token):
+    if token in TYPES:
+        return TYPES[token]
+    try:
+        return parse_int(token)
+    except ValueError:
+        raise PartitionTableError("unknown partition type '%s'" % token)
+
+
+def _parse_subtype(type_id, token):
+    if not token:
+        return 0
+    if token in SUBTYPES.get(type_id, {}):
+        return SUBTYPES[type_id][token]
+    try:
+        return parse_int(token)
+    except ValueError:
+        raise PartitionTableError("unknown partition subtype '%s'" % token)
+
+
+class Partition(object):
+    __slots__ = ("name", "type", "subtype", "type_id", "subtype_id",
+                 "offset", "size", "flags")
+
+    def __init__(self, name, type, subtype, type_id, subtype_id, offset,
+                 size, flags):
+        self.name = name
+        self.type = type
+        self.subtype = subtype
+        self.type_id = type_id
+        self.subtype_id = subtype_id
+        self.offset = offset
+        self.size = size
+        self.flags = flags
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "type": self.type,
+            "subtype": self.subtype,
+            "offset": self.offset,
+            "size": self.size,
+            "flags": self.flags,
+        }
+
+
+class PartitionTable(object):
+    def __init__(self, partitions):
+        self.partitions = partitions
+
+    @classmethod
+    def from_csv(cls, text, table_offset=0x8000):
+        partitions = []
+        last_end = table_offset + PARTITION_TABLE_SIZE
+        for line_no, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = [os.path.expandvars(f.strip()) for f in line.split(",")]
+            fields += [""] * (6 - len(fields))
+            try:
+                type_id = _parse_type(fields[1])
+                subtype_id = _parse_subtype(type_id, fields[2])
+                if fields[3]:
+                    offset = parse_int(fields[3])
+                else:
+                    align = ALIGNMENT.get(type_id, 0x1000)
+                    offset = (last_end + align - 1) & ~(align - 1)
+                size = parse_int(fields[4])
+            except (PartitionTableError, ValueError) as e:
+                raise PartitionTableError("line %d: %s" % (line_no, e))
+            partitions.append(Partition(
+                fields[0], fields[1], fields[2], type_id, subtype_id,
+                offset, size, fields[5] or None))
+            last_end = offset + size
+        return cls(partitions)
+
+    def __iter__(self):
+        return iter(self.partitions)
+
+    def find(self, type=None, subtype=None, name=None):
+        """First partition matching the given name and/or type/subtype.
+
+        type and subtype accept names ("app", "ota_0") or numbers.
+        """
+        type_id = _parse_type(type) if isinstance(type, str) else type
+        for p in self.partitions:
+            if name is not None and p.name != name:
+                continue
+            if type_id is not None and p.type_id != type_id:
+                continue
+            if subtype is not None:
+                wanted = (_parse_subtype(p.type_id, subtype)
+                          if isinstance(subtype, str) else subtype)
+                if p.subtype_id != wanted:
+                    continue
+            return p
+        return None
+
+    def find_all(self, type=None, subtypes=None):
+        """All partitions of type whose subtype is one of subtypes."""
+        type_id = _parse_type(type) if isinstance(type, str) else type
+        result = []
+        for p in self.partitions:
+            if type_id is not None and p.type_id != type_id:
+                continue
+            if subtypes is not None and p.subtype_id not in [
+                    _parse_subtype(p.type_id, s) if isinstance(s, str) else s
+                    for s in subtypes]:
+                continue
+            result.append(p)
+        return result
+
+    def boot_default(self):
+        """The partition the ROM bootloader starts by default."""
+        return self.find("app", "factory") or self.find("app", "ota_0")
+
+    def info(self, params):
+        """Answer a parttool.py get_partition_info --info size offset query.
+
+        Returns {"size": hex, "offset": hex}, or zeros when nothing matches,
+        the same values espidf.py used to parse from parttool's output.
+        """
+        if params.get("name") == "boot":
+            p = self.boot_default()
+        else:
+            p = self.find(params["type"], params["subtype"])
+        if p is None:
+            return {"size": 0, "offset": 0}
+        return {"size": hex(p.size), "offset": hex(p.offset)}
+
+
+def load(csv_path, table_offset=0x8000):
+    """Return the PartitionTable of csv_path, parsed at most once per mtime."""
+    csv_path = os.path.abspath(csv_path)
+    if isinstance(table_offset, str):
+        table_offset = parse_int(table_offset)
+    key = (csv_path, os.path.getmtime(csv_path), table_offset)
+    table = _cache.get(key)
+    if table is None:
+        with open(csv_path, encoding="utf8") as fp:
+            table = PartitionTable.from_csv(fp.read(), table_offset)
+        _cache[key] = table
+    return table
@@ -555,11 +555,19 @@ if "bootloader" in COMMAND_LINE_TARGETS and "DFUBOOTHEX" not in env:
 target_size = env.AddPlatformTarget(
     "size",
     target_elf,
-    env.VerboseAction("$SIZEPRINTCMD", "Calculating size $SOURCE"),
+    env.VerboseAction(env.PrintProgramSize, "Calculating size $SOURCE"),
     "Program Size",
     "Calculate program size",
 )
 
+env.AddPlatformTarget(
+    "sizereport",
+    target_elf,
+    env.VerboseAction(env.WriteSizeReport, "Writing size report $SOURCE"),
+    "Size Report",
+    "Record per-symbol sizes and show the growth since the last build",
+)
+
 #
 # Target: Upload by default .bin file
 #
@@ -14,13 +14,12 @@
 
 import sys
 from platform import system
-from os import makedirs, remove, environ
+from os import makedirs, remove
 from os.path import isdir, join, isfile, exists
 import re
 import time
 from shutil import copyfile
 import subprocess
-from platformio.proc import exec_command
 
 from platformio.public import list_serial_ports
 
@@ -183,10 +182,32 @@ def BeforeUpload(target, source, env):  # pylint: disable=W0613,W0621
 
 def generate_uf2(target, source, env):
     elf_file = target[0].get_path()
+    uf2_file = elf_file.replace(".elf", ".uf2")
     platform = env.PioPlatform()
     picotool_dir = platform.get_package_dir("tool-picotool-rp2040-earlephilhower") or ""
     picotool_cmd = join(picotool_dir, "picotool")
-    
+
+    if not picotool_dir:
+        # No picotool: encode the ELF load segments with the bundled
+        # converter, which also emits UF2 in one step with no .bin.
+        family = {"rp2350": "rp2350-arm-s"}.get(
+            env.BoardConfig().get("build.mcu"), env.BoardConfig().get("build.mcu"))
+        env.Execute(
+            " ".join(
+                [
+                    '"$PYTHONEXE"',
+                    '"%s"' % join(platform.get_dir(), "builder", "tools", "uf2conv.py"),
+                    "-i",
+                    '"%s"' % elf_file,
+                    "-f",
+                    family,
+                    "-o",
+                    '"%s"' % uf2_file
+                ]
+            )
+        )
+        return
+
     env.Execute(
         " ".join(
             [
@@ -196,7 +217,7 @@ def generate_uf2(target, source, env):
                 "-t",
                 "elf",
                 '"%s"' % elf_file,
-                '"%s"' % elf_file.replace(".elf", ".uf2")
+                '"%s"' % uf2_file
             ]
         )
     )
@@ -238,42 +259,6 @@ env.Replace(
 )
 
 # Print fancier PSRAM size output (statically known allocations)
-def _format_available_bytes(value, total):
-    percent_raw = float(value) / float(total)
-    blocks_per_progress = 10
-    used_blocks = min(
-        int(round(blocks_per_progress * percent_raw)), blocks_per_progress
-    )
-    return "[{:{}}] {: 6.1%} (used {:d} bytes from {:d} bytes)".format(
-        "=" * used_blocks, blocks_per_progress, percent_raw, value, total
-    )
-def _get_size_output(source):
-    cmd = env.get("SIZECHECKCMD")
-    if not cmd:
-        return None
-    if not isinstance(cmd, list):
-        cmd = cmd.split()
-    cmd = [arg.replace("$SOURCES", str(source[0])) for arg in cmd if arg]
-    sysenv = environ.copy()
-    sysenv["PATH"] = str(env["ENV"]["PATH"])
-    result = exec_command(env.subst(cmd), env=sysenv)
-    if result["returncode"] != 0:
-        return None
-    return result["out"].strip()
-def _calculate_size(output, pattern):
-    if not output or not pattern:
-        return -1
-    size = 0
-    regexp = re.compile(pattern)
-    for line in output.split("\n"):
-        line = line.strip()
-        if not line:
-            continue
-        match = regexp.search(line)
-        if not match:
-            continue
-        size += sum(int(value) for value in match.groups())
-    return size
 old_check = env.CheckUploadSize
 def new_check_size(target, source, env):
     old_check(target, source, env)
@@ -281,9 +266,11 @@ def new_check_size(target, source, env):
     psram_len = convert_size_expression_to_int(str(board.get("upload.psram_length", "0")))
     if psram_len == 0:
         return
-    output = _get_size_output(source)
-    used_psram = _calculate_size(output, r"^(?:\.psram)\s+(\d+).*")
-    print("PSRAM: " + _format_available_bytes(used_psram, psram_len))
+    elfsize = sys.modules["elfsize"]
+    # Same cached report the flash/RAM check above just parsed
+    psram = elfsize.load(env.subst(str(source[0]))).section(".psram")
+    used_psram = psram.size if psram else 0
+    print("PSRAM: " + elfsize.format_available_bytes(used_psram, psram_len))
 env.CheckUploadSize = new_check_size
 
 # Allow user to override via pre:script
@@ -419,9 +406,14 @@ if env.get("PIOMAINPROG"):
 
 target_size = env.Alias(
     "size", target_elf,
-    env.VerboseAction("$SIZEPRINTCMD", "Calculating size $SOURCE"))
+    env.VerboseAction(env.PrintProgramSize, "Calculating size $SOURCE"))
 AlwaysBuild(target_size)
 
+target_sizereport = env.Alias(
+    "sizereport", target_elf,
+    env.VerboseAction(env.WriteSizeReport, "Writing size report $SOURCE"))
+AlwaysBuild(target_sizereport)
+
 def RebootPico(target, source, env): 
     time.sleep(0.5)
     env.Execute(
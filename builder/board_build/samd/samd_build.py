@@ -133,9 +133,14 @@ target_buildprog = env.Alias("buildprog", target_firm, target_firm)
 
 target_size = env.Alias(
     "size", target_elf,
-    env.VerboseAction("$SIZEPRINTCMD", "Calculating size $SOURCE"))
+    env.VerboseAction(env.PrintProgramSize, "Calculating size $SOURCE"))
 AlwaysBuild(target_size)
 
+target_sizereport = env.Alias(
+    "sizereport", target_elf,
+    env.VerboseAction(env.WriteSizeReport, "Writing size report $SOURCE"))
+AlwaysBuild(target_sizereport)
+
 #
 # Target: Upload by default .bin file
 #
@@ -44,7 +44,7 @@ env.Append(
             ),
             suffix=".hex",
         ),
-        "BinToUf2": Builder(
+        "ElfToUf2": Builder(
             action=env.VerboseAction(
                 '"$PYTHONEXE" "%s" -i $SOURCES -b ${UF2_BASE_ADDR} '
                 '--family-id ${UF2_FAMILY_ID} -o $TARGET'
@@ -84,11 +84,19 @@ target_buildprog_sources = [target_firm]
 target_size = env.AddPlatformTarget(
     "size",
     target_elf,
-    env.VerboseAction("$SIZEPRINTCMD", "Calculating size $SOURCE"),
+    env.VerboseAction(env.PrintProgramSize, "Calculating size $SOURCE"),
     "Program Size",
     "Calculate program size",
 )
 
+env.AddPlatformTarget(
+    "sizereport",
+    target_elf,
+    env.VerboseAction(env.WriteSizeReport, "Writing size report $SOURCE"),
+    "Size Report",
+    "Record per-symbol sizes and show the growth since the last build",
+)
+
 debug_tools = board.get("debug.tools", {})
 uf2_config = board.get("upload.uf2", {})
 if uf2_config or "uf2" in board.get("upload.protocols", []):
@@ -96,8 +104,10 @@ if uf2_config or "uf2" in board.get("upload.protocols", []):
         UF2_BASE_ADDR=str(board.get("upload.offset_address", "0x08008000")),
         UF2_FAMILY_ID=str(uf2_config.get("family_id", "0x00C5C5C5")),
     )
-    target_bin = env.ElfToBin(join("$BUILD_DIR", "${PROGNAME}"), target_elf)
-    target_uf2 = env.BinToUf2(join("$BUILD_DIR", "${PROGNAME}"), target_bin)
+    # Encoded straight from the ELF load segments: no intermediate .bin and
+    # no padding blocks for gaps between flash regions. UF2_BASE_ADDR is the
+    # lowest address the image may touch (the bootloader lives below it).
+    target_uf2 = env.ElfToUf2(join("$BUILD_DIR", "${PROGNAME}"), target_elf)
     env.AddPlatformTarget(
         "uf2", target_uf2, [], "Build UF2 Image", "Build UF2 image for UF2 bootloader upload"
     )
@@ -110,13 +120,40 @@ target_buildprog = env.Alias("buildprog", target_buildprog_sources)
 if upload_protocol == "uf2":
     tools_dir = join(platform.get_dir(), "builder", "tools")
     volume_label = uf2_config.get("volume_label", "XIAOC5BOOT")
-    env.Replace(
-        UPLOADCMD='"$PYTHONEXE" "%s" "$SOURCE" --label %s --port "${UPLOAD_PORT}"'
-        % (join(tools_dir, "uf2upload.py"), volume_label),
-    )
+    uploadcmd = '"$PYTHONEXE" "%s" "$SOURCE" --label %s --port "${UPLOAD_PORT}"' % (
+        join(tools_dir, "uf2upload.py"), volume_label)
+    # board_upload.uf2_delta = yes: only write the pages that changed since
+    # the last upload to this board (baseline kept in the build dir). Pages
+    # are compared at the bootloader's erase granularity, which the board
+    # has to name: TinyUF2 erases a whole sector on its first write into
+    # it, so a smaller page would lose the unchanged rest of the sector.
+    uf2_delta = str(board.get("upload.uf2_delta", "no")).lower() in ("1", "yes", "true")
+    if uf2_delta:
+        if not uf2_config.get("delta_page"):
+            sys.stderr.write(
+                "Error: board_upload.uf2_delta needs board_upload.uf2.delta_page, "
+                "the flash erase (sector) size of the board\n"
+            )
+            env.Exit(1)
+        uploadcmd += ' --baseline-dir "%s" --delta-page %s --board-serial "$UF2_BOARD_SERIAL"' % (
+            join("$BUILD_DIR", "uf2-baseline"), uf2_config.get("delta_page"))
+    env.Replace(UPLOADCMD=uploadcmd, UF2_BOARD_SERIAL="")
+
+    def _usb_serial_number(port):
+        try:
+            from serial.tools.list_ports import comports
+        except ImportError:
+            return ""
+        for info in comports():
+            if info.device == port and info.serial_number:
+                return info.serial_number
+        return ""
 
     def before_uf2_upload(target, source, env):  # pylint: disable=unused-argument
         env.AutodetectUploadPort()
+        if uf2_delta:
+            # Read now: the port disappears once the board is in its bootloader
+            env.Replace(UF2_BOARD_SERIAL=_usb_serial_number(env.subst("$UPLOAD_PORT")))
         if board.get("upload.use_1200bps_touch", False):
             env.TouchSerialPort("$UPLOAD_PORT", 1200)
             time.sleep(0.5)
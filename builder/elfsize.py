@@ -0,0 +1,279 @@
+# Copyright 2014-present PlatformIO <contact@platformio.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process ELF section sizes.
+
+Reads the section header table of a linked ELF (32/64-bit, either byte
+order) over mmap and reports per-section sizes, replacing the `size` tool
+runs that every builder did after linking (`-A -d` for the upload size
+check, again for PSRAM on RP2350, and `-B -d` for the size target).
+Reports are memoized per (path, mtime, size), so one link is parsed once.
+read_symbols() lists the sized symbols of the symbol table for the
+per-symbol size report (sizereport.py).
+
+register(env) installs CheckUploadSize (flash/RAM against the board limits,
+using the builder's SIZEPROGREGEXP/SIZEDATAREGEXP over the `-A` style
+listing) and PrintProgramSize (the `-B` style totals) on the environment.
+main.py loads this module once under sys.modules["elfsize"].
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+
+SHT_NULL = 0
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_NOBITS = 8
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+STT_OBJECT = 1
+STT_FUNC = 2
+
+SHN_UNDEF = 0
+SHN_LORESERVE = 0xFF00
+
+_cache = {}
+
+
+class ElfSizeError(ValueError):
+    pass
+
+
+class Section(object):
+    __slots__ = ("name", "type", "flags", "addr", "size")
+
+    def __init__(self, name, type, flags, addr, size):
+        self.name = name
+        self.type = type
+        self.flags = flags
+        self.addr = addr
+        self.size = size
+
+    @property
+    def alloc(self):
+        return bool(self.flags & SHF_ALLOC)
+
+    @property
+    def kind(self):
+        """"text", "data" or "bss" as `size -B` counts it, None if not loaded."""
+        if not self.alloc:
+            return None
+        if self.flags & SHF_EXECINSTR or not self.flags & SHF_WRITE:
+            return "text"
+        if self.type != SHT_NOBITS:
+            return "data"
+        return "bss"
+
+
+class SizeReport(object):
+    def __init__(self, path, sections):
+        self.path = path
+        self.sections = sections
+
+    def section(self, name):
+        for s in self.sections:
+            if s.name == name:
+                return s
+        return None
+
+    def berkeley(self):
+        """(text, data, bss) totals, as `size -B` computes them."""
+        totals = {"text": 0, "data": 0, "bss": 0}
+        for s in self.sections:
+            kind = s.kind
+            if kind:
+                totals[kind] += s.size
+        return totals["text"], totals["data"], totals["bss"]
+
+    def sysv(self):
+        """Listing in the `size -A -d` layout, for the SIZE*REGEXP patterns."""
+        width = max([len("section")] + [len(s.name) for s in self.sections])
+        lines = ["%s  :" % self.path,
+                 "%-*s %10s %10s" % (width, "section", "size", "addr")]
+        for s in self.sections:
+            lines.append("%-*s %10d %10d" % (width, s.name, s.size, s.addr))
+        lines.append("%-*s %10d" % (width, "Total", sum(s.size for s in self.sections)))
+        return "\n".join(lines)
+
+    def total(self, pattern):
+        """Sum of the sizes matched by pattern over sysv(), or -1 without one."""
+        if not pattern:
+            return -1
+        regexp = re.compile(pattern)
+        size = 0
+        for line in self.sysv().split("\n")[2:]:
+            match = regexp.search(line.strip())
+            if match:
+                size += sum(int(value) for value in match.groups())
+        return size
+
+
+def _section_headers(data):
+    """(is64, endian, raw section headers, section name table) of an ELF."""
+    if data[:4] != b"\x7fELF":
+        raise ElfSizeError("not an ELF file")
+    is64 = data[4] == 2
+    endian = ">" if data[5] == 2 else "<"
+    if is64:
+        shoff, = struct.unpack_from(endian + "Q", data, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 0x3A)
+        header = endian + "IIQQQQI"
+    else:
+        shoff, = struct.unpack_from(endian + "I", data, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from(endian + "HHH", data, 0x2E)
+        header = endian + "IIIIIII"
+    if not shoff:
+        return is64, endian, [], b""
+
+    def entry(index):
+        return struct.unpack_from(header, data, shoff + index * shentsize)
+
+    # Extended numbering keeps the real counts in section 0
+    if shnum == 0:
+        shnum = entry(0)[5]
+    if shstrndx == 0xFFFF:
+        shstrndx, = struct.unpack_from(endian + "I", data, shoff + (0x28 if is64 else 0x18))
+
+    headers = [entry(i) for i in range(shnum)]
+    strtab_offset, strtab_size = headers[shstrndx][4], headers[shstrndx][5]
+    return is64, endian, headers, data[strtab_offset:strtab_offset + strtab_size]
+
+
+def _cstr(table, offset):
+    return table[offset:table.find(b"\0", offset)].decode("utf-8", "replace")
+
+
+def _read_sections(data):
+    _, _, headers, strtab = _section_headers(data)
+    sections = []
+    for name, type, flags, addr, _, size, _ in headers:
+        if type == SHT_NULL or (
+                type in (SHT_SYMTAB, SHT_STRTAB) and not flags & SHF_ALLOC):
+            continue
+        sections.append(Section(_cstr(strtab, name), type, flags, addr, size))
+    return sections
+
+
+def read_symbols(elf_path):
+    """Sized function and object symbols of the loaded sections of elf_path.
+
+    Returns (name, size, section name) tuples in symbol table order; a
+    stripped ELF yields none.
+    """
+    with open(elf_path, "rb") as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            is64, endian, headers, shstrtab = _section_headers(data)
+            symtab = next((h for h in headers if h[1] == SHT_SYMTAB), None)
+            if symtab is None:
+                return []
+            strtab_header = headers[symtab[6]]
+            strtab = data[strtab_header[4]:strtab_header[4] + strtab_header[5]]
+            if is64:
+                entry, entsize = endian + "IBBHQQ", 24
+            else:
+                entry, entsize = endian + "IIIBBH", 16
+            symbols = []
+            for offset in range(symtab[4], symtab[4] + symtab[5], entsize):
+                if is64:
+                    name, info, _, shndx, _, size = struct.unpack_from(entry, data, offset)
+                else:
+                    name, _, size, info, _, shndx = struct.unpack_from(entry, data, offset)
+                if not size or info & 0xF not in (STT_OBJECT, STT_FUNC):
+                    continue
+                if shndx == SHN_UNDEF or shndx >= min(SHN_LORESERVE, len(headers)):
+                    continue
+                if not headers[shndx][2] & SHF_ALLOC:
+                    continue
+                symbols.append((
+                    _cstr(strtab, name), size, _cstr(shstrtab, headers[shndx][0])))
+    return symbols
+
+
+def load(elf_path):
+    """Return the SizeReport of elf_path, parsed at most once per mtime."""
+    elf_path = os.path.abspath(elf_path)
+    stat = os.stat(elf_path)
+    key = (elf_path, stat.st_mtime_ns, stat.st_size)
+    report = _cache.get(key)
+    if report is None:
+        with open(elf_path, "rb") as fp:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                sections = _read_sections(data)
+        report = SizeReport(elf_path, sections)
+        _cache[key] = report
+    return report
+
+
+def format_available_bytes(value, total):
+    percent_raw = float(value) / float(total)
+    blocks_per_progress = 10
+    used_blocks = min(
+        int(round(blocks_per_progress * percent_raw)), blocks_per_progress
+    )
+    return "[{:{}}] {: 6.1%} (used {:d} bytes from {:d} bytes)".format(
+        "=" * used_blocks, blocks_per_progress, percent_raw, value, total
+    )
+
+
+def CheckUploadSize(_, target, source, env):
+    """PlatformIO's upload size check, over the in-process section report."""
+    from SCons.Script import ARGUMENTS
+
+    if not env.get("BOARD"):
+        return
+    program_max_size = int(env.BoardConfig().get("upload.maximum_size", 0))
+    data_max_size = int(env.BoardConfig().get("upload.maximum_ram_size", 0))
+    if program_max_size == 0:
+        return
+
+    report = load(env.subst(str(source[0])))
+    program_size = report.total(env.get("SIZEPROGREGEXP"))
+    data_size = report.total(env.get("SIZEDATAREGEXP"))
+
+    print('Advanced Memory Usage is available via "PlatformIO Home > Project Inspect"')
+    if data_max_size and data_size > -1:
+        print("RAM:   %s" % format_available_bytes(data_size, data_max_size))
+    if program_size > -1:
+        print("Flash: %s" % format_available_bytes(program_size, program_max_size))
+    if int(ARGUMENTS.get("PIOVERBOSE", 0)):
+        print(report.sysv())
+
+    if program_size > program_max_size:
+        sys.stderr.write(
+            "Error: The program size (%d bytes) is greater "
+            "than maximum allowed (%s bytes)\n" % (program_size, program_max_size)
+        )
+        env.Exit(1)
+
+
+def PrintProgramSize(_, target, source, env):
+    """The `size -B -d` totals of the program."""
+    report = load(env.subst(str(source[0])))
+    text, data, bss = report.berkeley()
+    print("   text\t   data\t    bss\t    dec\t    hex\tfilename")
+    print("%7d\t%7d\t%7d\t%7d\t%7x\t%s" % (
+        text, data, bss, text + data + bss, text + data + bss,
+        os.path.relpath(report.path, env.subst("$PROJECT_DIR"))))
+
+
+def register(env):
+    env.AddMethod(CheckUploadSize, "CheckUploadSize")
+    env.AddMethod(PrintProgramSize, "PrintProgramSize")
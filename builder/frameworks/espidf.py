@@ -21,15 +21,18 @@ https://github.com/espressif/esp-idf
 """
 
 import copy
+import hashlib
 import importlib.util
 import json
 import os
+import pickle
 import platform as sys_platform
 import re
 import requests
 import shutil
 import subprocess
 import sys
+from collections.abc import Mapping
 from pathlib import Path
 from urllib.parse import urlsplit, unquote
 
@@ -59,6 +62,20 @@ _component_manager = importlib.util.module_from_spec(_cm_spec)
 _cm_spec.loader.exec_module(_component_manager)
 sys.modules["component_manager"] = _component_manager
 
+if "esp_partitions" not in sys.modules:
+    _partitions_file = Path(platform.get_dir()) / "builder" / "board_build" / "esp" / "esp_partitions.py"
+    _pt_spec = importlib.util.spec_from_file_location("esp_partitions", _partitions_file)
+    sys.modules["esp_partitions"] = importlib.util.module_from_spec(_pt_spec)
+    _pt_spec.loader.exec_module(sys.modules["esp_partitions"])
+esp_partitions = sys.modules["esp_partitions"]
+
+if "arduino_lib_store" not in sys.modules:
+    _store_file = Path(platform.get_dir()) / "builder" / "board_build" / "esp" / "arduino_lib_store.py"
+    _store_spec = importlib.util.spec_from_file_location("arduino_lib_store", _store_file)
+    sys.modules["arduino_lib_store"] = importlib.util.module_from_spec(_store_spec)
+    _store_spec.loader.exec_module(sys.modules["arduino_lib_store"])
+arduino_lib_store = sys.modules["arduino_lib_store"]
+
 _penv_setup_file = str(Path(platform.get_dir()) / "builder" / "penv_setup.py")
 _spec = importlib.util.spec_from_file_location("penv_setup", _penv_setup_file)
 _penv_setup = importlib.util.module_from_spec(_spec)
@@ -658,39 +675,38 @@ def HandleArduinoIDFsettings(env):
 
         return board_config_flags
 
-    def build_idf_config_flags():
-        """Build complete IDF configuration flags from all sources."""
-        flags = []
-        
+    def build_idf_config_layers():
+        """Collect IDF configuration flags per source, lowest precedence first."""
+        layers = []
+
+        def add_layer(source, entries):
+            lines = "\n".join(entries).splitlines()
+            if lines:
+                layers.append((source, lines))
+
         # FIRST: Add board-specific flags derived from board.json manifest
-        board_flags = generate_board_specific_config()
-        if board_flags:
-            flags.extend(board_flags)
-        
+        add_layer("board", generate_board_specific_config())
+
         # SECOND: Add board-specific flags from board manifest (espidf.custom_sdkconfig)
         if "espidf.custom_sdkconfig" in board:
-            board_manifest_flags = board.get("espidf.custom_sdkconfig", [])
-            if board_manifest_flags:
-                flags.extend(board_manifest_flags)
-        
+            add_layer("espidf.custom_sdkconfig", board.get("espidf.custom_sdkconfig", []))
+
         # THIRD: Add custom sdkconfig file content
         custom_file_content = load_custom_sdkconfig_file()
         if custom_file_content:
-            flags.append(custom_file_content)
-        
+            add_layer("custom_sdkconfig file", [custom_file_content])
+
         # FOURTH: Add project-level custom sdkconfig (highest precedence for user overrides)
         if config.has_option("env:" + env["PIOENV"], "custom_sdkconfig"):
             custom_flags = env.GetProjectOption("custom_sdkconfig").rstrip("\n")
             if custom_flags:
-                flags.append(custom_flags)
-        
+                add_layer("custom_sdkconfig", [custom_flags])
+
         # FIFTH: Apply ESP32-specific compatibility fixes
-        all_flags_str = "\n".join(flags) + "\n" if flags else ""
-        esp32_compatibility_flags = apply_esp32_compatibility_fixes(all_flags_str)
-        if esp32_compatibility_flags:
-            flags.extend(esp32_compatibility_flags)
-        
-        return "\n".join(flags) + "\n" if flags else ""
+        all_flags_str = "\n".join(line for _, lines in layers for line in lines) + "\n"
+        add_layer("compatibility fix", apply_esp32_compatibility_fixes(all_flags_str))
+
+        return layers
 
     def apply_esp32_compatibility_fixes(config_flags_str):
         """Apply ESP32-specific compatibility fixes based on final configuration."""
@@ -705,8 +721,28 @@ def HandleArduinoIDFsettings(env):
         
         return compatibility_flags
 
+    def merge_config_layers(layers):
+        """Merge layers into {flag name: (line, source)}; later layers win.
 
-    def write_sdkconfig_file(idf_config_flags, checksum_source):
+        Lines that are not flags (comments) are kept in order as extras.
+        """
+        merged = {}
+        extras = []
+        for source, lines in layers:
+            for line in lines:
+                if not line.strip():
+                    continue
+                cleaned = line.replace("'", "")
+                flag_name = extract_flag_name(cleaned)
+                if flag_name is None:
+                    extras.append((cleaned.strip(), source))
+                else:
+                    # Re-insert so the dict keeps the order of last assignment
+                    merged.pop(flag_name, None)
+                    merged[flag_name] = (cleaned.strip(), source)
+        return merged, extras
+
+    def write_sdkconfig_file(merged, extras, checksum_source):
         if "arduino" not in env.subst("$PIOFRAMEWORK"):
             print("Error: Arduino framework required for sdkconfig processing")
             return
@@ -719,42 +755,60 @@ def HandleArduinoIDFsettings(env):
         
         # Generate checksum for validation (maintains original logic)
         checksum = get_MD5_hash(checksum_source.strip() + mcu)
-        
-        with open(sdkconfig_src, 'r', encoding='utf-8') as src, open(sdkconfig_dst, 'w', encoding='utf-8') as dst:
-            # Write checksum header (critical for compilation decision logic)
-            dst.write(f"# TASMOTA__{checksum}\n")
-            
-            # Process each line from source sdkconfig
+
+        with open(sdkconfig_src, 'r', encoding='utf-8') as src:
             src_lines = src.readlines()
-            
-            for line in src_lines:
-                flag_name = extract_flag_name(line)
-                
-                if flag_name is None:
-                    dst.write(line)
-                    continue
-                
-                # Check if we have a custom replacement for this flag
-                flag_replaced = False
-                for custom_flag in idf_config_flags[:]:  # Create copy for safe removal
-                    custom_flag_name = extract_flag_name(custom_flag.replace("'", ""))
-                    
-                    if flag_name == custom_flag_name:
-                        cleaned_flag = custom_flag.replace("'", "")
-                        dst.write(cleaned_flag + "\n")
-                        print(f"Replace: {line.strip()} with: {cleaned_flag}")
-                        idf_config_flags.remove(custom_flag)
-                        flag_replaced = True
-                        break
-                
-                if not flag_replaced:
-                    dst.write(line)
-            
-            # Add any remaining new flags
-            for remaining_flag in idf_config_flags:
-                cleaned_flag = remaining_flag.replace("'", "")
-                print(f"Add: {cleaned_flag}")
-                dst.write(cleaned_flag + "\n")
+
+        # Skip regeneration when neither the template nor any layer changed,
+        # so sdkconfig.defaults keeps its mtime for the CMake fingerprint
+        input_hash = hashlib.sha1()
+        input_hash.update("".join(src_lines).encode("utf-8"))
+        input_hash.update(checksum.encode("utf-8"))
+        for line, _ in list(merged.values()) + extras:
+            input_hash.update(b"\0" + line.encode("utf-8"))
+        input_hash = input_hash.hexdigest()
+        stamp_path = str(Path(BUILD_DIR) / "pio-sdkconfig-defaults.json")
+        try:
+            with open(stamp_path) as fp:
+                stamp = json.load(fp)
+            with open(sdkconfig_dst, "rb") as fp:
+                output_hash = hashlib.sha1(fp.read()).hexdigest()
+            if stamp == {"inputs": input_hash, "output": output_hash}:
+                print("sdkconfig.defaults is up to date")
+                return
+        except (OSError, ValueError):
+            pass
+
+        out_lines = [f"# TASMOTA__{checksum}\n"]
+        pending = dict(merged)
+
+        # Single pass over the template: replace known flags in place
+        for line in src_lines:
+            flag_name = extract_flag_name(line)
+            custom = pending.pop(flag_name, None) if flag_name else None
+            if custom is None:
+                out_lines.append(line)
+                continue
+            out_lines.append(custom[0] + "\n")
+            print(f"Replace: {line.strip()} with: {custom[0]} ({custom[1]})")
+
+        # Add any remaining new flags
+        for line, source in list(pending.values()) + extras:
+            print(f"Add: {line} ({source})")
+            out_lines.append(line + "\n")
+
+        output = "".join(out_lines)
+        with open(sdkconfig_dst, 'w', encoding='utf-8') as dst:
+            dst.write(output)
+        try:
+            os.makedirs(BUILD_DIR, exist_ok=True)
+            with open(stamp_path, "w") as fp:
+                json.dump({
+                    "inputs": input_hash,
+                    "output": hashlib.sha1(output.encode("utf-8")).hexdigest(),
+                }, fp)
+        except OSError:
+            pass
 
     
     # Main execution logic
@@ -773,18 +827,15 @@ def HandleArduinoIDFsettings(env):
     else:
         print("*** Add \"custom_sdkconfig\" settings to IDF sdkconfig.defaults ***")
     
-    # Build complete configuration
-    idf_config_flags = build_idf_config_flags()
-    
-    # Convert to list for processing
-    idf_config_list = [line for line in idf_config_flags.splitlines() if line.strip()]
+    # Build and merge the configuration layers
+    merged, extras = merge_config_layers(build_idf_config_layers())
     
     # Write final configuration file with checksum
     custom_sdk_config_flags = ""
     if config.has_option("env:" + env["PIOENV"], "custom_sdkconfig"):
         custom_sdk_config_flags = env.GetProjectOption("custom_sdkconfig").rstrip("\n") + "\n"
     
-    write_sdkconfig_file(idf_config_list, custom_sdk_config_flags)
+    write_sdkconfig_file(merged, extras, custom_sdk_config_flags)
 
 
 
@@ -842,42 +893,142 @@ def get_project_lib_includes(env):
 
     return paths
 
-def is_cmake_reconfigure_required(cmake_api_reply_dir):
-    cmake_cache_file = str(Path(BUILD_DIR) / "CMakeCache.txt")
+CMAKE_FINGERPRINT_FILE = "pio-cmake-fingerprint.json"
+
+
+def _file_digest(path, filter_lines=None):
+    if not os.path.isfile(path):
+        return "missing"
+    with open(path, "rb") as fp:
+        data = fp.read()
+    if filter_lines:
+        data = b"\n".join(
+            line for line in data.splitlines() if filter_lines(line.strip())
+        )
+    return hashlib.sha1(data).hexdigest()
+
+
+def _is_sdkconfig_value(line):
+    # "# CONFIG_FOO is not set" is a value; other comments and blanks are not
+    return bool(line) and (
+        not line.startswith(b"#") or line.endswith(b" is not set")
+    )
+
+
+def get_cmake_fingerprint(src_dir, extra_args=None):
+    """Content hashes of everything a CMake configure step depends on.
+
+    Returns {input label: digest}. Unlike mtimes, these do not change when
+    PlatformIO or our tooling rewrites a file with identical contents.
+    """
+    project_dir = Path(PROJECT_DIR)
+    inputs = {
+        "source CMakeLists.txt": Path(src_dir) / "CMakeLists.txt",
+        "project CMakeLists.txt": project_dir / "CMakeLists.txt",
+        "src CMakeLists.txt": Path(PROJECT_SRC_DIR) / "CMakeLists.txt",
+        "sdkconfig.defaults": project_dir / "sdkconfig.defaults",
+        "dependencies.lock": project_dir / "dependencies.lock",
+        "project idf_component.yml": project_dir / "idf_component.yml",
+        "src idf_component.yml": Path(PROJECT_SRC_DIR) / "idf_component.yml",
+    }
+    for pattern in ("components/*/CMakeLists.txt", "components/*/idf_component.yml"):
+        for path in sorted(project_dir.glob(pattern)):
+            inputs[str(path.relative_to(project_dir))] = path
+
+    fingerprint = {label: _file_digest(str(path)) for label, path in inputs.items()}
+    fingerprint["sdkconfig"] = _file_digest(SDKCONFIG_PATH, _is_sdkconfig_value)
+    fingerprint["framework"] = hashlib.sha1(
+        ("%s\n%s" % (FRAMEWORK_DIR, framework_version)).encode()
+    ).hexdigest()
+    fingerprint["cmake arguments"] = hashlib.sha1(
+        "\n".join(extra_args or []).encode()
+    ).hexdigest()
+    return fingerprint
+
+
+def _fingerprint_path(cmake_api_reply_dir):
+    # <build dir>/.cmake/api/v1/reply -> <build dir>/pio-cmake-fingerprint.json
+    return str(Path(cmake_api_reply_dir).parents[3] / CMAKE_FINGERPRINT_FILE)
+
+
+def save_cmake_fingerprint(cmake_api_reply_dir, fingerprint):
+    try:
+        with open(_fingerprint_path(cmake_api_reply_dir), "w") as fp:
+            json.dump(fingerprint, fp, indent=1, sort_keys=True)
+    except OSError:
+        pass
+
+
+def _legacy_reconfigure_reason(cmake_cache_file, ninja_buildfile):
+    """The old mtime rules, used once to adopt builds without a fingerprint."""
     cmake_txt_files = [
         str(Path(PROJECT_DIR) / "CMakeLists.txt"),
         str(Path(PROJECT_SRC_DIR) / "CMakeLists.txt"),
     ]
-    cmake_preconf_dir = str(Path(BUILD_DIR) / "config")
     default_sdk_config = str(Path(PROJECT_DIR) / "sdkconfig.defaults")
     idf_deps_lock = str(Path(PROJECT_DIR) / "dependencies.lock")
-    ninja_buildfile = str(Path(BUILD_DIR) / "build.ninja")
+    cache_mtime = os.path.getmtime(cmake_cache_file)
 
-    for d in (cmake_api_reply_dir, cmake_preconf_dir):
-        if not os.path.isdir(d) or not os.listdir(d):
-            return True
-    if not os.path.isfile(cmake_cache_file):
-        return True
-    if not os.path.isfile(ninja_buildfile):
-        return True
-    if not os.path.isfile(SDKCONFIG_PATH) or os.path.getmtime(
-        SDKCONFIG_PATH
-    ) > os.path.getmtime(cmake_cache_file):
-        return True
-    if os.path.isfile(default_sdk_config) and os.path.getmtime(
-        default_sdk_config
-    ) > os.path.getmtime(cmake_cache_file):
-        return True
+    if not os.path.isfile(SDKCONFIG_PATH) or os.path.getmtime(SDKCONFIG_PATH) > cache_mtime:
+        return "sdkconfig is newer than the CMake cache"
+    if os.path.isfile(default_sdk_config) and os.path.getmtime(default_sdk_config) > cache_mtime:
+        return "sdkconfig.defaults is newer than the CMake cache"
     if os.path.isfile(idf_deps_lock) and os.path.getmtime(
         idf_deps_lock
     ) > os.path.getmtime(ninja_buildfile):
-        return True
-    if any(
-        os.path.getmtime(f) > os.path.getmtime(cmake_cache_file)
-        for f in cmake_txt_files + [cmake_preconf_dir, FRAMEWORK_DIR]
-    ):
+        return "dependencies.lock is newer than build.ninja"
+    for f in cmake_txt_files:
+        if os.path.isfile(f) and os.path.getmtime(f) > cache_mtime:
+            return "%s is newer than the CMake cache" % os.path.basename(f)
+    return None
+
+
+def is_cmake_reconfigure_required(cmake_api_reply_dir, src_dir=None, extra_args=None):
+    """Decide whether CMake must run again and log a one-line reason if so.
+
+    Besides missing build files, only a change in get_cmake_fingerprint()
+    triggers a reconfigure. The fingerprint is recorded by
+    get_cmake_code_model() after every successful configure.
+    """
+    build_dir = str(Path(cmake_api_reply_dir).parents[3])
+    cmake_cache_file = str(Path(build_dir) / "CMakeCache.txt")
+    cmake_preconf_dir = str(Path(build_dir) / "config")
+    ninja_buildfile = str(Path(build_dir) / "build.ninja")
+
+    def _required(reason):
+        print("Reconfiguring CMake project in %s: %s" % (build_dir, reason))
         return True
 
+    for d in (cmake_api_reply_dir, cmake_preconf_dir):
+        if not os.path.isdir(d) or not os.listdir(d):
+            return _required("%s is missing" % os.path.basename(d))
+    if not os.path.isfile(cmake_cache_file):
+        return _required("CMakeCache.txt is missing")
+    if not os.path.isfile(ninja_buildfile):
+        return _required("build.ninja is missing")
+    if not os.path.isfile(SDKCONFIG_PATH):
+        return _required("sdkconfig is missing")
+
+    current = get_cmake_fingerprint(src_dir or PROJECT_DIR, extra_args)
+    try:
+        with open(_fingerprint_path(cmake_api_reply_dir)) as fp:
+            recorded = json.load(fp)
+    except (OSError, ValueError):
+        recorded = None
+
+    if recorded is None:
+        reason = _legacy_reconfigure_reason(cmake_cache_file, ninja_buildfile)
+        if reason:
+            return _required(reason)
+        save_cmake_fingerprint(cmake_api_reply_dir, current)
+        return False
+
+    changed = sorted(
+        label for label in set(current) | set(recorded)
+        if current.get(label) != recorded.get(label)
+    )
+    if changed:
+        return _required("%s changed" % ", ".join(changed))
     return False
 
 
@@ -954,13 +1105,20 @@ def get_cmake_code_model(src_dir, build_dir, extra_args=None):
     if not is_proper_idf_project():
         create_default_project_files()
 
-    if is_cmake_reconfigure_required(cmake_api_reply_dir):
+    if is_cmake_reconfigure_required(cmake_api_reply_dir, src_dir, extra_args):
         run_cmake(src_dir, build_dir, extra_args)
+        save_cmake_fingerprint(
+            cmake_api_reply_dir, get_cmake_fingerprint(src_dir, extra_args)
+        )
 
     if not os.path.isdir(cmake_api_reply_dir) or not os.listdir(cmake_api_reply_dir):
         sys.stderr.write("Error: Couldn't find CMake API response file\n")
         env.Exit(1)
 
+    cached = CodeModelCache(cmake_api_reply_dir).load()
+    if cached is not None:
+        return cached.codemodel
+
     codemodel = {}
     for target in os.listdir(cmake_api_reply_dir):
         if target.startswith("codemodel-v2"):
@@ -974,6 +1132,102 @@ def get_cmake_code_model(src_dir, build_dir, extra_args=None):
     return codemodel
 
 
+class CodeModelCache(object):
+    """Binary cache of a CMake File API reply directory.
+
+    The parsed codemodel and every target JSON are pickled into one file
+    next to the reply directory, keyed by the reply's index-*.json (CMake
+    writes a new one on every reconfigure). The file holds an index
+    followed by one pickle per target, so targets are unpickled only when
+    they are accessed.
+    """
+
+    MAGIC = b"PIOCMC1\n"
+
+    def __init__(self, reply_dir):
+        self.reply_dir = reply_dir
+        self.path = str(Path(reply_dir).parent / "pio-codemodel.cache")
+
+    def key(self):
+        index_files = sorted(
+            f for f in os.listdir(self.reply_dir) if f.startswith("index-")
+        )
+        if not index_files:
+            return None
+        st = os.stat(str(Path(self.reply_dir) / index_files[-1]))
+        return (index_files[-1], st.st_size, st.st_mtime_ns)
+
+    def load(self):
+        """Return a LazyTargetConfigs for an up-to-date cache, else None."""
+        try:
+            key = self.key()
+            with open(self.path, "rb") as fp:
+                if fp.read(len(self.MAGIC)) != self.MAGIC:
+                    return None
+                header = pickle.load(fp)
+                data_start = fp.tell()
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if key is None or header.get("key") != key:
+            return None
+        return LazyTargetConfigs(
+            self.path, data_start, header["codemodel"], header["targets"]
+        )
+
+    def store(self, codemodel, configs):
+        blobs = []
+        targets = {}
+        offset = 0
+        for name, config in configs.items():
+            blob = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+            targets[name] = (config.get("type"), offset, len(blob))
+            blobs.append(blob)
+            offset += len(blob)
+        header = {"key": self.key(), "codemodel": codemodel, "targets": targets}
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as fp:
+                fp.write(self.MAGIC)
+                pickle.dump(header, fp, pickle.HIGHEST_PROTOCOL)
+                for blob in blobs:
+                    fp.write(blob)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # the cache is an optimization only
+
+
+class LazyTargetConfigs(Mapping):
+    """Read-only target name -> config mapping backed by a CodeModelCache.
+
+    Configs are unpickled on first access and then kept, so callers may
+    annotate them (e.g. nameOnDisk) just like the dicts from json.load.
+    """
+
+    def __init__(self, path, data_start, codemodel, targets):
+        self.path = path
+        self.data_start = data_start
+        self.codemodel = codemodel
+        self.targets = targets
+        self._loaded = {}
+
+    def target_type(self, name):
+        return self.targets[name][0]
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            _, offset, length = self.targets[name]
+            with open(self.path, "rb") as fp:
+                fp.seek(self.data_start + offset)
+                self._loaded[name] = pickle.loads(fp.read(length))
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self.targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+
 def populate_idf_env_vars(idf_env):
     idf_env["IDF_PATH"] = fs.to_unix_path(FRAMEWORK_DIR)
     NINJA_DIR = platform.get_package_dir("tool-ninja")
@@ -1003,6 +1257,11 @@ def get_target_config(project_configs, target_index, cmake_api_reply_dir):
 
 
 def load_target_configurations(cmake_codemodel, cmake_api_reply_dir):
+    cache = CodeModelCache(cmake_api_reply_dir)
+    cached = cache.load()
+    if cached is not None:
+        return cached
+
     configs = {}
     project_configs = cmake_codemodel.get("configurations")[0]
     for config in project_configs.get("projects", []):
@@ -1012,6 +1271,7 @@ def load_target_configurations(cmake_codemodel, cmake_api_reply_dir):
             )
             configs[target_config["name"]] = target_config
 
+    cache.store(cmake_codemodel, configs)
     return configs
 
 
@@ -1405,7 +1665,25 @@ def _fix_component_relative_include(config, build_flags, source_index):
     return build_flags
 
 
+# Interned compile-group environments, see prepare_build_envs()
+_build_env_cache = {}
+_build_env_stats = {"requested": 0, "unique": 0}
+
+# Construction variables of the parent env that shape a cloned compile env
+_BUILD_ENV_PARENT_VARS = (
+    "CCFLAGS", "CFLAGS", "CXXFLAGS", "ASFLAGS", "ASPPFLAGS",
+    "CPPDEFINES", "CPPPATH", "BUILD_UNFLAGS",
+)
+
+
 def prepare_build_envs(config, default_env, debug_allowed=True):
+    """Return one SCons environment per compile group of config.
+
+    Most components share byte-identical flag sets, so environments are
+    interned: a group whose normalized (flags, defines, includes,
+    language) tuple was seen before, against an unchanged parent env,
+    reuses the environment cloned for it instead of cloning again.
+    """
     build_envs = []
     target_compile_groups = config.get("compileGroups", [])
     if not target_compile_groups:
@@ -1414,6 +1692,9 @@ def prepare_build_envs(config, default_env, debug_allowed=True):
         )
 
     is_build_type_debug = "debug" in env.GetBuildType() and debug_allowed
+    parent_key = (id(default_env),) + tuple(
+        repr(default_env.get(var)) for var in _BUILD_ENV_PARENT_VARS
+    )
     for cg in target_compile_groups:
         includes = []
         sys_includes = []
@@ -1425,26 +1706,43 @@ def prepare_build_envs(config, default_env, debug_allowed=True):
                 includes.append(inc_path)
 
         defines = extract_defines(cg)
-        compile_commands = cg.get("compileCommandFragments", [])
-        build_env = default_env.Clone()
-        build_env.SetOption("implicit_cache", 1)
-        for cc in compile_commands:
+        language = cg.get("language", "")
+        fragments = []
+        for cc in cg.get("compileCommandFragments", []):
             build_flags = cc.get("fragment", "").strip("\" ")
             if not build_flags.startswith("-D"):
                 if build_flags.startswith("-include") and ".." in build_flags:
                     source_index = cg.get("sourceIndexes")[0]
                     build_flags = _fix_component_relative_include(
                         config, build_flags, source_index)
-                parsed_flags = build_env.ParseFlags(build_flags)
-                build_env.AppendUnique(**parsed_flags)
-                if cg.get("language", "") == "ASM":
-                    build_env.AppendUnique(ASPPFLAGS=parsed_flags.get("CCFLAGS", []))
+                fragments.append(build_flags)
+
+        _build_env_stats["requested"] += 1
+        key = parent_key + (
+            tuple(fragments), repr(defines), tuple(includes),
+            tuple(sys_includes), language, is_build_type_debug,
+        )
+        cached = _build_env_cache.get(key)
+        if cached is not None:
+            build_envs.append(cached[1])
+            continue
+
+        build_env = default_env.Clone()
+        build_env.SetOption("implicit_cache", 1)
+        for build_flags in fragments:
+            parsed_flags = build_env.ParseFlags(build_flags)
+            build_env.AppendUnique(**parsed_flags)
+            if language == "ASM":
+                build_env.AppendUnique(ASPPFLAGS=parsed_flags.get("CCFLAGS", []))
         build_env.AppendUnique(CPPDEFINES=defines, CPPPATH=includes)
         if sys_includes:
             build_env.Append(CCFLAGS=[("-isystem", inc) for inc in sys_includes])
         build_env.ProcessUnFlags(default_env.get("BUILD_UNFLAGS"))
         if is_build_type_debug:
             build_env.ConfigureDebugFlags()
+        # Keep default_env referenced so its id() cannot be reused
+        _build_env_cache[key] = (default_env, build_env)
+        _build_env_stats["unique"] += 1
         build_envs.append(build_env)
 
     return build_envs
@@ -1760,6 +2058,15 @@ def build_bootloader(sdk_config):
 def get_targets_by_type(target_configs, target_types, ignore_targets=None):
     ignore_targets = ignore_targets or []
     result = []
+    if isinstance(target_configs, LazyTargetConfigs):
+        # Filter on the cached index so unrelated targets stay unloaded
+        for name in target_configs:
+            if (
+                target_configs.target_type(name) in target_types
+                and name not in ignore_targets
+            ):
+                result.append(target_configs[name])
+        return result
     for target_config in target_configs.values():
         if (
             target_config["type"] in target_types
@@ -1869,48 +2176,18 @@ def get_partition_info(pt_path, pt_offset, pt_params):
         )
         env.Exit(1)
 
-    cmd = [
-        get_python_exe(),
-        str(Path(FRAMEWORK_DIR) / "components" / "partition_table" / "parttool.py"),
-        "-q",
-        "--partition-table-offset",
-        hex(pt_offset),
-        "--partition-table-file",
-        pt_path,
-        "get_partition_info",
-        "--info",
-        "size",
-        "offset",
-    ]
-
-    if pt_params.get("name") == "boot":
-        cmd.append("--partition-boot-default")
-    else:
-        cmd.extend(
-            [
-                "--partition-type",
-                pt_params["type"],
-                "--partition-subtype",
-                pt_params["subtype"],
-            ]
-        )
-
-    result = exec_command(cmd)
-    if result["returncode"] != 0:
+    # Parsed in-process and memoized per (CSV, mtime, offset); this used to
+    # start a parttool.py interpreter for every single lookup.
+    try:
+        return esp_partitions.load(pt_path, pt_offset).info(pt_params)
+    except esp_partitions.PartitionTableError as e:
         sys.stderr.write(
             "Couldn't extract information for %s/%s from the partition table\n"
             % (pt_params["type"], pt_params["subtype"])
         )
-        sys.stderr.write(result["out"] + "\n")
-        sys.stderr.write(result["err"] + "\n")
+        sys.stderr.write("%s: %s\n" % (pt_path, e))
         env.Exit(1)
 
-    size = offset = 0
-    if result["out"].strip():
-        size, offset = result["out"].strip().split(" ", 1)
-
-    return {"size": size, "offset": offset}
-
 
 def get_app_partition_offset(pt_table, pt_offset):
     # Get the default boot partition offset
@@ -2042,6 +2319,33 @@ def _get_uv_exe():
     return get_executable_path(str(Path(PLATFORMIO_DIR) / "penv"), "uv")
 
 
+def get_python_deps():
+    deps = {
+        # https://github.com/platformio/platformio-core/issues/4614
+        "urllib3": "<2",
+        # https://github.com/platformio/platform-espressif32/issues/635
+        "cryptography": "~=44.0.0",
+        "pyparsing": ">=3.1.0,<4",
+        "idf-component-manager": "~=2.4.6",
+        "esp-idf-kconfig": "~=2.5.0"
+    }
+
+    if sys_platform.system() == "Darwin" and "arm" in sys_platform.machine().lower():
+        deps["chardet"] = ">=3.0.2,<4"
+
+    if IS_WINDOWS:
+        # Required by menuconfig in the IDF Python environment
+        deps["windows-curses"] = ""
+
+    return deps
+
+
+def get_python_deps_hash():
+    return hashlib.sha1(
+        json.dumps(get_python_deps(), sort_keys=True).encode("utf8")
+    ).hexdigest()
+
+
 def install_python_deps():
     UV_EXE = _get_uv_exe()
 
@@ -2065,19 +2369,7 @@ def install_python_deps():
     if os.path.isfile(skip_python_packages):
         return
 
-    deps = {
-        # https://github.com/platformio/platformio-core/issues/4614
-        "urllib3": "<2",
-        # https://github.com/platformio/platform-espressif32/issues/635
-        "cryptography": "~=44.0.0",
-        "pyparsing": ">=3.1.0,<4",
-        "idf-component-manager": "~=2.4.6",
-        "esp-idf-kconfig": "~=2.5.0"
-    }
-
-    if sys_platform.system() == "Darwin" and "arm" in sys_platform.machine().lower():
-        deps["chardet"] = ">=3.0.2,<4"
-
+    deps = get_python_deps()
     python_exe_path = get_python_exe()
     installed_packages = _get_installed_uv_packages(python_exe_path)
     packages_to_install = []
@@ -2100,15 +2392,6 @@ def install_python_deps():
             )
         )
 
-    if IS_WINDOWS and "windows-curses" not in installed_packages:
-        # Install windows-curses in the IDF Python environment
-        env.Execute(
-            env.VerboseAction(
-                f'"{UV_EXE}" pip install --python "{python_exe_path}" windows-curses',
-                "Installing windows-curses package with uv",
-            )
-        )
-
 
 def get_idf_venv_dir():
     # The name of the IDF venv contains the IDF version to avoid possible conflicts and
@@ -2135,27 +2418,51 @@ def ensure_python_venv_available():
             print("Failed to extract Python version from IDF virtual env!")
             return None
 
-    def _is_venv_outdated(venv_data_file):
+    def _get_interpreter_stamp():
+        # Path, size and mtime of the real interpreter behind the venv: if
+        # they are unchanged, so is its version, without spawning Python
+        python_exe_path = os.path.realpath(get_python_exe())
+        try:
+            stat = os.stat(python_exe_path)
+        except OSError:
+            return None
+        return [python_exe_path, stat.st_size, int(stat.st_mtime)]
+
+    def _load_venv_data(venv_data_file):
         try:
             with open(venv_data_file, "r", encoding="utf8") as fp:
-                venv_data = json.load(fp)
-                if venv_data.get("version", "") != IDF_ENV_VERSION:
-                    print(
-                        "Warning! IDF virtual environment version changed!"
-                    )
-                    return True
-                if (
-                    venv_data.get("python_version", "")
-                    != _get_idf_venv_python_version()
-                ):
-                    print(
-                        "Warning! Python version in the IDF virtual environment"
-                        " differs from the current Python!"
-                    )
-                    return True
-                return False
+                return json.load(fp)
         except (OSError, ValueError):
+            return None
+
+    def _is_venv_outdated(venv_data):
+        if venv_data.get("version", "") != IDF_ENV_VERSION:
+            print(
+                "Warning! IDF virtual environment version changed!"
+            )
             return True
+        if venv_data.get("interpreter") == _get_interpreter_stamp():
+            return False
+        if (
+            venv_data.get("python_version", "")
+            != _get_idf_venv_python_version()
+        ):
+            print(
+                "Warning! Python version in the IDF virtual environment"
+                " differs from the current Python!"
+            )
+            return True
+        return False
+
+    def _save_venv_data(venv_data_file):
+        with open(venv_data_file, "w", encoding="utf8") as fp:
+            venv_info = {
+                "version": IDF_ENV_VERSION,
+                "python_version": _get_idf_venv_python_version(),
+                "interpreter": _get_interpreter_stamp(),
+                "deps_hash": get_python_deps_hash(),
+            }
+            json.dump(venv_info, fp, indent=2)
 
     def _create_venv(venv_dir):
         uv_path = _get_uv_exe()
@@ -2187,15 +2494,18 @@ def ensure_python_venv_available():
 
     venv_dir = get_idf_venv_dir()
     venv_data_file = str(Path(venv_dir) / "pio-idf-venv.json")
-    if not os.path.isfile(venv_data_file) or _is_venv_outdated(venv_data_file):
+    venv_data = _load_venv_data(venv_data_file)
+    if venv_data is None or _is_venv_outdated(venv_data):
         _create_venv(venv_dir)
         install_python_deps()
-        with open(venv_data_file, "w", encoding="utf8") as fp:
-            venv_info = {
-                "version": IDF_ENV_VERSION,
-                "python_version": _get_idf_venv_python_version()
-            }
-            json.dump(venv_info, fp, indent=2)
+        _save_venv_data(venv_data_file)
+    elif venv_data.get("deps_hash") != get_python_deps_hash():
+        # The venv is current but the required packages changed
+        install_python_deps()
+        _save_venv_data(venv_data_file)
+    elif venv_data.get("interpreter") != _get_interpreter_stamp():
+        # Same Python version behind a touched interpreter, refresh the stamp
+        _save_venv_data(venv_data_file)
 
 
 def get_python_exe():
@@ -2466,7 +2776,8 @@ env.Replace(
         str(Path(fwpartitions_dir) / partitions_csv)
         if os.path.isfile(str(Path(fwpartitions_dir) / partitions_csv))
         else partitions_csv
-    )
+    ),
+    PARTITIONS_TABLE_OFFSET=partition_table_offset,
 )
 
 partition_table = env.Command(
@@ -2642,7 +2953,18 @@ if ("arduino" in env.subst("$PIOFRAMEWORK")) and ("espidf" not in env.subst("$PI
         lib_src = str(Path(env_build) / "esp-idf")
         lib_dst = str(Path(arduino_libs) / chip_variant / "lib")
         ld_dst = str(Path(arduino_libs) / chip_variant / "ld")
-        mem_var = str(Path(arduino_libs) / chip_variant / board.get("build.arduino.memory_type", (board.get("build.flash_mode", "dio") + "_qspi")))
+        mem_var_name = board.get("build.arduino.memory_type", (board.get("build.flash_mode", "dio") + "_qspi"))
+        mem_var = str(Path(arduino_libs) / chip_variant / mem_var_name)
+        # Keep the stock libraries in the local store before the first
+        # overwrite, so envs without custom_sdkconfig can switch back
+        lib_store = arduino_lib_store.from_env(env)
+        arduino_version = arduino_lib_store.framework_version(ARDUINO_FRAMEWORK_DIR)
+        stock_key = arduino_lib_store.set_key(arduino_version, chip_variant, arduino_lib_store.STOCK)
+        if not os.path.isfile(str(Path(arduino_libs) / "sdkconfig")) and not lib_store.has(stock_key):
+            try:
+                lib_store.save(stock_key, arduino_libs, arduino_lib_store.set_files(arduino_libs, chip_variant, mem_var_name))
+            except OSError as e:
+                print(f"Warning: Could not store stock Arduino IDF libraries: {e}")
         # Ensure destinations exist
         for d in (lib_dst, ld_dst, mem_var, str(Path(mem_var) / "include")):
             Path(d).mkdir(parents=True, exist_ok=True)
@@ -2669,6 +2991,20 @@ if ("arduino" in env.subst("$PIOFRAMEWORK")) and ("espidf" not in env.subst("$PI
             shutil.move(str(Path(arduino_libs) / chip_variant / "sdkconfig"), str(Path(arduino_libs) / chip_variant / "sdkconfig.orig"))
         shutil.copyfile(str(Path(env.subst("$PROJECT_DIR")) / ("sdkconfig." + env["PIOENV"])), str(Path(arduino_libs) / chip_variant / "sdkconfig"))
         shutil.copyfile(str(Path(env.subst("$PROJECT_DIR")) / ("sdkconfig." + env["PIOENV"])), str(Path(arduino_libs) / "sdkconfig"))
+        # Keep this set too, keyed by the custom sdkconfig hash, so switching
+        # back to this env later restores it instead of rebuilding IDF
+        sdkconfig_defaults = str(Path(env.subst("$PROJECT_DIR")) / "sdkconfig.defaults")
+        custom_hash = arduino_lib_store.sdkconfig_hash(sdkconfig_defaults)
+        if custom_hash:
+            try:
+                lib_store.save(
+                    arduino_lib_store.set_key(arduino_version, chip_variant, custom_hash),
+                    arduino_libs,
+                    arduino_lib_store.set_files(arduino_libs, chip_variant, mem_var_name),
+                    {"sdkconfig.defaults": sdkconfig_defaults},
+                )
+            except OSError as e:
+                print(f"Warning: Could not store compiled Arduino IDF libraries: {e}")
         try:
             # clean env build folder to avoid issues with following Arduino build
             shutil.rmtree(env_build)
@@ -2803,3 +3139,9 @@ env.Replace(ESP32_APP_OFFSET=app_offset)
 env["INTEGRATION_EXTRA_DATA"].update(
     {"application_offset": env.subst("$ESP32_APP_OFFSET")}
 )
+
+if int(ARGUMENTS.get("PIOVERBOSE", 0)):
+    print(
+        "ESP-IDF build environments: %d unique for %d compile groups"
+        % (_build_env_stats["unique"], _build_env_stats["requested"])
+    )
@@ -20,12 +20,19 @@ https://github.com/zephyrproject-rtos/zephyr
 """
 
 from os.path import join
+import hashlib
 import subprocess
 import os
 import json
 import shutil
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from SCons.Script import Import, SConscript
+from platformio.package.lockfile import (
+    LockFile,
+    LockFileExists,
+    LockFileTimeoutError,
+)
 try:
     import yaml
 except ImportError:
@@ -64,6 +71,14 @@ platform_boards_dir = join(platform_dir, "zephyr", "boards", "arm")
 framework_boards_dir = join(framework_dir, "boards", "arm")
 framework_vendor_boards_dir = join(framework_dir, "boards", "seeed")
 
+# Several `pio run` processes can share one framework package (e.g. parallel CI
+# example builds with --jobs). Everything below that writes into the package
+# (board copies, platformio-build.py patches, module provisioning, fixes) and
+# the CMake configure run by platformio-build.py is serialized on this lock.
+# The OS drops the lock if the build process dies, so it never goes stale.
+_provision_lock = LockFile(join(framework_dir, ".xiao-provision"))
+_provision_lock.acquire()
+
 def _get_framework_version():
     global framework_version
     if framework_version:
@@ -95,30 +110,129 @@ def _board_copy_mode():
     return "refresh"
 
 
+# Content manifest of the board files synced into the framework package:
+# {"<board>/<path>": {"size", "mtime", "sha256"}} of the platform source.
+board_manifest_path = join(framework_dir, ".xiao-boards.json")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_board_manifest():
+    try:
+        with open(board_manifest_path, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_board_manifest(manifest):
+    tmp_path = board_manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=1, sort_keys=True)
+    os.replace(tmp_path, board_manifest_path)
+
+
+def _sync_board_dir(board, src, dst, manifest):
+    """Mirror src into dst, writing only files whose content changed.
+
+    Unchanged files keep their mtime, so Zephyr's CMake does not see the
+    board as modified. Returns the number of files written or removed.
+    """
+    if os.path.islink(dst) or (os.path.exists(dst) and not os.path.isdir(dst)):
+        os.remove(dst)
+
+    changed = 0
+    wanted = set()
+    for root, _, files in os.walk(src):
+        for name in files:
+            src_file = join(root, name)
+            rel = os.path.relpath(src_file, src).replace(os.sep, "/")
+            key = board + "/" + rel
+            dst_file = join(dst, rel)
+            wanted.add(key)
+
+            stat = os.stat(src_file)
+            entry = manifest.get(key)
+            dst_ok = (
+                os.path.isfile(dst_file)
+                and os.path.getsize(dst_file) == stat.st_size
+            )
+            if (
+                dst_ok
+                and entry
+                and entry["size"] == stat.st_size
+                and entry["mtime"] == stat.st_mtime_ns
+            ):
+                continue
+
+            digest = _file_sha256(src_file)
+            if entry is None and dst_ok:
+                # No record yet: trust an identical copy left by older syncs
+                same = _file_sha256(dst_file) == digest
+            else:
+                same = dst_ok and entry is not None and entry["sha256"] == digest
+            if not same:
+                os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+                shutil.copyfile(src_file, dst_file)
+                changed += 1
+            manifest[key] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "sha256": digest,
+            }
+
+    # Drop files that no longer exist in the platform copy
+    for root, dirs, files in os.walk(dst, topdown=False):
+        for name in files:
+            dst_file = join(root, name)
+            rel = os.path.relpath(dst_file, dst).replace(os.sep, "/")
+            if board + "/" + rel not in wanted:
+                os.remove(dst_file)
+                changed += 1
+        if root != dst and not os.listdir(root):
+            os.rmdir(root)
+    for key in [k for k in manifest if k.startswith(board + "/")]:
+        if key not in wanted:
+            del manifest[key]
+    return changed
+
+
 if os.path.isdir(platform_boards_dir):
     os.makedirs(framework_vendor_boards_dir, exist_ok=True)
-    import shutil
     board_copy_mode = _board_copy_mode()
+    board_manifest = _load_board_manifest()
+    synced_boards = set()
     for board_name_dir in os.listdir(platform_boards_dir):
         src = join(platform_boards_dir, board_name_dir)
         dst = join(framework_vendor_boards_dir, board_name_dir)
         stale_arm_dst = join(framework_boards_dir, board_name_dir)
         if not os.path.isdir(src):
             continue
+        synced_boards.add(board_name_dir)
         if os.path.isdir(stale_arm_dst):
             shutil.rmtree(stale_arm_dst)
         if board_copy_mode == "missing-only" and os.path.exists(dst):
             continue
-        # Refresh copied board definitions on every build so local DTS/Kconfig
-        # changes always override any stale board copies inside the framework.
-        if os.path.islink(dst) and not os.path.exists(dst):
-            os.remove(dst)
-        elif os.path.isdir(dst):
-            shutil.rmtree(dst)
-        elif os.path.exists(dst):
-            os.remove(dst)
-        shutil.copytree(src, dst)
-        print(f"Copied board: {board_name_dir} -> {dst}")
+        # Sync board definitions on every build so local DTS/Kconfig changes
+        # always override stale copies, touching only the files that differ.
+        changed = _sync_board_dir(board_name_dir, src, dst, board_manifest)
+        if changed:
+            print(f"Synced board: {board_name_dir} ({changed} files) -> {dst}")
+    # Remove boards this sync created that the platform no longer ships
+    for key in list(board_manifest):
+        removed_board = key.split("/", 1)[0]
+        if removed_board not in synced_boards:
+            shutil.rmtree(
+                join(framework_vendor_boards_dir, removed_board), ignore_errors=True
+            )
+            del board_manifest[key]
+    _save_board_manifest(board_manifest)
 
 import re
 import time
@@ -158,6 +272,49 @@ def _clear_problematic_pip_cache():
                     pass
 
 
+ZEPHYR_VENV_VERSION = "1.0.0"
+
+ZEPHYR_PINNED_DEPS = [
+    "pyelftools~=0.27",
+    "PyYAML~=6.0.0",
+    "pykwalify~=1.8.0",
+    "packaging~=23.1.0",
+    "cryptography>=2.6.0",
+    "intelhex~=2.3.0",
+    "click~=8.1.3",
+    "cbor2~=5.4.6",
+    "jsonschema~=4.25.1",
+]
+if os.name == "nt":
+    ZEPHYR_PINNED_DEPS.append("windows-curses")
+
+
+def _get_zephyr_wheelhouse():
+    """Local wheel directory for offline installs (custom_zephyr_wheelhouse)."""
+    wheelhouse = env.GetProjectOption("custom_zephyr_wheelhouse", "").strip()
+    if not wheelhouse:
+        return None
+    wheelhouse = os.path.join(env.subst("$PROJECT_DIR"), os.path.expanduser(wheelhouse))
+    if not os.path.isdir(wheelhouse):
+        raise RuntimeError(f"custom_zephyr_wheelhouse not found: {wheelhouse}")
+    return os.path.abspath(wheelhouse)
+
+
+def _zephyr_deps_hash(requirements, wheelhouse):
+    digest = hashlib.sha1()
+    with open(requirements, "rb") as fp:
+        digest.update(fp.read())
+    digest.update("\n".join(ZEPHYR_PINNED_DEPS).encode("utf-8"))
+    digest.update(str(wheelhouse).encode("utf-8"))
+    if wheelhouse:
+        # Wheels replaced in the same directory must be installed as well
+        for name in sorted(os.listdir(wheelhouse)):
+            path = join(wheelhouse, name)
+            if os.path.isfile(path):
+                digest.update(("\n%s %d" % (name, os.path.getsize(path))).encode("utf-8"))
+    return digest.hexdigest()
+
+
 def _ensure_zephyr_python_env():
     venv_dir = _get_zephyr_venv_dir()
     venv_data_file = join(venv_dir, "pio-zephyr-venv.json")
@@ -167,18 +324,20 @@ def _ensure_zephyr_python_env():
         "python" + (".exe" if os.name == "nt" else ""),
     )
 
+    venv_data = {}
     recreate = not os.path.isfile(python_exe)
     if not recreate and os.path.isfile(venv_data_file):
         try:
             with open(venv_data_file, "r", encoding="utf-8") as fp:
                 venv_data = json.load(fp)
-            recreate = venv_data.get("version") != "1.0.0"
+            recreate = venv_data.get("version") != ZEPHYR_VENV_VERSION
         except Exception:
             recreate = True
     elif not os.path.isfile(venv_data_file):
         recreate = True
 
     if recreate:
+        venv_data = {}
         if os.path.isdir(venv_dir):
             shutil.rmtree(venv_dir, ignore_errors=True)
         subprocess.run(
@@ -186,49 +345,34 @@ def _ensure_zephyr_python_env():
             check=True,
         )
         os.makedirs(venv_dir, exist_ok=True)
-        with open(venv_data_file, "w", encoding="utf-8") as fp:
-            json.dump({"version": "1.0.0"}, fp, indent=2)
 
+    # Only install when the requirements file, the pinned list or the
+    # wheel source changed since the last successful provisioning
     requirements = join(framework_dir, "scripts", "requirements-base.txt")
-    _clear_problematic_pip_cache()
-    subprocess.run(
-        [
-            python_exe,
-            "-m",
-            "pip",
-            "install",
-            "--no-cache-dir",
-            "--disable-pip-version-check",
-            "-r",
-            requirements,
-        ],
-        check=True,
-    )
-    pinned_deps = [
-        "pyelftools~=0.27",
-        "PyYAML~=6.0.0",
-        "pykwalify~=1.8.0",
-        "packaging~=23.1.0",
-        "cryptography>=2.6.0",
-        "intelhex~=2.3.0",
-        "click~=8.1.3",
-        "cbor2~=5.4.6",
-        "jsonschema~=4.25.1",
+    wheelhouse = _get_zephyr_wheelhouse()
+    deps_hash = _zephyr_deps_hash(requirements, wheelhouse)
+    if venv_data.get("deps_hash") == deps_hash:
+        return
+
+    pip_install = [
+        python_exe,
+        "-m",
+        "pip",
+        "install",
+        "--disable-pip-version-check",
     ]
-    if os.name == "nt":
-        pinned_deps.append("windows-curses")
-    subprocess.run(
-        [
-            python_exe,
-            "-m",
-            "pip",
-            "install",
-            "--no-cache-dir",
-            "--disable-pip-version-check",
-            *pinned_deps,
-        ],
-        check=True,
-    )
+    if wheelhouse:
+        pip_install += ["--no-index", "--find-links", wheelhouse]
+    else:
+        _clear_problematic_pip_cache()
+        pip_install.append("--no-cache-dir")
+    subprocess.run(pip_install + ["-r", requirements], check=True)
+    subprocess.run(pip_install + ZEPHYR_PINNED_DEPS, check=True)
+
+    with open(venv_data_file, "w", encoding="utf-8") as fp:
+        json.dump(
+            {"version": ZEPHYR_VENV_VERSION, "deps_hash": deps_hash}, fp, indent=2
+        )
 
 
 def _ensure_minimal_west_workspace(framework_dir):
@@ -614,10 +758,115 @@ def _git_clone_with_retry(url, dst, revision, max_retries=3, retry_delay=5):
     return False
 
 
+WEST_PREFETCH_JOBS = 4
+
+
+def _get_west_mirror_dir():
+    """Bare mirror store shared by every framework version.
+
+    Set with custom_zephyr_west_mirror; "off" clones straight from the
+    remotes as before.
+    """
+    mirror_dir = env.GetProjectOption("custom_zephyr_west_mirror", "").strip()
+    if mirror_dir.lower() in ("off", "no", "false", "0"):
+        return None
+    if not mirror_dir:
+        return join(env.subst("$PROJECT_CORE_DIR"), ".cache", "zephyr-west-mirror")
+    return os.path.join(env.subst("$PROJECT_DIR"), os.path.expanduser(mirror_dir))
+
+
+def _run_git_with_retry(args, label, max_retries=3, retry_delay=5):
+    for attempt in range(1, max_retries + 1):
+        try:
+            subprocess.run(["git"] + args, check=True, capture_output=True, text=True)
+            return True
+        except subprocess.CalledProcessError as e:
+            if attempt < max_retries:
+                print(f"  {label} failed (attempt {attempt}): {e.stderr.strip() if e.stderr else e}")
+                time.sleep(retry_delay)
+            else:
+                print(f"  {label} FAILED after {max_retries} attempts")
+    return False
+
+
+def _git_has_revision(repo, revision):
+    return subprocess.run(
+        ["git", "-C", repo, "cat-file", "-e", (revision or "HEAD") + "^{commit}"],
+        capture_output=True,
+    ).returncode == 0
+
+
+def _update_mirror(mirror_dir, url, revision):
+    """Return a bare mirror of url holding revision, fetching only if needed."""
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", url.split("://", 1)[-1]).strip("_")
+    if not name.endswith(".git"):
+        name += ".git"
+    mirror = join(mirror_dir, name)
+    os.makedirs(mirror_dir, exist_ok=True)
+    # Several framework versions (and so build processes) share the store
+    lock = LockFile(mirror)
+    lock.acquire()
+    try:
+        if not os.path.isdir(mirror):
+            partial = mirror + ".partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            print(f"  Mirroring {url}")
+            if not _run_git_with_retry(["clone", "--mirror", url, partial], url):
+                shutil.rmtree(partial, ignore_errors=True)
+                return None
+            os.replace(partial, mirror)
+        elif not _is_commit_hash(revision) or not _git_has_revision(mirror, revision):
+            # Branches move and unknown commits need new objects; a failed
+            # fetch still leaves a usable mirror when offline
+            if not _run_git_with_retry(
+                ["-C", mirror, "fetch", "--prune", "--tags", "origin"], url,
+                max_retries=2,
+            ):
+                print(f"  Using cached mirror of {url}")
+        return mirror if _git_has_revision(mirror, revision) else None
+    finally:
+        lock.release()
+
+
+def _prefetch_west_project(name, url, dst, revision, mirror_dir):
+    """Populate dst at revision, atomically; a local copy when mirrored."""
+    partial = dst + ".partial"
+    # A leftover from an interrupted run is discarded and redone
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+
+    mirror = _update_mirror(mirror_dir, url, revision) if mirror_dir else None
+    if mirror is None:
+        if not _git_clone_with_retry(url, partial, revision):
+            return False
+    else:
+        try:
+            subprocess.run(["git", "clone", "--no-checkout", mirror, partial],
+                           check=True, capture_output=True, text=True)
+            checkout = ["checkout", "--detach", revision] if _is_commit_hash(revision) \
+                else ["checkout", revision] if revision else ["checkout", "HEAD"]
+            subprocess.run(["git", "-C", partial] + checkout,
+                           check=True, capture_output=True, text=True)
+            subprocess.run(["git", "-C", partial, "remote", "set-url", "origin", url],
+                           check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            print(f"  FAILED: {name}: {e.stderr.strip() if e.stderr else e}")
+            shutil.rmtree(partial, ignore_errors=True)
+            return False
+        print(f"  OK: {name} (from mirror)")
+    os.replace(partial, dst)
+    return True
+
+
 def _preinstall_west_deps(framework_dir, platform_name_hint):
     """Pre-install west.yml dependencies with retry so that install-deps.py
     can skip them later. This avoids the clean_up() wiping everything on
-    a single clone failure."""
+    a single clone failure.
+
+    Projects are fetched concurrently through a local bare-mirror store, so
+    re-provisioning (another framework version, a wiped package) is a local
+    copy and works offline once the mirror holds the wanted revisions.
+    """
     west_yml = join(framework_dir, "west.yml")
     if not os.path.isfile(west_yml):
         return
@@ -639,8 +888,7 @@ def _preinstall_west_deps(framework_dir, platform_name_hint):
     if not required_hal_modules:
         return
 
-    print("Pre-installing Zephyr west dependencies (with retry)...")
-
+    pending = []
     for proj in manifest.get("projects", []):
         name = proj.get("name", "")
         proj_path = proj.get("path", name)
@@ -673,12 +921,21 @@ def _preinstall_west_deps(framework_dir, platform_name_hint):
             repo_path = proj.get("repo-path", name)
             proj_url = url_base.rstrip("/") + "/" + repo_path + ".git"
 
-        revision = proj.get("revision")
-        print(f"Pre-installing: {name}")
-        os.makedirs(os.path.dirname(dst), exist_ok=True)
-        _git_clone_with_retry(proj_url, dst, revision)
+        pending.append((name, proj_url, dst, proj.get("revision")))
 
-    print("Pre-install complete.")
+    if not pending:
+        return
+
+    print("Pre-installing %d Zephyr west dependencies (with retry)..." % len(pending))
+    mirror_dir = _get_west_mirror_dir()
+    with ThreadPoolExecutor(max_workers=min(WEST_PREFETCH_JOBS, len(pending))) as executor:
+        results = list(executor.map(
+            lambda item: _prefetch_west_project(*item, mirror_dir), pending))
+    failed = [item[0] for item, ok in zip(pending, results) if not ok]
+    if failed:
+        print("Pre-install incomplete, install-deps.py will retry: %s" % ", ".join(failed))
+    else:
+        print("Pre-install complete.")
 
 
 # ---------------------------------------------------------------------------
@@ -690,18 +947,19 @@ def _preinstall_west_deps(framework_dir, platform_name_hint):
 # `CONFIG_NRF_EDGEAI=y` in prj.conf, so non-edge-AI samples (e.g. zephyr-blink)
 # are unaffected. The module source is provisioned three ways, in order:
 #   1. XIAO_EDGE_AI_DIR / XIAO_EDGE_IMPULSE_DIR explicit developer override
-#   2. a one-time git clone (fixed revision) into the framework cache
+#   2. a one-time git clone (fixed revision) into a module store under the
+#      PlatformIO core dir, shared by every framework version and package
 # This keeps the integration off the (live) framework package and off the shared
 # board JSON, and reproducible on a fresh machine.
 # ---------------------------------------------------------------------------
 
 _EDGE_AI_REMOTE = "https://github.com/nrfconnect/sdk-edge-ai.git"
 _EDGE_AI_REVISION = "3733b1b87c41fb560be1f2a2de646b4e405f156d"  # v2.1.0
-_EDGE_AI_CACHE = join(framework_dir, "_pio", "modules", "sdk-edge-ai")
+_EDGE_AI_LINK = join(framework_dir, "_pio", "modules", "sdk-edge-ai")
 
 _EDGE_IMPULSE_REMOTE = "https://github.com/edgeimpulse/edge-impulse-sdk-zephyr.git"
 _EDGE_IMPULSE_REVISION = "69a6b8fcc23515b9d148c9a1459cb53d5efe4801"  # v1.88.1
-_EDGE_IMPULSE_CACHE = join(framework_dir, "_pio", "modules", "edge-impulse-sdk-zephyr")
+_EDGE_IMPULSE_LINK = join(framework_dir, "_pio", "modules", "edge-impulse-sdk-zephyr")
 
 
 def _prj_conf_has(token):
@@ -727,32 +985,155 @@ def _is_edge_ai_sample():
     )
 
 
-def _ensure_module(label, cache_dir, remote, revision, override_env):
+def _get_module_store_dir():
+    return join(env.subst("$PROJECT_CORE_DIR"), ".cache", "zephyr-modules")
+
+
+# Bump whenever a module patch function (_patch_edge_impulse_sdk) changes
+# what it writes, so patched modules are re-created in the module store.
+EDGE_AI_PATCH_VERSION = 1
+
+
+def _link_module(link_path, module_dir):
+    """Point the framework's _pio/modules/<name> at the stored module.
+
+    platformio-build.py discovers XIAO modules there on a CMake reconfigure.
+    Where symlinks are unavailable (Windows without developer mode) the
+    module is still registered by path through PIO_NCS_MODULES.
+    """
+    if os.path.islink(link_path):
+        if os.path.realpath(link_path) == os.path.realpath(module_dir):
+            return
+        os.remove(link_path)
+    elif os.path.isdir(link_path):
+        shutil.rmtree(link_path, ignore_errors=True)
+    elif os.path.exists(link_path):
+        os.remove(link_path)
+    os.makedirs(os.path.dirname(link_path), exist_ok=True)
+    try:
+        os.symlink(module_dir, link_path, target_is_directory=True)
+    except (OSError, NotImplementedError):
+        pass
+
+
+def _linked_store_entries():
+    """Real paths of the stored modules framework packages link to."""
+    packages_dir = os.path.dirname(framework_dir)
+    linked = set()
+    for package in os.listdir(packages_dir):
+        modules_dir = join(packages_dir, package, "_pio", "modules")
+        if not os.path.isdir(modules_dir):
+            continue
+        for name in os.listdir(modules_dir):
+            path = join(modules_dir, name)
+            if os.path.islink(path):
+                linked.add(os.path.realpath(path))
+    return linked
+
+
+def _prune_module_store(label, keep):
+    """Remove stored <label> modules no framework package links to.
+
+    Every framework version links the module it uses from its
+    _pio/modules/<name>; an entry none of them points at was left behind by
+    an older revision or patch version. _ensure_module holds an entry's lock
+    until it is linked, so a locked entry is skipped rather than waited for,
+    and the links are checked again once the lock is taken.
+    """
+    store_dir = _get_module_store_dir()
+    linked = _linked_store_entries() | {os.path.realpath(keep)}
+    for name in os.listdir(store_dir):
+        entry = join(store_dir, name)
+        if (not name.startswith(label + "-") or name.endswith((".partial", ".lock"))
+                or not os.path.isdir(entry) or os.path.realpath(entry) in linked):
+            continue
+        lock = LockFile(entry, timeout=0.1)
+        try:
+            lock.acquire()
+        except (LockFileExists, LockFileTimeoutError):
+            continue
+        try:
+            if os.path.realpath(entry) in _linked_store_entries():
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+        finally:
+            lock.release()
+        print(f"XIAO Edge AI: removed unused {name} from the module store")
+
+
+def _ensure_module(label, link_path, remote, revision, override_env, patches=()):
     """Return a valid module root (with zephyr/module.yml), cloning on demand.
 
-    Order: explicit developer override -> cached clone -> git fetch.
+    The root is the framework's link to the stored module where symlinks are
+    available, the store entry itself otherwise.
+
+    Order: explicit developer override -> module store -> git fetch.
+
+    Stored modules live under <core_dir>/.cache/zephyr-modules, keyed by
+    (remote, revision, EDGE_AI_PATCH_VERSION for patched modules), already
+    patched, so every framework version and package shares one copy and no
+    build re-applies patches. Entries no framework links to any more are
+    pruned once the current one is linked.
+    An older per-framework clone at link_path seeds the store when it is at
+    the pinned revision.
 
     The default never relies on a machine-specific NCS directory: a first build
     on Windows, Linux, macOS, or CI downloads the pinned upstream revision.
     """
-    marker = join(cache_dir, "zephyr", "module.yml")
-
     override = os.environ.get(override_env, "")
     if override and os.path.isfile(join(override, "zephyr", "module.yml")):
+        for patch in patches:
+            patch(override)
         return os.path.normpath(override)
 
-    if os.path.isfile(marker):
-        return os.path.normpath(cache_dir)
-
-    print(f"XIAO Edge AI: cloning {label} {revision} -> {cache_dir}")
-    if os.path.isdir(cache_dir):
-        shutil.rmtree(cache_dir, ignore_errors=True)
-    if not _git_clone_with_retry(remote, cache_dir, revision):
-        return None
-    if not os.path.isfile(marker):
-        print(f"XIAO Edge AI: {label} cloned but zephyr/module.yml missing")
-        return None
-    return os.path.normpath(cache_dir)
+    patch_version = str(EDGE_AI_PATCH_VERSION) if patches else ""
+    key = hashlib.sha1(
+        "\0".join([remote, revision, patch_version]).encode("utf-8")
+    ).hexdigest()[:12]
+    store_dir = _get_module_store_dir()
+    module_dir = join(store_dir, f"{label}-{revision[:12]}-{key}")
+    marker = join(module_dir, "zephyr", "module.yml")
+
+    # The lock is held until the entry is linked, so a concurrent prune
+    # cannot remove an entry that is published but not yet linked.
+    os.makedirs(store_dir, exist_ok=True)
+    lock = LockFile(module_dir)
+    lock.acquire()
+    try:
+        if not os.path.isfile(marker):
+            partial = module_dir + ".partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            legacy = (
+                os.path.isdir(link_path) and not os.path.islink(link_path)
+                and subprocess.run(
+                    ["git", "-C", link_path, "rev-parse", "HEAD"],
+                    capture_output=True, text=True,
+                ).stdout.strip() == revision
+            )
+            if legacy:
+                print(f"XIAO Edge AI: moving {label} clone into the module store")
+                shutil.move(link_path, partial)
+            else:
+                print(f"XIAO Edge AI: cloning {label} {revision} -> {module_dir}")
+                if not _git_clone_with_retry(remote, partial, revision):
+                    return None
+            if not os.path.isfile(join(partial, "zephyr", "module.yml")):
+                print(f"XIAO Edge AI: {label} cloned but zephyr/module.yml missing")
+                shutil.rmtree(partial, ignore_errors=True)
+                return None
+            for patch in patches:
+                patch(partial)
+            os.replace(partial, module_dir)
+        _link_module(link_path, module_dir)
+    finally:
+        lock.release()
+
+    if os.path.islink(link_path):
+        _prune_module_store(label, module_dir)
+        # platformio-build.py discovers the module under its link path and
+        # dedups by normalised path, so register it under the same one.
+        return os.path.normpath(link_path)
+    return os.path.normpath(module_dir)
 
 
 def _provision_xiao_dfu_module(framework_dir):
@@ -893,7 +1274,7 @@ def _provision_edge_ai():
         return
 
     ea_dir = _ensure_module(
-        "sdk-edge-ai", _EDGE_AI_CACHE, _EDGE_AI_REMOTE, _EDGE_AI_REVISION,
+        "sdk-edge-ai", _EDGE_AI_LINK, _EDGE_AI_REMOTE, _EDGE_AI_REVISION,
         "XIAO_EDGE_AI_DIR")
     if not ea_dir:
         print("XIAO Edge AI: sdk-edge-ai not available (set XIAO_EDGE_AI_DIR or "
@@ -904,11 +1285,10 @@ def _provision_edge_ai():
     # The hello_ei sample (26) also needs the Edge Impulse SDK Zephyr module.
     if _prj_conf_has("CONFIG_EDGE_IMPULSE_SDK=y"):
         ei_dir = _ensure_module(
-            "edge-impulse-sdk-zephyr", _EDGE_IMPULSE_CACHE,
+            "edge-impulse-sdk-zephyr", _EDGE_IMPULSE_LINK,
             _EDGE_IMPULSE_REMOTE, _EDGE_IMPULSE_REVISION,
-            "XIAO_EDGE_IMPULSE_DIR")
+            "XIAO_EDGE_IMPULSE_DIR", patches=(_patch_edge_impulse_sdk,))
         if ei_dir:
-            _patch_edge_impulse_sdk(ei_dir)
             modules.append(ei_dir)
         else:
             print("XIAO Edge AI: edge-impulse-sdk-zephyr not available; "
@@ -926,6 +1306,77 @@ def _provision_edge_ai():
     print(f"XIAO Edge AI: registered modules -> {env['PIO_NCS_MODULES']}")
 
 
+# Provisioning ledger: {step: {"inputs", "outputs"}} state hashes of every
+# step below that writes into the framework package. A step whose inputs and
+# outputs are unchanged since it last ran is skipped, so a warm build only
+# stats the files involved instead of rewriting them.
+provision_ledger_path = join(framework_dir, ".xiao-provision.json")
+provision_ledger = None
+
+
+def _path_state(paths):
+    """Hash of the path, size and mtime of every file under paths."""
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(path.encode("utf-8"))
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = join(root, name)
+                    stat = os.stat(file_path)
+                    digest.update(("\0%s:%d:%d" % (
+                        os.path.relpath(file_path, path), stat.st_size,
+                        stat.st_mtime_ns)).encode("utf-8"))
+        elif os.path.isfile(path):
+            stat = os.stat(path)
+            digest.update(("\0%d:%d" % (stat.st_size, stat.st_mtime_ns)).encode("utf-8"))
+        else:
+            digest.update(b"\0missing")
+    return digest.hexdigest()
+
+
+def _run_provision_step(name, step, inputs, outputs, *extra):
+    """Run step() unless the ledger shows identical inputs and outputs.
+
+    This script and the framework version are implicit inputs of every step,
+    so changing the provisioning logic or the package re-runs everything.
+    """
+    global provision_ledger
+    if provision_ledger is None:
+        try:
+            with open(provision_ledger_path, "r", encoding="utf-8") as fp:
+                provision_ledger = json.load(fp)
+        except (OSError, ValueError):
+            provision_ledger = {}
+
+    inputs_hash = hashlib.sha1(json.dumps([
+        _get_framework_version(),
+        [str(value) for value in extra],
+        _path_state(list(inputs) + [join(platform_dir, "builder", "frameworks", "zephyr.py")]),
+    ]).encode("utf-8")).hexdigest()
+    entry = provision_ledger.get(name) or {}
+    if entry.get("inputs") == inputs_hash and entry.get("outputs") == _path_state(outputs):
+        return False
+
+    step()
+    provision_ledger[name] = {"inputs": inputs_hash, "outputs": _path_state(outputs)}
+    tmp_path = provision_ledger_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(provision_ledger, fp, indent=1, sort_keys=True)
+    os.replace(tmp_path, provision_ledger_path)
+    return True
+
+
+def _patch_platformio_build_script(framework_dir):
+    _patch_platformio_path_handling(framework_dir)
+    _patch_platformio_object_naming(framework_dir)
+    _patch_platformio_framework_package_name(framework_dir, framework_package_name)
+    _patch_platformio_mcuboot_signing(framework_dir)
+    _patch_platformio_prebuilt_lib_linking(framework_dir)
+    _patch_platformio_extra_modules(framework_dir)
+
+
 # Pre-install west dependencies with retry before platformio-build.py runs
 # This ensures they exist when install-deps.py checks, avoiding its
 # destructive clean_up() on any single failure.
@@ -933,14 +1384,33 @@ _ensure_system_path_available()
 _ensure_zephyr_python_env()
 _ensure_minimal_west_workspace(framework_dir)
 _preinstall_west_deps(framework_dir, env.subst("$PIOPLATFORM"))
-_patch_platformio_path_handling(framework_dir)
-_patch_platformio_object_naming(framework_dir)
-_patch_platformio_framework_package_name(framework_dir, framework_package_name)
-_patch_platformio_mcuboot_signing(framework_dir)
-_patch_platformio_prebuilt_lib_linking(framework_dir)
-_patch_platformio_extra_modules(framework_dir)
-_provision_xiao_dfu_module(framework_dir)
-_patch_cdc_vidpid(framework_dir)
+_run_provision_step(
+    "platformio-build",
+    lambda: _patch_platformio_build_script(framework_dir),
+    [],
+    [join(framework_dir, "scripts", "platformio", "platformio-build.py")],
+    framework_package_name,
+)
+_run_provision_step(
+    "xiao-dfu-module",
+    lambda: _provision_xiao_dfu_module(framework_dir),
+    [
+        join(platform_dir, "zephyr", "modules", "xiao_dfu_reset"),
+        join(platform_dir, "zephyr", "boards", "arm", "xiao_nrf54lm20b",
+             "nrf54lm20b_cpuapp_common.dtsi"),
+    ],
+    [
+        join(framework_dir, "_pio", "modules", "xiao_dfu_reset"),
+        join(framework_dir, "boards", "seeed", "xiao_nrf54lm20b",
+             "nrf54lm20b_cpuapp_common.dtsi"),
+    ],
+)
+_run_provision_step(
+    "cdc-vidpid",
+    lambda: _patch_cdc_vidpid(framework_dir),
+    [],
+    [join(framework_dir, "boards", "seeed", "xiao_nrf54lm20b", "Kconfig.defconfig")],
+)
 _provision_edge_ai()
 
 if board_name == "seeed-xiao-stm32c5":
@@ -960,12 +1430,18 @@ if board_name == "seeed-xiao-stm32c5":
             if not os.path.isdir(source_module_dir):
                 continue
             target_module_dir = join(framework_dir, "_pio", "modules", entry)
-            if os.path.exists(target_module_dir):
-                if os.path.isdir(target_module_dir):
-                    shutil.rmtree(target_module_dir)
-                else:
-                    os.remove(target_module_dir)
-            shutil.copytree(source_module_dir, target_module_dir)
+
+            def _copy_module(src=source_module_dir, dst=target_module_dir):
+                if os.path.exists(dst):
+                    if os.path.isdir(dst):
+                        shutil.rmtree(dst)
+                    else:
+                        os.remove(dst)
+                shutil.copytree(src, dst)
+
+            _run_provision_step(
+                "module:" + entry, _copy_module,
+                [source_module_dir], [target_module_dir])
             extra_modules.append(target_module_dir)
         os.environ["ZEPHYR_EXTRA_MODULES"] = ";".join(extra_modules)
 
@@ -973,14 +1449,28 @@ if board_name == "seeed-xiao-stm32c5":
 # zephyr/fixes.yml. Dispatched by zephyr_fixes.py — boards absent from the
 # manifest get no fixes, so there is no coupling across boards/packages.
 sys.path.insert(0, join(platform_dir, "builder", "frameworks"))
-from zephyr_fixes import apply_all
-
-apply_all(platform_dir, framework_dir,
-          platform.get_zephyr_board_name(board_name),
-          _get_framework_version())
+from zephyr_fixes import apply_all, fix_targets
+
+zephyr_board_name = platform.get_zephyr_board_name(board_name)
+_run_provision_step(
+    "fixes:" + zephyr_board_name,
+    lambda: apply_all(platform_dir, framework_dir, zephyr_board_name,
+                      _get_framework_version()),
+    [
+        join(platform_dir, "zephyr", "fixes.yml"),
+        join(platform_dir, "zephyr", "patches", zephyr_board_name),
+        join(platform_dir, "zephyr", "overrides", zephyr_board_name),
+        join(platform_dir, "builder", "frameworks", "zephyr_fixes.py"),
+        join(platform_dir, "builder", "frameworks", "zephyr_patch.py"),
+        join(platform_dir, "builder", "frameworks", "zephyr_override.py"),
+    ],
+    fix_targets(platform_dir, framework_dir, zephyr_board_name,
+                _get_framework_version()),
+)
 
 SConscript(
     join(framework_dir, "scripts", "platformio", "platformio-build.py"), exports="env")
+_provision_lock.release()
     
 if board_name and "nrf" in board_name:
     env.Replace(
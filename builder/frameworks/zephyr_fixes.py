@@ -15,11 +15,14 @@ fixes from leaking across boards or framework versions:
 This is the only module that reads the manifest; the executors are pure.
 
 Interface:
-    apply_all(platform_dir, framework_dir, zephyr_board, version)
+    apply_all(platform_dir, framework_dir, zephyr_board, version, dry_run=False)
+    check_patches(platform_dir, framework_dir, zephyr_board, version)
+    fix_targets(platform_dir, framework_dir, zephyr_board, version)
 """
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from os.path import dirname, join
 
 try:
@@ -43,32 +46,120 @@ PATCHES_SUBDIR = "patches"
 OVERRIDES_SUBDIR = "overrides"
 
 
-def apply_all(platform_dir, framework_dir, zephyr_board, version):
+def apply_all(platform_dir, framework_dir, zephyr_board, version, dry_run=False):
     """Apply all fixes from zephyr/fixes.yml matching (zephyr_board, version).
 
     zephyr_board: board.name (e.g. "xiao_stm32c5"). Absent from fixes.yml => no-op.
     version: Zephyr version string (e.g. "4.4.0", from _get_framework_version()).
+
+    Every patch is checked first (see check_patches()), so a patch that no
+    longer matches fails the build before any file is written. With dry_run
+    only that check runs.
+    """
+    fixes = _board_fixes(platform_dir, zephyr_board)
+    if not fixes:
+        return
+
+    check_patches(platform_dir, framework_dir, zephyr_board, version, fixes)
+    if dry_run:
+        return
+
+    print("Applying %d Zephyr fix(es) for board '%s' (Zephyr %s)..."
+          % (len(fixes), zephyr_board, version))
+
+    for fix in fixes:
+        _apply_one_fix(platform_dir, framework_dir, zephyr_board, fix, version)
+
+
+def check_patches(platform_dir, framework_dir, zephyr_board, version, fixes=None):
+    """Dry-run every matching patch fix; raise listing all failures.
+
+    The fixes of each target file are replayed in memory in manifest order,
+    as _apply_one_fix() would apply them: an override replaces the file's
+    text and every patch is checked against the result of the fixes before
+    it. Target files are checked in parallel.
     """
+    if fixes is None:
+        fixes = _board_fixes(platform_dir, zephyr_board)
+
+    errors = []
+    chains = {}  # target file -> [(fix_id, fix type, source or hunks)], in fix order
+    for fix in fixes:
+        if not _version_matches(version, fix.get("applies_to") or []):
+            continue
+        fix_id = fix.get("id", "<no-id>")
+        src = _fix_source(platform_dir, zephyr_board, fix)
+        if fix.get("type") == "override":
+            target = join(framework_dir, fix.get("target") or fix.get("path", ""))
+            chains.setdefault(target, []).append((fix_id, "override", src))
+        elif fix.get("type") == "patch":
+            try:
+                files = zephyr_patch.read_patch(src)
+            except (OSError, RuntimeError) as e:
+                errors.append("  [%s] %s" % (fix_id, e))
+                continue
+            for relpath, hunks in files.items():
+                chains.setdefault(join(framework_dir, relpath), []).append(
+                    (fix_id, "patch", hunks))
+
+    # Files only overridden need no check
+    chains = [
+        (target, steps) for target, steps in chains.items()
+        if any(fix_type == "patch" for _, fix_type, _ in steps)
+    ]
+
+    def _check(chain):
+        target, steps = chain
+        lines = None
+        for fix_id, fix_type, step in steps:
+            try:
+                if fix_type == "override":
+                    lines = zephyr_patch.read_lines(step)
+                    continue
+                if lines is None:
+                    lines = zephyr_patch.read_lines(target)
+                lines = zephyr_patch.apply_hunks(lines, step, target)[0]
+            except (OSError, RuntimeError) as e:
+                # Later fixes of this file would be checked against the wrong text
+                return "  [%s] %s" % (fix_id, e)
+        return None
+
+    if chains:
+        with ThreadPoolExecutor(max_workers=min(len(chains), 8)) as executor:
+            errors.extend(error for error in executor.map(_check, chains) if error)
+    if errors:
+        raise RuntimeError(
+            "Zephyr patch check failed for board '%s':\n%s"
+            % (zephyr_board, "\n".join(errors)))
+
+
+def _fix_source(platform_dir, zephyr_board, fix):
+    subdir = PATCHES_SUBDIR if fix.get("type") == "patch" else OVERRIDES_SUBDIR
+    return join(platform_dir, "zephyr", subdir, zephyr_board, fix.get("path", ""))
+
+
+def fix_targets(platform_dir, framework_dir, zephyr_board, version):
+    """Framework files apply_all() writes for (zephyr_board, version)."""
+    return [
+        join(framework_dir, fix.get("target") or fix.get("path", ""))
+        for fix in _board_fixes(platform_dir, zephyr_board)
+        if _version_matches(version, fix.get("applies_to") or [])
+    ]
+
+
+def _board_fixes(platform_dir, zephyr_board):
     fixes_yml = join(platform_dir, "zephyr", FIXES_YML)
     if not os.path.isfile(fixes_yml):
-        return  # no manifest → no fixes
+        return []  # no manifest → no fixes
 
     with open(fixes_yml, "r", encoding="utf-8") as f:
         data = yaml.safe_load(f) or {}
 
     board_section = (data.get("boards") or {}).get(zephyr_board)
     if not board_section:
-        return  # this board has no local fixes
-
-    fixes = board_section.get("fixes") or []
-    if not fixes:
-        return
+        return []  # this board has no local fixes
 
-    print("Applying %d Zephyr fix(es) for board '%s' (Zephyr %s)..."
-          % (len(fixes), zephyr_board, version))
-
-    for fix in fixes:
-        _apply_one_fix(platform_dir, framework_dir, zephyr_board, fix, version)
+    return board_section.get("fixes") or []
 
 
 def _apply_one_fix(platform_dir, framework_dir, zephyr_board, fix, version):
@@ -81,13 +172,13 @@ def _apply_one_fix(platform_dir, framework_dir, zephyr_board, fix, version):
         return
 
     if fix_type == "patch":
-        src = join(platform_dir, "zephyr", PATCHES_SUBDIR, zephyr_board, fix.get("path", ""))
+        src = _fix_source(platform_dir, zephyr_board, fix)
         if not os.path.isfile(src):
             raise RuntimeError("patch source not found for fix '%s': %s" % (fix_id, src))
         zephyr_patch.apply_patch(src, framework_dir, fix.get("target"))
 
     elif fix_type == "override":
-        src = join(platform_dir, "zephyr", OVERRIDES_SUBDIR, zephyr_board, fix.get("path", ""))
+        src = _fix_source(platform_dir, zephyr_board, fix)
         if not os.path.isfile(src):
             raise RuntimeError("override source not found for fix '%s': %s" % (fix_id, src))
         zephyr_override.apply_override(
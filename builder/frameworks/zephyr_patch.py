@@ -8,24 +8,34 @@ it only receives "which patch, to which framework root". Idempotent: a hunk
 already present is skipped.
 
 Dispatched by builder/frameworks/zephyr_fixes.py. Interface:
-    apply_patch(src_patch, framework_dir, target_relpath=None)
+    apply_patch(src_patch, framework_dir, target_relpath=None, dry_run=False)
+    read_patch(src_patch)
+    read_lines(file_path)
+    apply_hunks(lines, hunks, file_path)
 """
 
 import os
+import shutil
 from os.path import join
 
 
-def apply_patch(src_patch, framework_dir, target_relpath=None):
+def apply_patch(src_patch, framework_dir, target_relpath=None, dry_run=False):
     """Apply a unified-diff patch to the framework package (idempotent).
 
     Each hunk's target file is determined by its ``+++`` line (stripped of a/ b/
     prefixes), relative to framework_dir. target_relpath is informational only
     (for logs); it does not override the patch's own paths.
 
+    Every target file is read once, all of its hunks are applied in memory and
+    the result is written back atomically, once. With dry_run nothing is
+    written; the patch is only checked.
+
     Returns: {"applied": int, "already-applied": int}.
     Raises RuntimeError if a hunk does not match (build should fail).
     """
-    stats = _apply_unified_patch(src_patch, framework_dir)
+    stats = _apply_unified_patch(src_patch, framework_dir, dry_run)
+    if dry_run:
+        return stats
     name = os.path.basename(src_patch)
     if stats["applied"] > 0:
         print("Applied Zephyr patch: %s (%d hunk(s))" % (name, stats["applied"]))
@@ -34,7 +44,51 @@ def apply_patch(src_patch, framework_dir, target_relpath=None):
     return stats
 
 
-# --- idempotent unified-diff application (unchanged from original impl) ---
+def read_patch(src_patch):
+    """Return {target_relpath: hunks} of a unified-diff patch.
+
+    The hunks of each file are what apply_hunks() takes.
+    """
+    return _parse_unified_patch(src_patch)
+
+
+def read_lines(file_path):
+    """The lines of a text file, without line endings, as apply_hunks() takes."""
+    return _read_text_lines(file_path)[0]
+
+
+def apply_hunks(lines, hunks, file_path):
+    """Apply one file's hunks to its lines in memory, writing nothing.
+
+    file_path only names the file in errors. Returns (lines, stats); lines
+    is the patched copy. Raises RuntimeError like apply_patch().
+    """
+    lines = list(lines)
+    index = _index_lines(lines)
+
+    stats = {"applied": 0, "already-applied": 0}
+    edits = []
+    for old_hint, new_hint, old_lines, new_lines in hunks:
+        old_index = _find_block(lines, index, old_lines, old_hint)
+        if old_index >= 0:
+            edits.append((old_index, len(old_lines), new_lines))
+            stats["applied"] += 1
+        elif _find_block(lines, index, new_lines, new_hint) >= 0:
+            stats["already-applied"] += 1
+        else:
+            raise RuntimeError("patch hunk did not match %s" % file_path)
+
+    # Splice bottom-up so earlier positions stay valid
+    edits.sort(key=lambda edit: edit[0])
+    for (start, length, _), (next_start, _, _) in zip(edits, edits[1:]):
+        if start + length > next_start:
+            raise RuntimeError("overlapping patch hunks in %s" % file_path)
+    for start, length, new_lines in reversed(edits):
+        lines[start:start + length] = new_lines
+    return lines, stats
+
+
+# --- idempotent unified-diff application ---
 
 def _strip_patch_path(path):
     if path.startswith("a/") or path.startswith("b/"):
@@ -50,14 +104,27 @@ def _detect_newline(text):
     return "\n"
 
 
-def _find_block(lines, block):
+def _index_lines(lines):
+    """Map each line's text to the (ascending) positions it occurs at."""
+    index = {}
+    for position, line in enumerate(lines):
+        index.setdefault(line, []).append(position)
+    return index
+
+
+def _find_block(lines, index, block, hint):
+    """Position of block in lines, preferring the one nearest to hint.
+
+    Candidates come from the first-line index, so only positions whose first
+    line already matches are compared in full.
+    """
     if not block:
         return 0
 
-    limit = len(lines) - len(block) + 1
-    for index in range(max(limit, 0)):
-        if lines[index:index + len(block)] == block:
-            return index
+    candidates = index.get(block[0], ())
+    for position in sorted(candidates, key=lambda p: abs(p - hint)):
+        if lines[position:position + len(block)] == block:
+            return position
 
     return -1
 
@@ -74,45 +141,68 @@ def _write_text_lines(file_path, lines, newline, trailing_newline):
     if trailing_newline:
         text += newline
 
-    with open(file_path, "w", encoding="utf-8", newline="") as f:
+    tmp_path = file_path + ".pio-patch"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
         f.write(text)
+    shutil.copymode(file_path, tmp_path)
+    os.replace(tmp_path, file_path)
 
 
-def _apply_patch_hunk(file_path, old_lines, new_lines):
-    lines, newline, trailing_newline = _read_text_lines(file_path)
+def _apply_file_hunks(file_path, hunks, dry_run):
+    """Apply all hunks of one file.
 
-    old_index = _find_block(lines, old_lines)
-    if old_index >= 0:
-        lines[old_index:old_index + len(old_lines)] = new_lines
-        _write_text_lines(file_path, lines, newline, trailing_newline)
-        return "applied"
+    hunks are (old_hint, new_hint, old_lines, new_lines); hunks are located
+    in the file as read, before any of them is spliced in.
+    """
+    lines, newline, trailing_newline = _read_text_lines(file_path)
+    lines, stats = apply_hunks(lines, hunks, file_path)
+    if not stats["applied"] or dry_run:
+        return stats
+    _write_text_lines(file_path, lines, newline, trailing_newline)
+    return stats
 
-    if _find_block(lines, new_lines) >= 0:
-        return "already-applied"
 
-    raise RuntimeError("patch hunk did not match %s" % file_path)
+def _parse_hunk_header(line):
+    """0-based (old, new) start lines of an "@@ -a,b +c,d @@" header."""
+    starts = []
+    for field in line.split()[1:3]:
+        try:
+            starts.append(max(int(field[1:].split(",")[0]) - 1, 0))
+        except ValueError:
+            starts.append(0)
+    return tuple(starts + [0] * (2 - len(starts)))
 
 
-def _apply_unified_patch(patch_path, target_root):
+def _parse_unified_patch(patch_path):
+    """Return {target_relpath: [(old_hint, new_hint, old_lines, new_lines)]}."""
     with open(patch_path, "r", encoding="utf-8", newline="") as f:
         patch_lines = f.read().splitlines()
 
+    files = {}
     target_relpath = None
+    hints = (0, 0)
     old_lines = []
     new_lines = []
-    stats = {"applied": 0, "already-applied": 0}
 
     def flush_hunk():
         if target_relpath is None or (not old_lines and not new_lines):
             return
 
-        file_path = join(target_root, target_relpath)
-        result = _apply_patch_hunk(file_path, old_lines, new_lines)
-        stats[result] += 1
+        files.setdefault(target_relpath, []).append(
+            hints + (list(old_lines), list(new_lines)))
         old_lines.clear()
         new_lines.clear()
 
-    for line in patch_lines:
+    for index, line in enumerate(patch_lines):
+        # A file header, checked before "-" so the next file's "--- a/..."
+        # does not become a removed line of the previous hunk. Requiring the
+        # "+++ " that follows keeps removed lines starting with "-- " intact.
+        if line.startswith("--- ") and patch_lines[index + 1:index + 2] and \
+                patch_lines[index + 1].startswith("+++ "):
+            flush_hunk()
+            target_relpath = None
+            continue
+
         if line.startswith("+++ "):
             flush_hunk()
             target = line[4:].strip()
@@ -123,6 +213,7 @@ def _apply_unified_patch(patch_path, target_root):
 
         if line.startswith("@@ "):
             flush_hunk()
+            hints = _parse_hunk_header(line)
             continue
 
         if target_relpath is None:
@@ -137,8 +228,18 @@ def _apply_unified_patch(patch_path, target_root):
             new_lines.append(line[1:])
         elif line.startswith("\\ No newline at end of file"):
             continue
-        elif line.startswith(("diff --git ", "index ", "--- ")):
+        elif line.startswith(("diff ", "index ")):
             continue
 
     flush_hunk()
+    return files
+
+
+def _apply_unified_patch(patch_path, target_root, dry_run=False):
+    stats = {"applied": 0, "already-applied": 0}
+    for target_relpath, hunks in _parse_unified_patch(patch_path).items():
+        file_stats = _apply_file_hunks(
+            join(target_root, target_relpath), hunks, dry_run)
+        for key, value in file_stats.items():
+            stats[key] += value
     return stats
@@ -13,11 +13,25 @@
 # limitations under the License.
 
 
+import importlib.util
+import sys
+from os.path import join
+
 from SCons.Script import DefaultEnvironment
 
 
 env = DefaultEnvironment()
 board = env.BoardConfig()
+
+# In-process ELF section sizes for the upload size check and the size
+# target, and the per-symbol size database of the sizereport target
+for _name in ("elfsize", "sizereport"):
+    if _name not in sys.modules:
+        _spec = importlib.util.spec_from_file_location(
+            _name, join(env.PioPlatform().get_dir(), "builder", _name + ".py"))
+        sys.modules[_name] = importlib.util.module_from_spec(_spec)
+        _spec.loader.exec_module(sys.modules[_name])
+    sys.modules[_name].register(env)
 if "esp32" in board.id:
     print("board id is seeed-xiao-esp32,will call board_build/esp/esp_build.py")
     env.SConscript("board_build/esp/esp_build.py", exports="env")
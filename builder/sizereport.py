@@ -0,0 +1,304 @@
+# Copyright 2014-present PlatformIO <contact@platformio.org>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-symbol and per-object firmware size database.
+
+The `sizereport` target records, for the linked ELF, the size of every
+sized function/object symbol (from .symtab, via elfsize.read_symbols) and,
+when the link wrote a GNU ld map, the text/data/bss contribution of every
+input object file. The result is stored as one compact columnar JSON file,
+$BUILD_DIR/sizereport.json: each table is a dict of equally long lists,
+symbol sections are indexes into the section table.
+
+Before a changed ELF is recorded, the previous report is kept as
+sizereport.prev.json, and the new one is diffed against it (or against
+the file named by the custom_sizereport_baseline option) to print the top
+custom_sizereport_top (default 10) growth contributors.
+
+main.py loads this module once under sys.modules["sizereport"].
+"""
+
+import json
+import os
+import re
+import sys
+
+REPORT_NAME = "sizereport.json"
+PREVIOUS_NAME = "sizereport.prev.json"
+FORMAT = 1
+DEFAULT_TOP = 10
+
+_MAP_START = "Linker script and memory map"
+_MAP_END = "Cross Reference Table"
+_MAP_INPUT = re.compile(r"^ (\S+)\s+0x[0-9a-fA-F]+\s+0x([0-9a-fA-F]+)\s+(\S.*)$")
+_MAP_INPUT_NAME = re.compile(r"^ (\S+)$")
+_MAP_INPUT_CONT = re.compile(r"^\s+0x[0-9a-fA-F]+\s+0x([0-9a-fA-F]+)\s+(\S.*)$")
+_MAP_FLAG = re.compile(r"-Map[=,]\"?([^\"]+)\"?")
+
+
+class SizeReportError(ValueError):
+    pass
+
+
+def _object_name(path, build_dir):
+    """Build-dir relative path of a project object, file name otherwise.
+
+    Archive members, "libfoo.a(bar.o)", keep the member name.
+    """
+    path, member = path.strip(), ""
+    if path.endswith(")") and "(" in path:
+        path, member = path[:-1].split("(", 1)
+        member = "(%s)" % member
+    if build_dir:
+        rel = os.path.relpath(os.path.abspath(path), build_dir)
+        if not rel.startswith(os.pardir):
+            return rel.replace(os.sep, "/") + member
+    return os.path.basename(path) + member
+
+
+def parse_map(map_path, section_kinds, build_dir=None):
+    """Per-object {"text", "data", "bss"} byte counts from a GNU ld map.
+
+    section_kinds maps the loaded output section names of the ELF to their
+    kind; input sections of other output sections (debug info, discarded
+    sections) are not counted, and neither is linker fill.
+    """
+    objects = {}
+    output = None
+    pending = None
+    with open(map_path, encoding="utf-8", errors="replace") as fp:
+        for line in fp:
+            if line.startswith(_MAP_START):
+                break
+        for line in fp:
+            line = line.rstrip("\r\n")
+            if line.startswith(_MAP_END):
+                break
+            if line[:1] not in ("", " ", "\t"):
+                output = line.split(None, 1)[0]
+                pending = None
+                continue
+            kind = section_kinds.get(output)
+            if kind is None:
+                continue
+            if pending is not None:
+                match = _MAP_INPUT_CONT.match(line)
+                pending = None
+                if match:
+                    size, path = int(match.group(1), 16), match.group(2)
+                else:
+                    continue
+            else:
+                match = _MAP_INPUT.match(line)
+                if match is None:
+                    if _MAP_INPUT_NAME.match(line) and not line.startswith(" *"):
+                        pending = True
+                    continue
+                if match.group(1).startswith("*"):
+                    continue
+                size, path = int(match.group(2), 16), match.group(3)
+            if not size:
+                continue
+            counts = objects.setdefault(
+                _object_name(path, build_dir), {"text": 0, "data": 0, "bss": 0})
+            counts[kind] += size
+    return objects
+
+
+def build(elf_path, map_path=None, build_dir=None):
+    """The columnar size report of elf_path (and of map_path, if given)."""
+    elfsize = sys.modules["elfsize"]
+    report = elfsize.load(elf_path)
+    kinds = {s.name: s.kind for s in report.sections if s.kind}
+    section_names = [s.name for s in report.sections if s.kind]
+    section_index = {name: i for i, name in enumerate(section_names)}
+
+    symbols = {}
+    for name, size, section in elfsize.read_symbols(elf_path):
+        if section not in section_index:
+            continue
+        # Same-named local symbols of different objects are summed
+        key = (name, section_index[section])
+        symbols[key] = symbols.get(key, 0) + size
+    ordered = sorted(symbols.items(), key=lambda item: (-item[1], item[0]))
+
+    objects = {}
+    if map_path:
+        objects = parse_map(map_path, kinds, build_dir)
+    object_names = sorted(objects)
+
+    text, data, bss = report.berkeley()
+    stat = os.stat(elf_path)
+    return {
+        "format": FORMAT,
+        "elf": os.path.basename(elf_path),
+        "stamp": [stat.st_mtime_ns, stat.st_size],
+        "totals": {"text": text, "data": data, "bss": bss},
+        "sections": {
+            "name": section_names,
+            "kind": [kinds[name] for name in section_names],
+            "size": [report.section(name).size for name in section_names],
+        },
+        "symbols": {
+            "name": [name for (name, _), _ in ordered],
+            "section": [section for (_, section), _ in ordered],
+            "size": [size for _, size in ordered],
+        },
+        "objects": {
+            "name": object_names,
+            "text": [objects[name]["text"] for name in object_names],
+            "data": [objects[name]["data"] for name in object_names],
+            "bss": [objects[name]["bss"] for name in object_names],
+        },
+    }
+
+
+def load(path):
+    try:
+        with open(path, encoding="utf-8") as fp:
+            report = json.load(fp)
+    except (OSError, ValueError) as e:
+        raise SizeReportError("cannot read size report %s: %s" % (path, e))
+    if report.get("format") != FORMAT:
+        raise SizeReportError("unsupported size report format in %s" % path)
+    return report
+
+
+def save(report, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _symbol_sizes(report):
+    columns = report["symbols"]
+    sections = report["sections"]["name"]
+    return {
+        (name, sections[section]): size
+        for name, section, size in zip(
+            columns["name"], columns["section"], columns["size"])
+    }
+
+
+def _object_sizes(report):
+    columns = report["objects"]
+    return {
+        name: text + data + bss
+        for name, text, data, bss in zip(
+            columns["name"], columns["text"], columns["data"], columns["bss"])
+    }
+
+
+def _growth(current, baseline, top):
+    changes = [
+        (current.get(key, 0) - baseline.get(key, 0), key)
+        for key in set(current) | set(baseline)
+    ]
+    grown = sorted((c for c in changes if c[0] > 0), key=lambda c: (-c[0], c[1]))
+    return grown[:top], sum(1 for c in changes if c[0] < 0)
+
+
+def diff(current, baseline, top=DEFAULT_TOP):
+    """Lines describing how current grew or shrank relative to baseline."""
+    lines = []
+    deltas = []
+    for kind in ("text", "data", "bss"):
+        new, old = current["totals"][kind], baseline["totals"][kind]
+        deltas.append("%s %+d" % (kind, new - old))
+    lines.append("Size change: %s" % ", ".join(deltas))
+
+    old_symbols = _symbol_sizes(baseline)
+    grown, shrunk = _growth(_symbol_sizes(current), old_symbols, top)
+    if grown:
+        lines.append("Top symbol growth (%d shrank):" % shrunk)
+        for delta, (name, section) in grown:
+            lines.append("  %+8d  %-24s %s%s" % (
+                delta, section, name,
+                "" if (name, section) in old_symbols else "  (new)"))
+
+    current_objects = _object_sizes(current)
+    old_objects = _object_sizes(baseline)
+    if current_objects and old_objects:
+        grown, shrunk = _growth(current_objects, old_objects, top)
+        if grown:
+            lines.append("Top object growth (%d shrank):" % shrunk)
+            for delta, name in grown:
+                lines.append("  %+8d  %s%s" % (
+                    delta, name, "" if name in old_objects else "  (new)"))
+    return lines
+
+
+def _map_path(env):
+    """The map file the link writes, if its flags ask for one."""
+    for flag in env.get("LINKFLAGS", []):
+        match = _MAP_FLAG.search(env.subst(str(flag)))
+        if match:
+            return match.group(1)
+    return env.subst("$BUILD_DIR/${PROGNAME}.map")
+
+
+def WriteSizeReport(_, target, source, env):
+    """Record the size report of the program and print its growth."""
+    elf_path = env.subst(str(source[0]))
+    build_dir = env.subst("$BUILD_DIR")
+    report_path = os.path.join(build_dir, REPORT_NAME)
+    previous_path = os.path.join(build_dir, PREVIOUS_NAME)
+
+    map_path = _map_path(env)
+    # A map older than the ELF belongs to an earlier link configuration
+    if not os.path.isfile(map_path) or (
+            os.path.getmtime(map_path) + 2 < os.path.getmtime(elf_path)):
+        map_path = None
+    report = build(elf_path, map_path, build_dir)
+
+    if os.path.isfile(report_path):
+        try:
+            if load(report_path)["stamp"] != report["stamp"]:
+                os.replace(report_path, previous_path)
+        except SizeReportError:
+            os.remove(report_path)
+    save(report, report_path)
+
+    totals = report["totals"]
+    print("Size report: %d symbols, %d objects, text %d, data %d, bss %d -> %s" % (
+        len(report["symbols"]["name"]), len(report["objects"]["name"]),
+        totals["text"], totals["data"], totals["bss"],
+        os.path.relpath(report_path, env.subst("$PROJECT_DIR"))))
+    if map_path is None:
+        print("No linker map found, per-object sizes are not recorded")
+
+    baseline_path = env.GetProjectOption("custom_sizereport_baseline", "")
+    if baseline_path:
+        baseline_path = os.path.join(env.subst("$PROJECT_DIR"), baseline_path)
+    elif os.path.isfile(previous_path):
+        baseline_path = previous_path
+    else:
+        print("No previous size report to compare against")
+        return
+    try:
+        baseline = load(baseline_path)
+    except SizeReportError as e:
+        sys.stderr.write("Warning! %s\n" % e)
+        return
+    top = int(env.GetProjectOption("custom_sizereport_top", DEFAULT_TOP))
+    print("Compared with %s:" % os.path.relpath(
+        baseline_path, env.subst("$PROJECT_DIR")))
+    for line in diff(report, baseline, top):
+        print(line)
+
+
+def register(env):
+    env.AddMethod(WriteSizeReport, "WriteSizeReport")
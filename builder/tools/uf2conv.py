@@ -2,14 +2,22 @@
 """
 UF2 (USB Flashing Format) converter.
 
-Converts a .bin firmware file to .uf2 format for use with TinyUF2 bootloader.
+Converts a .bin, Intel HEX or ELF firmware file to .uf2 format for use with
+TinyUF2 bootloader. HEX and ELF inputs carry their own load addresses, so only
+populated flash ranges are encoded; gaps between regions cost no blocks.
+
+With --delta-from, only the pages that differ from a previously flashed UF2
+image are encoded, which makes reflashing an almost unchanged image fast.
 
 Reference: https://github.com/microsoft/uf2
 """
 
+import argparse
+import contextlib
+import mmap
+import os
 import struct
 import sys
-import argparse
 
 # UF2 magic numbers
 UF2_MAGIC_START_0 = 0x0A324655  # "UF2\n"
@@ -34,75 +42,435 @@ FAMILY_IDS = {
     "stm32h5": 0x4E8F1C5D,
     "rp2040": 0xE48BFF56,
     "rp2350": 0xE48BFF57,
+    "rp2350-arm-s": 0xE48BFF59,
+    "rp2350-riscv": 0xE48BFF5A,
     "atmel-samd": 0x68ED2B88,
     "esp32": 0x1C5E21E0,
     "nrf52": 0x1B57745F,
 }
 
 
+# Precompiled field packers for the per-block header fields
+_TARGET_ADDR = struct.Struct("<I")    # offset 12
+_BLOCK_NUMBERS = struct.Struct("<II")  # offset 20: blockNo, numBlocks
+_DATA_OFFSET = 32
+
+# Blocks encoded per batch when streaming (32 KiB buffer)
+STREAM_BATCH_BLOCKS = 64
+
+
+def _block_template(family_id, payload_size, flags=UF2_FLAG_FAMILY_ID):
+    """Return one 512-byte block with every per-image constant filled in."""
+    if not 0 < payload_size <= 476:
+        raise ValueError("payload_size must be 1..476, got %d" % payload_size)
+    block = bytearray(UF2_BLOCK_SIZE)
+    struct.pack_into(
+        "<IIIIIIII", block, 0,
+        UF2_MAGIC_START_0,  # magicStart0
+        UF2_MAGIC_START_1,  # magicStart1
+        flags,              # flags
+        0,                  # targetAddr (per block)
+        payload_size,       # payloadSize
+        0,                  # blockNo (per block)
+        0,                  # numBlocks (per block)
+        family_id,          # fileSize / familyID
+    )
+    struct.pack_into("<I", block, UF2_BLOCK_SIZE - 4, UF2_MAGIC_END)
+    return block
+
+
+def _encode_blocks(out, data, first_block, count, num_blocks, base_addr,
+                   template, payload_size, block_base=0):
+    """Encode blocks first_block..first_block+count-1 of data into out[0:].
+
+    Block numbers in the headers are offset by block_base so that several
+    regions can share one numbering. The last block's payload is padded
+    with 0xFF (erased flash), as if the input had been padded to a multiple
+    of payload_size, without copying it.
+    """
+    for index in range(count):
+        local_no = first_block + index
+        pos = index * UF2_BLOCK_SIZE
+        offset = local_no * payload_size
+        out[pos:pos + UF2_BLOCK_SIZE] = template
+        _TARGET_ADDR.pack_into(out, pos + 12, base_addr + offset)
+        _BLOCK_NUMBERS.pack_into(out, pos + 20, block_base + local_no,
+                                 num_blocks)
+        chunk = data[offset:offset + payload_size]
+        start = pos + _DATA_OFFSET
+        out[start:start + len(chunk)] = chunk
+        if len(chunk) < payload_size:
+            out[start + len(chunk):start + payload_size] = (
+                b"\xFF" * (payload_size - len(chunk)))
+
+
+def _num_blocks(size, payload_size):
+    return (size + payload_size - 1) // payload_size
+
+
+def iter_uf2_region_batches(regions, family_id=0x00C5C5C5,
+                            payload_size=UF2_PAYLOAD_SIZE,
+                            batch_blocks=STREAM_BATCH_BLOCKS):
+    """Yield the UF2 image of regions as memoryviews of whole blocks.
+
+    regions is a list of (address, bytes-like) runs that do not share a
+    payload page, as returned by page_runs(). Blocks are numbered across
+    all runs so numBlocks is correct for the whole image. Blocks are encoded
+    batch_blocks at a time into one reused buffer, so memory stays constant
+    for any image size. A yielded view is only valid until the generator
+    advances; copy it (bytes(view)) to keep it.
+    """
+    runs = [(addr, memoryview(data)) for addr, data in regions if len(data)]
+    counts = [_num_blocks(len(data), payload_size) for _, data in runs]
+    num_blocks = sum(counts)
+    if not num_blocks:
+        return
+    template = _block_template(family_id, payload_size)
+    buf = memoryview(bytearray(UF2_BLOCK_SIZE * min(batch_blocks, num_blocks)))
+    block_base = 0
+    for (addr, data), run_blocks in zip(runs, counts):
+        for first in range(0, run_blocks, batch_blocks):
+            count = min(batch_blocks, run_blocks - first)
+            _encode_blocks(buf, data, first, count, num_blocks, addr,
+                           template, payload_size, block_base)
+            yield buf[:count * UF2_BLOCK_SIZE]
+        block_base += run_blocks
+
+
+def iter_uf2_batches(bin_data, base_addr, family_id=0x00C5C5C5,
+                     payload_size=UF2_PAYLOAD_SIZE,
+                     batch_blocks=STREAM_BATCH_BLOCKS):
+    """Yield the UF2 image of a flat bin_data loaded at base_addr.
+
+    Single-region case of iter_uf2_region_batches(), same buffer contract.
+    """
+    return iter_uf2_region_batches(
+        [(base_addr, bin_data)], family_id, payload_size, batch_blocks)
+
+
+def iter_uf2_blocks(bin_data, base_addr, family_id=0x00C5C5C5,
+                    payload_size=UF2_PAYLOAD_SIZE):
+    """Yield the UF2 image of bin_data one 512-byte block at a time.
+
+    Same buffer-reuse contract as iter_uf2_batches(): each memoryview is
+    only valid until the next block is requested. Intended for uploaders
+    that stream blocks straight to a UF2 drive.
+    """
+    for batch in iter_uf2_batches(bin_data, base_addr, family_id, payload_size):
+        for pos in range(0, len(batch), UF2_BLOCK_SIZE):
+            yield batch[pos:pos + UF2_BLOCK_SIZE]
+
+
 def convert_bin_to_uf2(bin_data, base_addr, family_id=0x00C5C5C5,
                        payload_size=UF2_PAYLOAD_SIZE):
     """Convert binary firmware data to UF2 format.
 
+    Encodes into one preallocated buffer; bin_data is neither padded nor
+    copied.
+
     Args:
-        bin_data: bytes - raw firmware binary
+        bin_data: bytes-like - raw firmware binary
         base_addr: int - absolute flash address where firmware starts
         family_id: int - UF2 family ID
         payload_size: int - bytes of data per UF2 block (usually 256)
 
     Returns:
-        bytes - UF2 formatted data
+        bytearray - UF2 formatted data
+    """
+    data = memoryview(bin_data)
+    num_blocks = _num_blocks(len(data), payload_size)
+    out = bytearray(num_blocks * UF2_BLOCK_SIZE)
+    if num_blocks:
+        _encode_blocks(memoryview(out), data, 0, num_blocks, num_blocks,
+                       base_addr, _block_template(family_id, payload_size),
+                       payload_size)
+    return out
+
+
+def page_runs(regions, payload_size=UF2_PAYLOAD_SIZE, aligned=False):
+    """Coalesce (address, data) regions into runs that never share a page.
+
+    Each run starts on a payload_size boundary. Regions that touch the same
+    page are merged into one run with the gap filled with 0xFF, so no page is
+    sent twice; regions on separate pages stay separate and the gap between
+    them is not encoded at all. A lone region (unless aligned is set), or an
+    already-aligned one that shares no page, is passed through without copying.
+    """
+    regions = [region for region in regions if len(region[1])]
+    if len(regions) == 1 and not aligned:
+        return regions
+    runs = []
+    group = []
+    group_end = 0
+    for addr, data in sorted(regions, key=lambda region: region[0]):
+        start = addr - addr % payload_size
+        if group and start < group_end:
+            group.append((addr, data))
+            group_end = max(group_end, addr + len(data))
+            continue
+        if group:
+            runs.append(_merge_group(group, payload_size))
+        group = [(addr, data)]
+        group_end = addr + len(data)
+    if group:
+        runs.append(_merge_group(group, payload_size))
+    return runs
+
+
+def _merge_group(group, payload_size):
+    addr, data = group[0]
+    start = addr - addr % payload_size
+    if len(group) == 1 and start == addr:
+        return addr, data
+    end = max(a + len(d) for a, d in group)
+    merged = bytearray(b"\xFF") * (end - start)
+    for a, d in group:
+        merged[a - start:a - start + len(d)] = d
+    return start, merged
+
+
+def parse_ihex(text):
+    """Return the (address, bytearray) regions of an Intel HEX image.
+
+    Handles data, EOF, extended segment and extended linear address records;
+    start address records are ignored. Consecutive records are joined.
     """
-    # Pad bin_data to multiple of payload_size
-    padding = (payload_size - len(bin_data) % payload_size) % payload_size
-    if padding:
-        bin_data = bin_data + b"\xFF" * padding
+    regions = []
+    upper = 0
+    current = None
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(":"):
+            raise ValueError("line %d: not an Intel HEX record" % lineno)
+        try:
+            record = bytes.fromhex(line[1:])
+        except ValueError:
+            raise ValueError("line %d: invalid hex digits" % lineno)
+        if len(record) < 5 or len(record) != record[0] + 5:
+            raise ValueError("line %d: bad record length" % lineno)
+        if sum(record) & 0xFF:
+            raise ValueError("line %d: checksum mismatch" % lineno)
+        kind = record[3]
+        payload = record[4:-1]
+        if kind == 0x00:
+            addr = upper + ((record[1] << 8) | record[2])
+            if current is not None and current[0] + len(current[1]) == addr:
+                current[1].extend(payload)
+            else:
+                current = (addr, bytearray(payload))
+                regions.append(current)
+        elif kind == 0x01:
+            break
+        elif kind == 0x02:
+            upper = ((payload[0] << 8) | payload[1]) << 4
+        elif kind == 0x04:
+            upper = ((payload[0] << 8) | payload[1]) << 16
+    return regions
+
+
+def parse_elf(data):
+    """Return the (load address, bytes) regions of an ELF image.
+
+    Mirrors objcopy -O binary: one region per allocated section with file
+    contents, placed at its load address (the LMA, taken from the PT_LOAD
+    segment that holds it). Images without section headers fall back to
+    the PT_LOAD segments themselves.
+    """
+    if bytes(data[:4]) != b"\x7fELF":
+        raise ValueError("not an ELF file")
+    is64 = data[4] == 2
+    endian = "<" if data[5] == 1 else ">"
+    if is64:
+        e_phoff, e_shoff = struct.unpack_from(endian + "QQ", data, 32)
+        e_phentsize, e_phnum, e_shentsize, e_shnum = struct.unpack_from(
+            endian + "HHHH", data, 54)
+        phdr = struct.Struct(endian + "IIQQQQQQ")
+        shdr = struct.Struct(endian + "IIQQQQIIQQ")
+    else:
+        e_phoff, e_shoff = struct.unpack_from(endian + "II", data, 28)
+        e_phentsize, e_phnum, e_shentsize, e_shnum = struct.unpack_from(
+            endian + "HHHH", data, 42)
+        phdr = struct.Struct(endian + "IIIIIIII")
+        shdr = struct.Struct(endian + "IIIIIIIIII")
+
+    segments = []
+    for index in range(e_phnum):
+        fields = phdr.unpack_from(data, e_phoff + index * e_phentsize)
+        if is64:
+            p_type, _, p_offset, _, p_paddr, p_filesz = fields[:6]
+        else:
+            p_type, p_offset, _, p_paddr, p_filesz = fields[:5]
+        if p_type == 1 and p_filesz:  # PT_LOAD
+            segments.append((p_offset, p_filesz, p_paddr))
+
+    regions = []
+    for index in range(e_shnum):
+        fields = shdr.unpack_from(data, e_shoff + index * e_shentsize)
+        sh_type, sh_flags, sh_offset, sh_size = (
+            fields[1], fields[2], fields[4], fields[5])
+        # SHF_ALLOC, skipping SHT_NULL and SHT_NOBITS (.bss and friends)
+        if not (sh_flags & 0x2) or sh_type in (0, 8) or not sh_size:
+            continue
+        for p_offset, p_filesz, p_paddr in segments:
+            if p_offset <= sh_offset < p_offset + p_filesz:
+                regions.append((p_paddr + sh_offset - p_offset,
+                                bytes(data[sh_offset:sh_offset + sh_size])))
+                break
+    if not e_shnum:
+        regions = [(p_paddr, bytes(data[p_offset:p_offset + p_filesz]))
+                   for p_offset, p_filesz, p_paddr in segments]
+    return regions
+
 
-    num_blocks = len(bin_data) // payload_size
-    blocks = []
+def parse_uf2(data):
+    """Return the (address, bytes) payloads of a UF2 image's main-flash blocks."""
+    regions = []
+    for pos in range(0, len(data) - UF2_BLOCK_SIZE + 1, UF2_BLOCK_SIZE):
+        magic0, magic1, flags, addr, size = struct.unpack_from(
+            "<IIIII", data, pos)
+        if magic0 != UF2_MAGIC_START_0 or magic1 != UF2_MAGIC_START_1:
+            raise ValueError("bad UF2 block at offset %d" % pos)
+        if flags & UF2_FLAG_NOT_MAIN_FLASH or not 0 < size <= 476:
+            continue
+        start = pos + _DATA_OFFSET
+        regions.append((addr, bytes(data[start:start + size])))
+    return regions
 
-    for block_idx in range(num_blocks):
-        offset = block_idx * payload_size
-        chunk = bin_data[offset:offset + payload_size]
 
-        header = struct.pack(
-            "<IIIIIIII",
-            UF2_MAGIC_START_0,          # magicStart0
-            UF2_MAGIC_START_1,          # magicStart1
-            UF2_FLAG_FAMILY_ID,          # flags
-            base_addr + offset,          # targetAddr
-            payload_size,                # payloadSize
-            block_idx,                   # blockNo
-            num_blocks,                  # numBlocks
-            family_id,                   # fileSize / familyID
-        )
+def uf2_family_id(data):
+    """Return the family ID of a UF2 image, or None if it does not carry one."""
+    if len(data) < UF2_BLOCK_SIZE:
+        return None
+    magic0, _, flags = struct.unpack_from("<III", data, 0)
+    if magic0 != UF2_MAGIC_START_0 or not flags & UF2_FLAG_FAMILY_ID:
+        return None
+    return struct.unpack_from("<I", data, 28)[0]
 
-        # Pad chunk to fill the data portion (476 bytes max)
-        data_pad = b"\x00" * (476 - payload_size)
-        footer = struct.pack("<I", UF2_MAGIC_END)
 
-        block = header + chunk + data_pad + footer
-        assert len(block) == UF2_BLOCK_SIZE
-        blocks.append(block)
+def _split_pages(runs, page_size):
+    """Return {page address: data} for page-aligned runs (as from page_runs)."""
+    pages = {}
+    for addr, data in runs:
+        for offset in range(0, len(data), page_size):
+            pages[addr + offset] = data[offset:offset + page_size]
+    return pages
 
-    return b"".join(blocks)
+
+def delta_regions(regions, previous, page_size=UF2_PAYLOAD_SIZE):
+    """Return the page_size pages of regions that differ from previous.
+
+    previous is the region list of the image already in flash. Pages are
+    compared padded with 0xFF, the value erased flash reads back as, but
+    emitted with only their real contents. If nothing changed, the first
+    page is returned anyway so the bootloader still completes a transfer
+    and restarts the application.
+    """
+    pages = _split_pages(page_runs(regions, page_size, True), page_size)
+    old = _split_pages(page_runs(previous, page_size, True), page_size)
+    changed = []
+    for addr in sorted(pages):
+        data = bytes(pages[addr])
+        padded = data + b"\xFF" * (page_size - len(data))
+        before = bytes(old.get(addr, b""))
+        if padded != before + b"\xFF" * (page_size - len(before)):
+            changed.append((addr, data))
+    if not changed and pages:
+        addr = min(pages)
+        changed.append((addr, bytes(pages[addr])))
+    return changed
+
+
+def load_regions(data, base_addr=None):
+    """Return (address, data) regions for a .bin, Intel HEX, ELF or UF2 image.
+
+    The format is detected from the contents. A flat binary needs base_addr;
+    for HEX and ELF it is optional and, when given, is the lowest address the
+    image may touch (so the bootloader can never be overwritten).
+    """
+    if bytes(data[:4]) == b"\x7fELF":
+        regions = parse_elf(data)
+    elif bytes(data[:4]) == struct.pack("<I", UF2_MAGIC_START_0):
+        regions = parse_uf2(data)
+    elif bytes(data[:1]) == b":":
+        regions = parse_ihex(bytes(data).decode("ascii"))
+    else:
+        if base_addr is None:
+            raise ValueError("a base address is required for .bin input")
+        return [(base_addr, data)]
+    if base_addr is not None:
+        for addr, _ in regions:
+            if addr < base_addr:
+                raise ValueError(
+                    "image loads at 0x%08X, below base address 0x%08X"
+                    % (addr, base_addr))
+    return regions
+
+
+@contextlib.contextmanager
+def _map_input(path):
+    """Map path read-only; empty files (which mmap rejects) map to b""."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def write_uf2_file(input_path, output_path, base_addr=None,
+                   family_id=0x00C5C5C5, payload_size=UF2_PAYLOAD_SIZE,
+                   delta_from=None, delta_page=None):
+    """Stream input_path (.bin/.hex/.elf/.uf2) to output_path (.uf2).
+
+    If delta_from names the UF2 image currently in flash, only the
+    delta_page-sized pages (default: payload_size) that differ from it are
+    written.
+
+    Returns:
+        list of (address, size) encoded runs, number of UF2 blocks written
+    """
+    with _map_input(input_path) as data:
+        regions = load_regions(data, base_addr)
+        if delta_from:
+            delta_page = delta_page or payload_size
+            if delta_page % payload_size:
+                raise ValueError("delta page size must be a multiple of %d"
+                                 % payload_size)
+            with _map_input(delta_from) as previous:
+                regions = delta_regions(regions, parse_uf2(previous),
+                                        delta_page)
+        runs = page_runs(regions, payload_size)
+        # closing() releases the generator's views of the mapping before the
+        # mapping itself is closed, even when a write fails.
+        batches = iter_uf2_region_batches(runs, family_id, payload_size)
+        with open(output_path, "wb") as out, contextlib.closing(batches):
+            for batch in batches:
+                out.write(batch)
+        layout = [(addr, len(run)) for addr, run in runs]
+    return layout, sum(_num_blocks(size, payload_size) for _, size in layout)
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Convert .bin firmware to .uf2 format"
+        description="Convert .bin, .hex or .elf firmware to .uf2 format"
     )
     parser.add_argument(
         "-i", "--input", required=True,
-        help="Input .bin file"
+        help="Input .bin, Intel HEX, ELF or UF2 file"
     )
     parser.add_argument(
         "-o", "--output", default=None,
         help="Output .uf2 file (default: input with .uf2 extension)"
     )
     parser.add_argument(
-        "-b", "--base", type=lambda x: int(x, 0), required=True,
-        help="Base address (hex, e.g. 0x08008000)"
+        "-b", "--base", type=lambda x: int(x, 0), default=None,
+        help="Base address (hex, e.g. 0x08008000); required for .bin input, "
+             "lowest allowed load address for HEX/ELF input"
     )
     parser.add_argument(
         "-f", "--family", default="stm32c5",
@@ -113,6 +481,16 @@ def main():
         "--family-id", type=lambda x: int(x, 0), default=None,
         help="Raw family ID (overrides --family)"
     )
+    parser.add_argument(
+        "--delta-from", default=None, metavar="UF2",
+        help="Previously flashed .uf2; only pages that changed are encoded"
+    )
+    parser.add_argument(
+        "--delta-page", type=lambda x: int(x, 0), default=UF2_PAYLOAD_SIZE,
+        help="Page size compared for --delta-from (default: %d); use the "
+             "flash erase size if the bootloader erases whole sectors"
+             % UF2_PAYLOAD_SIZE
+    )
 
     args = parser.parse_args()
 
@@ -120,31 +498,31 @@ def main():
     if args.output:
         output = args.output
     else:
-        if args.input.endswith(".bin"):
-            output = args.input[:-4] + ".uf2"
+        root, ext = os.path.splitext(args.input)
+        if ext in (".bin", ".hex", ".elf"):
+            output = root + ".uf2"
         else:
             output = args.input + ".uf2"
 
     # Determine family ID
     family_id = args.family_id if args.family_id else FAMILY_IDS[args.family]
 
-    # Read input
-    with open(args.input, "rb") as f:
-        bin_data = f.read()
-
-    # Convert
-    uf2_data = convert_bin_to_uf2(bin_data, args.base, family_id)
-
-    # Write output
-    with open(output, "wb") as f:
-        f.write(uf2_data)
+    # Convert (streamed: input is mmapped, output written batch by batch)
+    try:
+        layout, num_blocks = write_uf2_file(
+            args.input, output, args.base, family_id,
+            delta_from=args.delta_from, delta_page=args.delta_page)
+    except ValueError as e:
+        sys.stderr.write("Error: %s: %s\n" % (args.input, e))
+        sys.exit(1)
 
+    size = sum(run_size for _, run_size in layout)
     print(f"Converted: {args.input} -> {output}")
-    print(f"  Size: {len(bin_data)} -> {len(uf2_data)} bytes")
-    print(f"  Base: 0x{args.base:08X}")
+    print(f"  Size: {size} -> {num_blocks * UF2_BLOCK_SIZE} bytes")
+    for addr, run_size in layout:
+        print(f"  Region: 0x{addr:08X}-0x{addr + run_size:08X}")
     print(f"  Family ID: 0x{family_id:08X}")
-    print(f"  Blocks: {len(uf2_data) // UF2_BLOCK_SIZE}")
-
+    print(f"  Blocks: {num_blocks}")
 
 if __name__ == "__main__":
     main()
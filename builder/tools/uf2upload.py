@@ -4,18 +4,32 @@ UF2 upload tool for TinyUF2 bootloader.
 
 Detects the UF2 mass storage device, optionally triggers bootloader mode
 via serial 1200-baud touch (for boards with USB CDC support), and writes
-the .uf2 firmware file to the virtual FAT drive.
+the .uf2 firmware file to the virtual FAT drive. Trigger delays come from
+the board's upload.uf2.trigger_profile; each trigger reports how long its
+port took to go away and the drive to come up, to tune them against.
+
+With --baseline-dir, the image flashed to each board (by USB serial number)
+is remembered, and the next upload only writes the pages that changed since
+then, provided the board's CURRENT.UF2 reads back exactly that image.
 
 Supports: Linux, Windows, macOS
 """
 
 import os
+import re
 import sys
 import time
+import errno
+import select
+import shutil
+import struct
 import argparse
 import subprocess
 import platform
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import uf2conv  # noqa: E402
+
 # ---------------------------------------------------------------------------
 # UF2 drive detection
 # ---------------------------------------------------------------------------
@@ -24,12 +38,104 @@ UF2_VOLUME_LABEL = "XIAOC5BOOT"
 UF2_DRIVE_TIMEOUT = 30  # seconds to wait for drive to appear
 
 
+# USB VID:PID pairs of the application firmware's CDC port; None means
+# "look them up from the boards/*.json entries using UF2_VOLUME_LABEL".
+UF2_HWIDS = None
+
+BOARDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "..", "..", "boards")
+
+
 def set_volume_label(label):
     """Override the default volume label for UF2 drive detection."""
     global UF2_VOLUME_LABEL
     UF2_VOLUME_LABEL = label
 
 
+def set_hwids(hwids):
+    """Override the VID:PID pairs whose serial ports get triggered."""
+    global UF2_HWIDS
+    UF2_HWIDS = [(int(vid, 16), int(pid, 16)) for vid, pid in hwids]
+
+
+def _uf2_boards():
+    """Yield the boards/*.json manifests that use UF2_VOLUME_LABEL."""
+    import glob
+    import json
+    for path in sorted(glob.glob(os.path.join(BOARDS_DIR, "*.json"))):
+        try:
+            with open(path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        uf2 = manifest.get("upload", {}).get("uf2", {})
+        if uf2.get("volume_label", "").upper() == UF2_VOLUME_LABEL.upper():
+            yield manifest
+
+
+def board_hwids():
+    """VID:PID pairs of the boards flashed through UF2_VOLUME_LABEL."""
+    if UF2_HWIDS is not None:
+        return UF2_HWIDS
+    hwids = []
+    for manifest in _uf2_boards():
+        for vid, pid in manifest.get("build", {}).get("hwids", []):
+            hwids.append((int(vid, 0), int(pid, 0)))
+    return hwids
+
+
+def _mount_uf2_device(dev, mnt):
+    """Mount dev on mnt ourselves (no automounter); return mnt or None."""
+    try:
+        os.makedirs(mnt, exist_ok=True)
+        subprocess.run(["mount", dev, mnt], capture_output=True, timeout=10)
+        time.sleep(0.5)
+        if os.path.ismount(mnt):
+            return mnt
+    except Exception:
+        pass
+    return None
+
+
+# Unmounted UF2 partitions find_uf2_drives() has seen (device -> time) and
+# those it failed to mount, which are reported once
+_UNMOUNTED_SINCE = {}
+_UNMOUNTABLE = set()
+
+
+def _find_uf2_drives_linux(label):
+    """Mount points of every partition labelled label, mounting any that
+    nobody has mounted (CI and headless hosts run no automounter)."""
+    result = subprocess.run(
+        ["lsblk", "-P", "-p", "-o", "NAME,LABEL,MOUNTPOINT"],
+        capture_output=True, text=True, timeout=5
+    )
+    drives = []
+    for line in result.stdout.splitlines():
+        fields = dict(re.findall(r'(\w+)="([^"]*)"', line))
+        if fields.get("LABEL", "").upper() != label:
+            continue
+        if fields.get("MOUNTPOINT"):
+            drives.append(fields["MOUNTPOINT"])
+            continue
+        dev = fields.get("NAME", "")
+        if not dev or dev in _UNMOUNTABLE:
+            continue
+        # Give an automounter the same grace as the single-drive path
+        seen = _UNMOUNTED_SINCE.setdefault(dev, time.time())
+        if time.time() - seen < _AUTOMOUNT_GRACE:
+            continue
+        mnt = _mount_uf2_device(
+            dev, "/mnt/uf2_upload_" + os.path.basename(dev))
+        if mnt:
+            drives.append(mnt)
+        else:
+            _UNMOUNTABLE.add(dev)
+            print(f"\nWarning: UF2 drive {dev} is not mounted and mounting "
+                  "it failed; mount it manually or run with mount rights.")
+    return drives
+
+
 def _find_uf2_drive_linux():
     """Find UF2 drive on Linux using /dev/disk/by-label or lsblk."""
     # Method 1: /dev/disk/by-label/
@@ -50,15 +156,9 @@ def _find_uf2_drive_linux():
                 except Exception:
                     pass
                 # Try to mount
-                mnt = "/mnt/uf2_upload"
-                try:
-                    os.makedirs(mnt, exist_ok=True)
-                    subprocess.run(["mount", dev, mnt], capture_output=True, timeout=10)
-                    time.sleep(0.5)
-                    if os.path.ismount(mnt):
-                        return mnt
-                except Exception:
-                    pass
+                mnt = _mount_uf2_device(dev, "/mnt/uf2_upload")
+                if mnt:
+                    return mnt
 
     # Method 2: lsblk
     try:
@@ -116,8 +216,81 @@ def find_uf2_drive():
     return None
 
 
-def wait_for_uf2_drive(timeout=UF2_DRIVE_TIMEOUT):
-    """Wait for UF2 drive to appear, return path or None."""
+def find_uf2_drives():
+    """Find every UF2 drive carrying the volume label.
+
+    Used for multi-board flashing, where several bootloaders expose the
+    same label at once (and /dev/disk/by-label can only name one of them).
+    On Linux, labelled partitions nobody has mounted are mounted here, as
+    the single-drive path does.
+    """
+    label = UF2_VOLUME_LABEL.upper()
+    drives = []
+    system = platform.system()
+    try:
+        if system == "Linux":
+            drives = _find_uf2_drives_linux(label)
+        elif system == "Windows":
+            result = subprocess.run(
+                ["powershell", "-Command",
+                 "(Get-WmiObject Win32_LogicalDisk | "
+                 "Where-Object { $_.VolumeName -eq '" + UF2_VOLUME_LABEL
+                 + "' }).DeviceID"],
+                capture_output=True, text=True, timeout=10
+            )
+            drives = [line.strip() for line in result.stdout.splitlines()]
+        elif system == "Darwin":
+            # Duplicate labels are mounted as "LABEL", "LABEL 1", ...
+            for entry in os.listdir("/Volumes"):
+                base = re.sub(r" \d+$", "", entry)
+                if base.upper() == label:
+                    drives.append(os.path.join("/Volumes", entry))
+    except Exception:
+        pass
+    return sorted(d for d in set(drives) if d and os.path.isdir(d))
+
+
+def wait_for_uf2_drives(count=None, timeout=UF2_DRIVE_TIMEOUT, settle=3.0,
+                        seen=None):
+    """Wait for UF2 drives to appear and return their paths.
+
+    With count, returns as soon as that many drives are mounted (or what
+    was found at the timeout). Without it, returns once the set of drives
+    has stopped growing for settle seconds. seen, if given, maps each
+    drive not yet in it to the time.time() it was first found.
+    """
+    start = time.time()
+    drives = []
+    changed = start
+    dots = 0
+    while time.time() - start < timeout:
+        found = find_uf2_drives()
+        if seen is not None:
+            for drive in found:
+                seen.setdefault(drive, time.time())
+        if len(found) != len(drives):
+            drives = found
+            changed = time.time()
+        if count and len(drives) >= count:
+            break
+        if not count and drives and time.time() - changed >= settle:
+            break
+        time.sleep(0.5)
+        dots += 1
+        _print_progress(dots)
+    return drives
+
+
+def _print_progress(ticks):
+    if ticks % 4 == 0:
+        sys.stdout.write(".\n")
+    else:
+        sys.stdout.write(".")
+    sys.stdout.flush()
+
+
+def _poll_for_uf2_drive(timeout):
+    """Poll find_uf2_drive() every 0.5 s; portable fallback."""
     start = time.time()
     dots = 0
     while time.time() - start < timeout:
@@ -126,20 +299,212 @@ def wait_for_uf2_drive(timeout=UF2_DRIVE_TIMEOUT):
             return drive
         time.sleep(0.5)
         dots += 1
-        if dots % 4 == 0:
-            sys.stdout.write(".\n")
-            sys.stdout.flush()
-        else:
-            sys.stdout.write(".")
-            sys.stdout.flush()
+        _print_progress(dots)
+    return None
+
+
+# inotify(7) event bits used below
+_IN_CREATE = 0x00000100
+_IN_MOVED_TO = 0x00000080
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+# A labelled device that nobody auto-mounts within this many seconds is
+# handed to _find_uf2_drive_linux(), which mounts it itself.
+_AUTOMOUNT_GRACE = 2.0
+
+
+def _unescape_mountinfo(field):
+    return re.sub(r"\\([0-7]{3})", lambda m: chr(int(m.group(1), 8)), field)
+
+
+def _mount_point(mountinfo, dev):
+    """Return where dev is mounted according to /proc/self/mountinfo text."""
+    try:
+        rdev = os.stat(dev).st_rdev
+    except OSError:
+        return None
+    major_minor = "%d:%d" % (os.major(rdev), os.minor(rdev))
+    for line in mountinfo.splitlines():
+        fields = line.split()
+        if len(fields) > 4 and fields[2] == major_minor:
+            mount = _unescape_mountinfo(fields[4])
+            if os.path.isdir(mount):
+                return mount
     return None
 
 
+def _labelled_device():
+    """Return the block device carrying UF2_VOLUME_LABEL, or None."""
+    by_label = "/dev/disk/by-label"
+    try:
+        entries = os.listdir(by_label)
+    except OSError:
+        return None
+    for entry in entries:
+        # udev escapes blanks and other unsafe characters as \xNN
+        label = re.sub(r"\\x([0-9a-fA-F]{2})",
+                       lambda m: chr(int(m.group(1), 16)), entry)
+        if label.upper() == UF2_VOLUME_LABEL.upper():
+            return os.path.realpath(os.path.join(by_label, entry))
+    return None
+
+
+class _Inotify(object):
+    """Minimal ctypes binding of inotify(7); raises OSError if unavailable."""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+                           use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def watch(self, path, mask):
+        """Watch path; return False if it does not exist (yet)."""
+        return self._add_watch(self.fd, os.fsencode(path), mask) >= 0
+
+    def drain(self):
+        """Discard queued events; return the names they carried."""
+        names = []
+        while True:
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return names
+                raise
+            pos = 0
+            while pos + _INOTIFY_EVENT.size <= len(data):
+                _, _, _, length = _INOTIFY_EVENT.unpack_from(data, pos)
+                pos += _INOTIFY_EVENT.size
+                names.append(os.fsdecode(data[pos:pos + length].rstrip(b"\0")))
+                pos += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _watch_labels(inotify):
+    """Watch /dev/disk/by-label; until udev creates it, watch its parents.
+
+    Returns True once by-label itself is watched.
+    """
+    if inotify.watch("/dev/disk/by-label", _IN_CREATE | _IN_MOVED_TO):
+        return True
+    if not (inotify.watch("/dev/disk", _IN_CREATE)
+            or inotify.watch("/dev", _IN_CREATE)):
+        raise OSError(errno.ENOENT, "/dev is not watchable")
+    return False
+
+
+def _wait_for_uf2_drive_inotify(timeout):
+    """Wait for the UF2 drive on Linux without polling or subprocesses.
+
+    Sleeps in poll(2) on an inotify watch of /dev/disk/by-label (or its
+    parent, until udev creates it) and on /proc/self/mountinfo,
+    which the kernel flags with POLLPRI whenever the mount table changes.
+    Wakes every 0.5 s only to print progress.
+
+    Raises OSError when inotify or mountinfo polling is unavailable.
+    """
+    inotify = _Inotify()
+    try:
+        mountinfo = open("/proc/self/mountinfo", "r")
+    except OSError:
+        inotify.close()
+        raise
+    try:
+        watching_labels = _watch_labels(inotify)
+        poller = select.poll()
+        poller.register(inotify.fd, select.POLLIN)
+        poller.register(mountinfo.fileno(), select.POLLPRI | select.POLLERR)
+
+        start = time.time()
+        deadline = start + timeout
+        next_dot = start + 0.5
+        dots = 0
+        seen_device = None
+        while True:
+            dev = _labelled_device()
+            if dev:
+                mountinfo.seek(0)
+                mount = _mount_point(mountinfo.read(), dev)
+                if mount:
+                    return mount
+                seen_device = seen_device or time.time()
+                if time.time() - seen_device >= _AUTOMOUNT_GRACE:
+                    drive = _find_uf2_drive_linux()
+                    if drive:
+                        return drive
+                    seen_device = time.time()
+            now = time.time()
+            if now >= deadline:
+                return None
+            wait = min(deadline, next_dot) - now
+            if seen_device:
+                wait = min(wait, seen_device + _AUTOMOUNT_GRACE - now)
+            for fd, _ in poller.poll(max(wait, 0) * 1000):
+                if fd == inotify.fd:
+                    inotify.drain()
+                    if not watching_labels:
+                        watching_labels = _watch_labels(inotify)
+            if time.time() >= next_dot:
+                next_dot += 0.5
+                dots += 1
+                _print_progress(dots)
+    finally:
+        mountinfo.close()
+        inotify.close()
+
+
+def wait_for_uf2_drive(timeout=UF2_DRIVE_TIMEOUT):
+    """Wait for UF2 drive to appear, return path or None."""
+    if platform.system() == "Linux":
+        try:
+            return _wait_for_uf2_drive_inotify(timeout)
+        except (OSError, AttributeError, ValueError):
+            pass  # no inotify (or no ctypes/libc): fall back to polling
+    return _poll_for_uf2_drive(timeout)
+
+
 # ---------------------------------------------------------------------------
 # Bootloader trigger
 # ---------------------------------------------------------------------------
 
-def trigger_bootloader_1200baud(port):
+# Delays (seconds) used by the trigger methods. A board overrides any of
+# them with upload.uf2.trigger_profile in its boards/*.json manifest, tuned
+# against the latencies report_triggers() prints after each trigger.
+DEFAULT_TRIGGER_PROFILE = {
+    "touch_hold": 0.1,      # 1200-baud port held open before DTR toggle
+    "dtr_pulse": 0.05,      # DTR low time of one reset pulse
+    "double_tap_gap": 0.2,  # between resets, inside TinyUF2's 500 ms window
+    "settle": 0.1,          # after the last pulse before closing the port
+}
+
+# How long a triggered serial port is watched for going away (board reset)
+TRIGGER_PORT_WAIT = 2.0
+
+
+def trigger_profile():
+    """DEFAULT_TRIGGER_PROFILE merged with the board's trigger_profile."""
+    profile = dict(DEFAULT_TRIGGER_PROFILE)
+    for manifest in _uf2_boards():
+        overrides = manifest["upload"]["uf2"].get("trigger_profile")
+        if overrides:
+            profile.update((k, float(v)) for k, v in overrides.items()
+                           if k in profile)
+            break
+    return profile
+
+
+def trigger_bootloader_1200baud(port, profile=DEFAULT_TRIGGER_PROFILE):
     """Trigger bootloader via 1200 baud touch.
 
     This is the standard mechanism used by CircuitPython, Adafruit UF2,
@@ -158,19 +523,19 @@ def trigger_bootloader_1200baud(port):
     try:
         # Open at 1200 baud - this is the "magic" signal
         s = serial.Serial(port, 1200)
-        time.sleep(0.1)
+        time.sleep(profile["touch_hold"])
         # Toggle DTR to ensure the signal is sent
         s.dtr = False
-        time.sleep(0.05)
+        time.sleep(profile["dtr_pulse"])
         s.dtr = True
-        time.sleep(0.05)
+        time.sleep(profile["dtr_pulse"])
         s.close()
         return True
     except Exception:
         return False
 
 
-def trigger_bootloader_dtr_double_tap(port):
+def trigger_bootloader_dtr_double_tap(port, profile=DEFAULT_TRIGGER_PROFILE):
     """Trigger bootloader via DTR double-tap simulation.
 
     For boards where the USB-serial chip's DTR is connected to the MCU's
@@ -186,30 +551,125 @@ def trigger_bootloader_dtr_double_tap(port):
         s = serial.Serial(port, 115200)
         # First reset
         s.dtr = False
-        time.sleep(0.05)
+        time.sleep(profile["dtr_pulse"])
         s.dtr = True
         # Wait within the 500ms double-tap window
-        time.sleep(0.2)
+        time.sleep(profile["double_tap_gap"])
         # Second reset (double-tap)
         s.dtr = False
-        time.sleep(0.05)
+        time.sleep(profile["dtr_pulse"])
         s.dtr = True
-        time.sleep(0.1)
+        time.sleep(profile["settle"])
         s.close()
         return True
     except Exception:
         return False
 
 
-def trigger_bootloader(port):
-    """Try all bootloader trigger methods on a serial port."""
+TRIGGER_METHODS = (
+    ("1200bps-touch", trigger_bootloader_1200baud),
+    ("dtr-double-tap", trigger_bootloader_dtr_double_tap),
+)
+
+
+def trigger_bootloader(port, profile=DEFAULT_TRIGGER_PROFILE):
+    """Try all bootloader trigger methods on a serial port.
+
+    Returns:
+        name of the method that succeeded, or None
+    """
+    return _timed_trigger(port, profile, port_wait=0)[1]
+
+
+def _port_gone_after(port, started, timeout=TRIGGER_PORT_WAIT):
+    """Seconds from started until port went away, or None if it stayed
+    for timeout seconds (or its presence cannot be checked)."""
+    if os.path.isabs(port):
+        def present():
+            return os.path.exists(port)
+    else:
+        # COM ports are not file system paths
+        try:
+            from serial.tools.list_ports import comports
+        except ImportError:
+            return None
+
+        def present():
+            return any(info.device == port for info in comports())
+    deadline = time.time() + timeout
+    while present():
+        if time.time() >= deadline:
+            return None
+        time.sleep(0.01)
+    return time.time() - started
+
+
+def _timed_trigger(port, profile, port_wait=TRIGGER_PORT_WAIT):
+    """Trigger port and time it.
+
+    Returns:
+        (port, method name or None, time.time() the method started,
+         seconds from then until the port went away or None)
+    """
     # Method 1: 1200 baud touch (standard UF2 mechanism)
-    if trigger_bootloader_1200baud(port):
-        return True
     # Method 2: DTR double-tap (hardware reset connection)
-    if trigger_bootloader_dtr_double_tap(port):
-        return True
-    return False
+    for name, method in TRIGGER_METHODS:
+        started = time.time()
+        if method(port, profile):
+            gone = _port_gone_after(port, started, port_wait) if port_wait else None
+            return port, name, started, gone
+    return port, None, None, None
+
+
+def trigger_bootloaders(ports, profile=None):
+    """Trigger the bootloader on all ports concurrently.
+
+    Each thread also watches its port until the board resets away from it.
+
+    Returns:
+        list of _timed_trigger() results, one per port
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    profile = profile or trigger_profile()
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+        return list(pool.map(lambda port: _timed_trigger(port, profile), ports))
+
+
+def report_triggers(triggers, drives_seen=()):
+    """Print each port's trigger method and how long after it started the
+    port went away and (for a single port) the UF2 drive came up.
+
+    drives_seen: time.time() at which each new UF2 drive was first seen.
+    """
+    drives_seen = sorted(drives_seen)
+    triggered = [t for t in triggers if t[1]]
+    by_method = {}
+    for port, method, started, gone in triggers:
+        if not method:
+            print(f"  {port}: no trigger")
+            continue
+        times = []
+        if gone is not None:
+            times.append(f"port gone {gone:.2f}s")
+            by_method.setdefault(method, []).append(gone)
+        if len(triggered) == 1 and drives_seen:
+            times.append(f"drive up {max(drives_seen[0] - started, 0):.2f}s")
+        if times:
+            print(f"  {port}: {method}, {', '.join(times)} after trigger start")
+        else:
+            print(f"  {port}: {method}, port still present "
+                  f"{TRIGGER_PORT_WAIT:.1f}s later")
+    if len(triggered) > 1:
+        for method, times in sorted(by_method.items()):
+            print(f"  {method}: port gone {min(times):.2f}-{max(times):.2f}s "
+                  f"after trigger start on {len(times)} port(s)")
+        if drives_seen:
+            first = min(t[2] for t in triggered)
+            print(f"  UF2 drives up {max(drives_seen[0] - first, 0):.2f}-"
+                  f"{max(drives_seen[-1] - first, 0):.2f}s after the first trigger")
 
 
 # ---------------------------------------------------------------------------
@@ -227,23 +687,40 @@ def write_uf2_to_drive(uf2_path, drive_path):
     in real-time. When all blocks are received, the device resets
     automatically (drive disappears).
     """
-    dest = os.path.join(drive_path, os.path.basename(uf2_path))
+    try:
+        with open(uf2_path, "rb") as src:
+            data = src.read()
+    except OSError as e:
+        print(f"  Read error: {e}")
+        return False
+    ok, error = write_uf2_data(data, os.path.basename(uf2_path), drive_path)
+    if error:
+        print(f"  Write error: {error}")
+    return ok
+
+
+def write_uf2_data(data, name, drive_path):
+    """Write an in-memory UF2 image to drive_path/name in 512-byte chunks.
+
+    data is only read, so one buffer can be shared by concurrent writers.
+
+    Returns:
+        (success, error or None)
+    """
+    dest = os.path.join(drive_path, name)
     chunk_size = 512  # Match UF2 block / FAT sector size
+    view = memoryview(data)
 
     try:
-        with open(uf2_path, "rb") as src:
-            with open(dest, "wb") as dst:
-                while True:
-                    chunk = src.read(chunk_size)
-                    if not chunk:
-                        break
-                    dst.write(chunk)
-                dst.flush()
-                try:
-                    os.fsync(dst.fileno())
-                except OSError:
-                    pass
-        return True
+        with open(dest, "wb") as dst:
+            for pos in range(0, len(view), chunk_size):
+                dst.write(view[pos:pos + chunk_size])
+            dst.flush()
+            try:
+                os.fsync(dst.fileno())
+            except OSError:
+                pass
+        return True, None
     except OSError as e:
         # If the drive disappears after writing, the bootloader received
         # the firmware and is resetting - this is actually success.
@@ -251,10 +728,9 @@ def write_uf2_to_drive(uf2_path, drive_path):
         if errno == 433:  # WinError 433: device does not exist
             # Check if the drive is gone (device reset = upload success)
             time.sleep(1)
-            if not find_uf2_drive():
-                return True
-        print(f"  Write error: {e}")
-        return False
+            if not os.path.isdir(drive_path):
+                return True, None
+        return False, e
 
 
 def write_uf2_cmd(uf2_path, drive_path):
@@ -281,17 +757,155 @@ def write_uf2_cmd(uf2_path, drive_path):
         return False
 
 
+# ---------------------------------------------------------------------------
+# Delta upload
+# ---------------------------------------------------------------------------
+
+def _board_serial(serial_port):
+    """USB serial number of the board behind serial_port, or None."""
+    if not serial_port:
+        return None
+    try:
+        import serial.tools.list_ports
+        for info in serial.tools.list_ports.comports():
+            if info.device == serial_port and info.serial_number:
+                return info.serial_number
+    except Exception:
+        pass
+    return None
+
+
+def _baseline_path(baseline_dir, board_serial):
+    """Path of the last image flashed to the board with board_serial."""
+    key = re.sub(r"[^A-Za-z0-9_.-]", "_", board_serial)
+    return os.path.join(baseline_dir, key + ".uf2")
+
+
+def _image_family(path):
+    with open(path, "rb") as f:
+        return uf2conv.uf2_family_id(f.read(uf2conv.UF2_BLOCK_SIZE))
+
+
+def _read_flash(current, addr, length):
+    """Read length bytes at addr from an open CURRENT.UF2; None if out of range.
+
+    TinyUF2 lays CURRENT.UF2 out as one block per payload, in address order
+    from the start of the application area, so only the blocks covering the
+    range are read.
+    """
+    current.seek(0)
+    head = current.read(uf2conv.UF2_BLOCK_SIZE)
+    if len(head) < uf2conv.UF2_BLOCK_SIZE:
+        return None
+    magic0, magic1, _, base, payload = struct.unpack_from("<IIIII", head, 0)
+    if (magic0 != uf2conv.UF2_MAGIC_START_0
+            or magic1 != uf2conv.UF2_MAGIC_START_1 or not payload):
+        return None
+    if addr < base:
+        return None
+    first = (addr - base) // payload
+    last = (addr + length - 1 - base) // payload
+    data = bytearray()
+    current.seek(first * uf2conv.UF2_BLOCK_SIZE)
+    for index in range(first, last + 1):
+        block = current.read(uf2conv.UF2_BLOCK_SIZE)
+        if len(block) < uf2conv.UF2_BLOCK_SIZE:
+            return None
+        block_addr, size = struct.unpack_from("<II", block, 12)
+        if block_addr != base + index * payload or size != payload:
+            return None
+        data += block[32:32 + payload]
+    offset = addr - (base + first * payload)
+    return bytes(data[offset:offset + length])
+
+
+def _flash_holds(drive, baseline):
+    """True if the board behind drive still holds the image in baseline.
+
+    Reads the baseline's address ranges back from the bootloader's
+    CURRENT.UF2, so a board flashed since (over SWD, from another project
+    or host) or a drive belonging to another board is never sent a delta.
+    """
+    current_path = os.path.join(drive, "CURRENT.UF2")
+    if not os.path.isfile(current_path):
+        return False
+    with open(baseline, "rb") as f:
+        regions = uf2conv.parse_uf2(f.read())
+    # Coalesce back-to-back blocks so each range is read in one pass
+    runs = []
+    for addr, data in sorted(regions, key=lambda region: region[0]):
+        if runs and runs[-1][0] + len(runs[-1][1]) == addr:
+            runs[-1][1].extend(data)
+        else:
+            runs.append((addr, bytearray(data)))
+    with open(current_path, "rb") as current:
+        for addr, data in runs:
+            if _read_flash(current, addr, len(data)) != bytes(data):
+                return False
+    return True
+
+
+def _delta_image(uf2_path, baseline, delta_page, drive):
+    """Return the image to write to drive: a delta or uf2_path itself.
+
+    The delta is only used when the recorded baseline has the image's
+    family ID and the board reads back exactly that baseline; anything
+    else writes the full image.
+    """
+    if not os.path.isfile(baseline):
+        print("  Delta: no previous upload recorded, writing full image")
+        return uf2_path
+    try:
+        family_id = _image_family(uf2_path)
+        if _image_family(baseline) != family_id:
+            print("  Delta: recorded image is for another family, writing full image")
+            return uf2_path
+        if not _flash_holds(drive, baseline):
+            print("  Delta: flash does not hold the recorded image, writing full image")
+            return uf2_path
+        delta_path = os.path.join(os.path.dirname(baseline), "delta.uf2")
+        _, blocks = uf2conv.write_uf2_file(
+            uf2_path, delta_path, family_id=family_id or 0,
+            delta_from=baseline, delta_page=delta_page)
+    except (OSError, ValueError) as e:
+        print(f"  Delta: skipped ({e}), writing full image")
+        return uf2_path
+    total = os.path.getsize(uf2_path) // uf2conv.UF2_BLOCK_SIZE
+    print(f"  Delta: {blocks} of {total} blocks changed since last upload")
+    return delta_path
+
+
+def _record_baseline(uf2_path, baseline, success):
+    """Remember what is now in flash, or forget it if the write failed."""
+    try:
+        if success:
+            os.makedirs(os.path.dirname(baseline), exist_ok=True)
+            shutil.copyfile(uf2_path, baseline)
+        elif os.path.isfile(baseline):
+            os.remove(baseline)
+    except OSError as e:
+        print(f"  Warning: could not update {baseline}: {e}")
+
+
 # ---------------------------------------------------------------------------
 # Main upload flow
 # ---------------------------------------------------------------------------
 
-def upload_uf2(uf2_path, serial_port=None, timeout=UF2_DRIVE_TIMEOUT):
+def upload_uf2(uf2_path, serial_port=None, timeout=UF2_DRIVE_TIMEOUT,
+               baseline_dir=None, delta_page=uf2conv.UF2_PAYLOAD_SIZE,
+               board_serial=None):
     """Complete UF2 upload flow.
 
     Args:
         uf2_path: path to .uf2 firmware file
         serial_port: optional serial port for bootloader trigger
         timeout: seconds to wait for UF2 drive
+        baseline_dir: optional directory of last-flashed images; enables
+            delta uploads that only write changed pages
+        delta_page: page size compared for delta uploads
+        board_serial: USB serial number of the board, when the caller read
+            it before the board left its application (default: looked up
+            from serial_port)
 
     Returns:
         True on success, False on failure
@@ -304,6 +918,26 @@ def upload_uf2(uf2_path, serial_port=None, timeout=UF2_DRIVE_TIMEOUT):
     print(f"  Volume label: {UF2_VOLUME_LABEL}")
     print(f"  Firmware size: {os.path.getsize(uf2_path)} bytes")
 
+    if baseline_dir:
+        board_serial = board_serial or _board_serial(serial_port)
+        if not board_serial:
+            print("  Delta: board serial number unknown, writing full image")
+            return _write_uf2(uf2_path, serial_port, timeout)
+        baseline = _baseline_path(baseline_dir, board_serial)
+        success = _write_uf2(
+            uf2_path, serial_port, timeout,
+            lambda drive: _delta_image(uf2_path, baseline, delta_page, drive))
+        _record_baseline(uf2_path, baseline, success)
+        return success
+    return _write_uf2(uf2_path, serial_port, timeout)
+
+
+def _write_uf2(uf2_path, serial_port, timeout, select_image=None):
+    """Bring up the UF2 drive and write uf2_path to it.
+
+    select_image, if given, is called with the drive once it is up and
+    returns the path actually written.
+    """
     # Step 1: Check if drive already exists
     drive = find_uf2_drive()
     if drive:
@@ -312,11 +946,10 @@ def upload_uf2(uf2_path, serial_port=None, timeout=UF2_DRIVE_TIMEOUT):
         # Step 2: Try serial trigger
         if serial_port:
             print(f"  Triggering bootloader via {serial_port}...")
-            trigger_bootloader(serial_port)
+            triggers = trigger_bootloaders([serial_port])
         else:
             print("  Attempting serial bootloader trigger...")
-            for candidate in _detect_serial_ports():
-                trigger_bootloader(candidate)
+            triggers = trigger_bootloaders(_detect_serial_ports())
 
         # Step 3: Wait for drive
         print(f"  Waiting for UF2 drive (double-tap RESET if needed, "
@@ -324,13 +957,19 @@ def upload_uf2(uf2_path, serial_port=None, timeout=UF2_DRIVE_TIMEOUT):
         sys.stdout.flush()
 
         drive = wait_for_uf2_drive(timeout)
+        drive_seen = time.time()
         if not drive:
             print("\nError: UF2 drive not found.")
             print(f"  Please double-tap the RESET button on your board "
                   f"to enter bootloader mode.")
             print(f"  The drive should appear as '{UF2_VOLUME_LABEL}'.")
+            report_triggers(triggers)
             return False
         print(f"\n  Found UF2 drive: {drive}")
+        report_triggers(triggers, [drive_seen])
+
+    if select_image:
+        uf2_path = select_image(drive)
 
     # Step 4: Write .uf2 file (try raw I/O first, fallback to OS command)
     print("  Writing firmware...")
@@ -355,12 +994,87 @@ def upload_uf2(uf2_path, serial_port=None, timeout=UF2_DRIVE_TIMEOUT):
     return False
 
 
-def _detect_serial_ports():
-    """Auto-detect available serial ports."""
+def upload_uf2_multi(uf2_path, count=None, timeout=UF2_DRIVE_TIMEOUT):
+    """Flash every connected board (or exactly count boards) concurrently.
+
+    Triggers the bootloader on all serial ports in parallel, waits for the
+    UF2 drives, then writes one shared in-memory copy of the image to all of
+    them from a thread per drive.
+
+    Returns:
+        True if every board was flashed (and count boards were found)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not os.path.isfile(uf2_path):
+        print(f"Error: UF2 file not found: {uf2_path}")
+        return False
+    with open(uf2_path, "rb") as f:
+        data = f.read()
+    name = os.path.basename(uf2_path)
+
+    print(f"UF2 Upload (multi-board): {uf2_path}")
+    print(f"  Volume label: {UF2_VOLUME_LABEL}")
+    print(f"  Firmware size: {len(data)} bytes")
+
+    drives = find_uf2_drives()
+    if not count or len(drives) < count:
+        ports = _detect_serial_ports()
+        print(f"  Triggering bootloader on {len(ports)} port(s)...")
+        triggers = trigger_bootloaders(ports)
+        target = f"{count}" if count else "all"
+        print(f"  Waiting for UF2 drives ({target}, timeout {timeout}s)...",
+              end="")
+        sys.stdout.flush()
+        seen = dict.fromkeys(drives)
+        drives = wait_for_uf2_drives(count, timeout, seen=seen)
+        print()
+        report_triggers(
+            triggers, [t for t in seen.values() if t is not None])
+    if count:
+        drives = drives[:count]
+    if not drives:
+        print("Error: no UF2 drives found.")
+        return False
+    print(f"  Writing firmware to {len(drives)} drive(s)...")
+
+    def flash(drive):
+        started = time.time()
+        ok, error = write_uf2_data(data, name, drive)
+        return drive, ok, error, time.time() - started
+
+    with ThreadPoolExecutor(max_workers=len(drives)) as pool:
+        results = list(pool.map(flash, drives))
+
+    failed = 0
+    for drive, ok, error, elapsed in results:
+        status = "OK" if ok else f"FAILED ({error})"
+        print(f"  {drive}: {status} in {elapsed:.2f}s")
+        failed += not ok
+    print(f"  {len(results) - failed} of {len(results)} board(s) flashed.")
+    if count and len(drives) < count:
+        print(f"Error: expected {count} boards, found {len(drives)}.")
+        return False
+    return failed == 0
+
+
+def _detect_serial_ports(hwids=None):
+    """Auto-detect serial ports, keeping only the board's USB VID:PID.
+
+    hwids defaults to board_hwids(). When no port matches (or the USB ids
+    cannot be read) every port is returned, as before.
+    """
+    if hwids is None:
+        hwids = board_hwids()
     ports = []
     try:
         import serial.tools.list_ports
-        for info in serial.tools.list_ports.comports():
+        infos = list(serial.tools.list_ports.comports())
+        matching = [info.device for info in infos
+                    if (info.vid, info.pid) in hwids]
+        if matching:
+            return matching
+        for info in infos:
             ports.append(info.device)
     except Exception:
         if platform.system() == "Linux":
@@ -405,23 +1119,54 @@ def main():
         "--trigger-only", action="store_true",
         help="Only trigger bootloader, do not upload"
     )
+    parser.add_argument(
+        "--hwid", action="append", default=None, metavar="VID:PID",
+        help="USB id of ports to trigger (default: from boards/*.json)"
+    )
+    parser.add_argument(
+        "--all", action="store_true",
+        help="Flash every board whose UF2 drive appears, concurrently"
+    )
+    parser.add_argument(
+        "--count", type=int, default=None, metavar="N",
+        help="Flash N boards concurrently; fail if fewer drives appear"
+    )
+    parser.add_argument(
+        "--baseline-dir", default=None,
+        help="Remember flashed images here and only write changed pages"
+    )
+    parser.add_argument(
+        "--delta-page", type=lambda x: int(x, 0),
+        default=uf2conv.UF2_PAYLOAD_SIZE,
+        help="Page size compared for delta uploads; use the flash erase "
+             f"size (default: {uf2conv.UF2_PAYLOAD_SIZE})"
+    )
+    parser.add_argument(
+        "--board-serial", default=None,
+        help="USB serial number of the board, for delta uploads "
+             "(default: read from --port)"
+    )
 
     args = parser.parse_args()
 
     if args.label:
         set_volume_label(args.label)
+    if args.hwid:
+        set_hwids(hwid.split(":") for hwid in args.hwid)
 
     if args.trigger_only:
-        if args.port:
-            print(f"Triggering bootloader via {args.port}...")
-            trigger_bootloader(args.port)
-        else:
-            for port in _detect_serial_ports():
-                print(f"Trying {port}...")
-                trigger_bootloader(port)
+        ports = [args.port] if args.port else _detect_serial_ports()
+        print(f"Triggering bootloader via {', '.join(ports) or 'no ports'}...")
+        report_triggers(trigger_bootloaders(ports))
         return
 
-    success = upload_uf2(args.uf2_file, args.port or None, args.timeout)
+    if args.all or args.count:
+        success = upload_uf2_multi(args.uf2_file, args.count, args.timeout)
+        sys.exit(0 if success else 1)
+
+    success = upload_uf2(args.uf2_file, args.port or None, args.timeout,
+                         args.baseline_dir, args.delta_page,
+                         args.board_serial or None)
     sys.exit(0 if success else 1)
 
 
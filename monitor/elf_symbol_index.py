@@ -0,0 +1,553 @@
+# SPDX-License-Identifier: Apache-2.0
+"""
+In-process ELF symbol index for the exception decoder monitor filter.
+
+Parses an ELF's function symbols (.symtab) and DWARF line table (.debug_line,
+versions 2-5) once into sorted, array-backed tables; an address lookup is then
+two bisects. No toolchain is needed, so decoding works for every XIAO board
+(Xtensa/RISC-V ESP32, and Cortex-M nRF, STM32C5, SAMD, RP2040) as soon as the
+firmware ELF exists.
+
+The index is persisted next to the firmware as ``<elf>.symidx`` and keyed by
+the ELF's sha256, so reconnecting the monitor to an unchanged build does not
+parse DWARF again.
+
+Not covered (addr2line remains the richer backend): inlined-call chains
+and the compilation directory (.debug_info) - DWARF < 5 paths of project
+sources therefore stay relative to the build directory - plus C++
+demangling and compressed debug sections.
+
+Interface:
+    ElfSymbolizer().resolve(elf_path, ["0x400d1234", ...])
+        -> {"0x400d1234": "app_main at /src/main.c:12", ...}
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import struct
+from array import array
+
+INDEX_SUFFIX = ".symidx"
+INDEX_MAGIC = b"XIAOSYMIDX1\n"
+
+UNKNOWN = "?? ??:0"
+
+EM_ARM = 40
+
+SHT_SYMTAB = 2
+SHF_EXECINSTR = 0x4
+SHF_COMPRESSED = 0x800
+STT_FUNC = 2
+
+# DWARF line-table constants
+DW_LNS_copy = 1
+DW_LNS_advance_pc = 2
+DW_LNS_advance_line = 3
+DW_LNS_set_file = 4
+DW_LNS_const_add_pc = 8
+DW_LNS_fixed_advance_pc = 9
+DW_LNE_end_sequence = 1
+DW_LNE_set_address = 2
+DW_LNE_define_file = 3
+DW_LNCT_path = 1
+DW_LNCT_directory_index = 2
+
+DW_FORM_block = 0x09
+DW_FORM_block1 = 0x0A
+DW_FORM_data1 = 0x0B
+DW_FORM_data2 = 0x05
+DW_FORM_data4 = 0x06
+DW_FORM_data8 = 0x07
+DW_FORM_data16 = 0x1E
+DW_FORM_string = 0x08
+DW_FORM_strp = 0x0E
+DW_FORM_udata = 0x0F
+DW_FORM_line_strp = 0x1F
+
+
+class ElfFormatError(ValueError):
+    pass
+
+
+class _Reader(object):
+    def __init__(self, data, little_endian, offset=0):
+        self.data = data
+        self.pos = offset
+        self.endian = "<" if little_endian else ">"
+
+    def unpack(self, fmt):
+        fmt = self.endian + fmt
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def u8(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def s8(self):
+        value = self.u8()
+        return value - 0x100 if value & 0x80 else value
+
+    def uint(self, size):
+        return self.unpack({1: "B", 2: "H", 4: "I", 8: "Q"}[size])[0]
+
+    def uleb(self):
+        result = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return result
+
+    def sleb(self):
+        result = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                if byte & 0x40:
+                    result -= 1 << shift
+                return result
+
+    def cstr(self):
+        end = self.data.index(b"\0", self.pos)
+        value = bytes(self.data[self.pos:end]).decode("utf-8", "replace")
+        self.pos = end + 1
+        return value
+
+
+def _cstr_at(data, offset):
+    if data is None or offset >= len(data):
+        return ""
+    end = data.index(b"\0", offset)
+    return bytes(data[offset:end]).decode("utf-8", "replace")
+
+
+class _Elf(object):
+    def __init__(self, data):
+        if data[:4] != b"\x7fELF":
+            raise ElfFormatError("not an ELF file")
+        self.data = data
+        self.is64 = data[4] == 2
+        self.little_endian = data[5] == 1
+        r = _Reader(data, self.little_endian, 16)
+        if self.is64:
+            _, self.machine, _, _, _, shoff, _, _, _, _, shentsize, shnum, shstrndx = r.unpack(
+                "HHIQQQIHHHHHH")
+            sh_fmt = "IIQQQQIIQQ"
+        else:
+            _, self.machine, _, _, _, shoff, _, _, _, _, shentsize, shnum, shstrndx = r.unpack(
+                "HHIIIIIHHHHHH")
+            sh_fmt = "IIIIIIIIII"
+
+        self.sections = []
+        for index in range(shnum):
+            sr = _Reader(data, self.little_endian, shoff + index * shentsize)
+            name, sh_type, flags, addr, offset, size, link, _, _, entsize = sr.unpack(sh_fmt)
+            self.sections.append({
+                "name_off": name, "type": sh_type, "flags": flags, "addr": addr,
+                "offset": offset, "size": size, "link": link, "entsize": entsize,
+            })
+        names = self.section_data(self.sections[shstrndx]) if shnum else None
+        for section in self.sections:
+            section["name"] = _cstr_at(names, section["name_off"])
+
+    def section_data(self, section):
+        if section["type"] == 8:  # SHT_NOBITS
+            return None
+        return self.data[section["offset"]:section["offset"] + section["size"]]
+
+    def find(self, name):
+        for section in self.sections:
+            if section["name"] == name:
+                if section["flags"] & SHF_COMPRESSED:
+                    return None
+                return self.section_data(section)
+        return None
+
+    def exec_ranges(self):
+        return sorted(
+            (s["addr"], s["addr"] + s["size"]) for s in self.sections
+            if s["flags"] & SHF_EXECINSTR and s["size"]
+        )
+
+    def functions(self):
+        """Yield (start, size, name) for every STT_FUNC symbol."""
+        thumb_mask = ~1 if self.machine == EM_ARM else ~0
+        for section in self.sections:
+            if section["type"] != SHT_SYMTAB:
+                continue
+            strtab = self.section_data(self.sections[section["link"]])
+            data = self.section_data(section)
+            entsize = section["entsize"] or (24 if self.is64 else 16)
+            fmt = "IBBHQQ" if self.is64 else "IIIBBH"
+            for offset in range(0, len(data) - entsize + 1, entsize):
+                r = _Reader(data, self.little_endian, offset)
+                if self.is64:
+                    name, info, _, shndx, value, size = r.unpack(fmt)
+                else:
+                    name, value, size, info, _, shndx = r.unpack(fmt)
+                if info & 0xF != STT_FUNC or shndx == 0:
+                    continue
+                yield value & thumb_mask, size, _cstr_at(strtab, name)
+
+
+def _parse_entry_formats(r):
+    count = r.u8()
+    return [(r.uleb(), r.uleb()) for _ in range(count)]
+
+
+def _read_form(r, form, offset_size, debug_str, debug_line_str):
+    if form == DW_FORM_string:
+        return r.cstr()
+    if form == DW_FORM_line_strp:
+        return _cstr_at(debug_line_str, r.uint(offset_size))
+    if form == DW_FORM_strp:
+        return _cstr_at(debug_str, r.uint(offset_size))
+    if form == DW_FORM_udata:
+        return r.uleb()
+    if form in (DW_FORM_data1, DW_FORM_data2, DW_FORM_data4, DW_FORM_data8):
+        return r.uint({DW_FORM_data1: 1, DW_FORM_data2: 2, DW_FORM_data4: 4,
+                       DW_FORM_data8: 8}[form])
+    if form == DW_FORM_data16:
+        r.pos += 16
+        return None
+    if form in (DW_FORM_block, DW_FORM_block1):
+        length = r.uleb() if form == DW_FORM_block else r.u8()
+        r.pos += length
+        return None
+    raise ElfFormatError("unsupported DWARF form 0x%x in line table header" % form)
+
+
+def _join_path(directory, name):
+    if not directory or name.startswith("/") or (len(name) > 1 and name[1] == ":"):
+        return name
+    sep = "\\" if "\\" in directory and "/" not in directory else "/"
+    return directory.rstrip("/\\") + sep + name
+
+
+def _parse_line_units(elf, add_row, file_id):
+    """Run every line-number program in .debug_line, calling add_row(addr, file, line)
+    for each row and add_row(addr, None, 0) for every end of sequence."""
+    data = elf.find(".debug_line")
+    if data is None:
+        return
+    debug_str = elf.find(".debug_str")
+    debug_line_str = elf.find(".debug_line_str")
+    r = _Reader(data, elf.little_endian)
+
+    while r.pos < len(data):
+        unit_length = r.uint(4)
+        offset_size = 4
+        if unit_length == 0xFFFFFFFF:
+            unit_length = r.uint(8)
+            offset_size = 8
+        unit_end = r.pos + unit_length
+        version = r.uint(2)
+        if version < 2 or version > 5:
+            r.pos = unit_end
+            continue
+        address_size = 8 if elf.is64 else 4
+        if version >= 5:
+            address_size = r.u8()
+            r.u8()  # segment_selector_size
+        header_length = r.uint(offset_size)
+        program_start = r.pos + header_length
+        min_inst_length = r.u8()
+        if version >= 4:
+            r.u8()  # maximum_operations_per_instruction (VLIW only)
+        r.u8()  # default_is_stmt
+        line_base = r.s8()
+        line_range = r.u8()
+        opcode_base = r.u8()
+        opcode_lengths = [r.u8() for _ in range(opcode_base - 1)]
+
+        if version >= 5:
+            dir_formats = _parse_entry_formats(r)
+            directories = []
+            for _ in range(r.uleb()):
+                path = ""
+                for content, form in dir_formats:
+                    value = _read_form(r, form, offset_size, debug_str, debug_line_str)
+                    if content == DW_LNCT_path:
+                        path = value
+                # Entry 0 is the compilation directory; the others may be
+                # relative to it.
+                directories.append(_join_path(directories[0], path) if directories else path)
+            file_formats = _parse_entry_formats(r)
+            files = []
+            for _ in range(r.uleb()):
+                path, dir_index = "", 0
+                for content, form in file_formats:
+                    value = _read_form(r, form, offset_size, debug_str, debug_line_str)
+                    if content == DW_LNCT_path:
+                        path = value
+                    elif content == DW_LNCT_directory_index:
+                        dir_index = value
+                directory = directories[dir_index] if dir_index < len(directories) else ""
+                files.append(_join_path(directory, path))
+        else:
+            directories = [""]
+            while True:
+                path = r.cstr()
+                if not path:
+                    break
+                directories.append(path)
+            files = [""]  # DWARF < 5 file numbers are 1-based
+            while True:
+                path = r.cstr()
+                if not path:
+                    break
+                dir_index = r.uleb()
+                r.uleb()
+                r.uleb()
+                directory = directories[dir_index] if dir_index < len(directories) else ""
+                files.append(_join_path(directory, path))
+
+        file_ids = [file_id(path) for path in files]
+        r.pos = program_start
+        const_add = ((255 - opcode_base) // line_range) * min_inst_length if line_range else 0
+
+        address, file_index, line = 0, 1, 1
+        while r.pos < unit_end:
+            opcode = r.u8()
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                address += (adjusted // line_range) * min_inst_length
+                line += line_base + adjusted % line_range
+                add_row(address, file_ids[file_index] if file_index < len(file_ids) else -1, line)
+            elif opcode == 0:
+                length = r.uleb()
+                sub_end = r.pos + length
+                sub = r.u8() if length else 0
+                if sub == DW_LNE_end_sequence:
+                    add_row(address, None, 0)
+                    address, file_index, line = 0, 1, 1
+                elif sub == DW_LNE_set_address:
+                    address = r.uint(min(length - 1, address_size) or address_size)
+                elif sub == DW_LNE_define_file:
+                    path = r.cstr()
+                    dir_index = r.uleb()
+                    directory = directories[dir_index] if dir_index < len(directories) else ""
+                    file_ids.append(file_id(_join_path(directory, path)))
+                r.pos = sub_end
+            elif opcode == DW_LNS_copy:
+                add_row(address, file_ids[file_index] if file_index < len(file_ids) else -1, line)
+            elif opcode == DW_LNS_advance_pc:
+                address += r.uleb() * min_inst_length
+            elif opcode == DW_LNS_advance_line:
+                line += r.sleb()
+            elif opcode == DW_LNS_set_file:
+                file_index = r.uleb()
+            elif opcode == DW_LNS_const_add_pc:
+                address += const_add
+            elif opcode == DW_LNS_fixed_advance_pc:
+                address += r.uint(2)
+            else:
+                for _ in range(opcode_lengths[opcode - 1]):
+                    r.uleb()
+        r.pos = unit_end
+
+
+class ElfSymbolIndex(object):
+    """Sorted address tables for one ELF image."""
+
+    def __init__(self, elf_sha256, arm, sym_start, sym_end, sym_name,
+                 line_addr, line_file, line_no, files):
+        self.elf_sha256 = elf_sha256
+        self.arm = arm
+        self.sym_start = sym_start
+        self.sym_end = sym_end
+        self.sym_name = sym_name
+        self.line_addr = line_addr
+        self.line_file = line_file
+        self.line_no = line_no
+        self.files = files
+
+    @classmethod
+    def build(cls, data, elf_sha256):
+        elf = _Elf(data)
+
+        symbols = sorted(
+            (start, size, name) for start, size, name in elf.functions() if start
+        )
+        sym_start = array("Q", (s[0] for s in symbols))
+        # Hand-written assembly and crt objects often leave st_size at 0;
+        # like addr2line, let such a symbol cover up to the next one.
+        sym_end = array("Q", (
+            start + size if size
+            else (symbols[i + 1][0] if i + 1 < len(symbols) else start + 1)
+            for i, (start, size, _) in enumerate(symbols)
+        ))
+        sym_name = [s[2] for s in symbols]
+
+        files = []
+        file_ids = {}
+
+        def file_id(path):
+            index = file_ids.get(path)
+            if index is None:
+                index = file_ids[path] = len(files)
+                files.append(path)
+            return index
+
+        # Gather rows per sequence; sequences of functions discarded by
+        # --gc-sections keep address 0 and must not shadow real code there.
+        exec_ranges = elf.exec_ranges()
+        rows = []
+        sequence = []
+
+        def add_row(address, file_index, line):
+            if file_index is not None:
+                sequence.append((address, file_index, line))
+                return
+            if sequence and _in_ranges(exec_ranges, sequence[0][0]):
+                rows.extend(sequence)
+                rows.append((address, -1, 0))
+            del sequence[:]
+
+        _parse_line_units(elf, add_row, file_id)
+
+        # Stable sort: at equal addresses an end-of-sequence marker sorts
+        # before the rows of a sequence starting there, and the last row
+        # (the one addr2line reports) wins the bisect.
+        rows.sort(key=lambda row: (row[0], row[1] != -1))
+        return cls(
+            elf_sha256,
+            elf.machine == EM_ARM,
+            sym_start,
+            sym_end,
+            sym_name,
+            array("Q", (row[0] for row in rows)),
+            array("i", (row[1] for row in rows)),
+            array("I", (row[2] for row in rows)),
+            files,
+        )
+
+    def lookup(self, address):
+        """Return "func at file:line" for address, or UNKNOWN."""
+        if self.arm:
+            address &= ~1  # Thumb state bit of return addresses
+        func = None
+        index = bisect.bisect_right(self.sym_start, address) - 1
+        if index >= 0 and address < self.sym_end[index]:
+            func = self.sym_name[index]
+
+        location = None
+        index = bisect.bisect_right(self.line_addr, address) - 1
+        if index >= 0 and self.line_file[index] >= 0:
+            location = "%s:%d" % (self.files[self.line_file[index]], self.line_no[index])
+
+        if func is None and location is None:
+            return UNKNOWN
+        return "%s at %s" % (func or "??", location or "??:?")
+
+    # --- persistence -------------------------------------------------------
+
+    _ARRAYS = ("sym_start", "sym_end", "line_addr", "line_file", "line_no")
+
+    def save(self, path):
+        header = {
+            "elf_sha256": self.elf_sha256,
+            "arm": self.arm,
+            "sym_name": self.sym_name,
+            "files": self.files,
+            "arrays": [(name, getattr(self, name).typecode, len(getattr(self, name)))
+                       for name in self._ARRAYS],
+        }
+        tmp_path = "%s.tmp-%d" % (path, os.getpid())
+        with open(tmp_path, "wb") as fp:
+            fp.write(INDEX_MAGIC)
+            fp.write(json.dumps(header, separators=(",", ":")).encode("utf-8"))
+            fp.write(b"\n")
+            for name in self._ARRAYS:
+                getattr(self, name).tofile(fp)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, elf_sha256):
+        with open(path, "rb") as fp:
+            data = fp.read()
+        if not data.startswith(INDEX_MAGIC):
+            return None
+        header_end = data.index(b"\n", len(INDEX_MAGIC))
+        header = json.loads(data[len(INDEX_MAGIC):header_end].decode("utf-8"))
+        if header.get("elf_sha256") != elf_sha256:
+            return None
+        arrays = {}
+        view = memoryview(data)[header_end + 1:]
+        for name, typecode, count in header["arrays"]:
+            values = array(typecode)
+            size = values.itemsize * count
+            values.frombytes(view[:size])
+            view = view[size:]
+            arrays[name] = values
+        return cls(elf_sha256, header["arm"], arrays["sym_start"], arrays["sym_end"],
+                   header["sym_name"], arrays["line_addr"], arrays["line_file"],
+                   arrays["line_no"], header["files"])
+
+
+def _in_ranges(ranges, address):
+    index = bisect.bisect_right(ranges, (address, float("inf"))) - 1
+    return index >= 0 and ranges[index][0] <= address < ranges[index][1]
+
+
+def load_or_build_index(elf_path):
+    """Return the ElfSymbolIndex for elf_path, reusing <elf>.symidx when its
+    ELF hash matches and rewriting it otherwise (best-effort)."""
+    with open(elf_path, "rb") as fp:
+        data = fp.read()
+    elf_sha256 = hashlib.sha256(data).hexdigest()
+    index_path = elf_path + INDEX_SUFFIX
+    try:
+        index = ElfSymbolIndex.load(index_path, elf_sha256)
+        if index is not None:
+            return index
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    index = ElfSymbolIndex.build(data, elf_sha256)
+    try:
+        index.save(index_path)
+    except OSError:
+        pass
+    return index
+
+
+class ElfSymbolizer(object):
+    """Resolve addresses from the persisted ELF index; same interface as
+    the addr2line coprocess backend of the exception decoder."""
+
+    def __init__(self):
+        self.firmware_key = None
+        self.index = None
+
+    def close(self):
+        self.index = None
+
+    def resolve(self, firmware_path, addresses):
+        st = os.stat(firmware_path)
+        key = (firmware_path, st.st_size, st.st_mtime_ns)
+        if key != self.firmware_key or self.index is None:
+            try:
+                self.index = load_or_build_index(firmware_path)
+            except (struct.error, IndexError) as e:
+                raise ValueError("malformed ELF %s: %s" % (firmware_path, e))
+            self.firmware_key = key
+
+        result = {}
+        for addr in addresses:
+            if not addr:
+                continue
+            try:
+                result[addr] = self.index.lookup(int(addr, 16))
+            except ValueError:
+                result[addr] = UNKNOWN
+        return result
@@ -12,10 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
 import os
 import re
 import subprocess
 import sys
+from collections import OrderedDict
 
 from platformio.exception import PlatformioException
 from platformio.public import (
@@ -23,14 +25,135 @@ from platformio.public import (
     load_build_metadata,
 )
 
+# The in-process ELF index lives next to this filter module.
+_HERE = os.path.dirname(os.path.abspath(__file__))
+if _HERE not in sys.path:
+    sys.path.insert(0, _HERE)
+
+from elf_symbol_index import ElfSymbolizer  # noqa: E402
+
 # By design, __init__ is called inside miniterm and we can't pass context to it.
 # pylint: disable=attribute-defined-outside-init
 
 IS_WINDOWS = sys.platform.startswith("win")
 
 
+class Addr2LineSymbolizer(object):
+    """Resolve addresses through one long-lived ``addr2line`` coprocess.
+
+    ``addr2line`` started without addresses reads them from stdin and flushes
+    every answer, so one process serves the whole monitor session and the ELF
+    is parsed once instead of once per frame. All uncached addresses of a
+    backtrace are written in one batch, followed by an address that never
+    resolves; its ``?? ??:0`` answer marks the end of the batch, because with
+    ``-i`` an address may produce any number of "(inlined by)" lines.
+
+    The coprocess and the LRU cache belong to one firmware build: when the
+    ELF is rebuilt (path, size or mtime change) both are replaced.
+    """
+
+    SENTINEL = 0xFFFFFFFF
+    CACHE_SIZE = 4096
+    ANSWER_RE = re.compile(r"^0x([0-9a-fA-F]+): (.*)$")
+
+    def __init__(self, addr2line_path, encoding):
+        self.addr2line_path = addr2line_path
+        self.encoding = encoding
+        self.proc = None
+        self.firmware_key = None
+        self.cache = OrderedDict()
+        atexit.register(self.close)
+
+    def close(self):
+        proc, self.proc = self.proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=1)
+        except Exception:  # pylint: disable=broad-except
+            proc.kill()
+
+    def _sync_firmware(self, firmware_path):
+        st = os.stat(firmware_path)
+        key = (firmware_path, st.st_size, st.st_mtime_ns)
+        if key == self.firmware_key and self.proc is not None and self.proc.poll() is None:
+            return
+        if key != self.firmware_key:
+            self.cache.clear()
+        self.close()
+        self.proc = subprocess.Popen(
+            [self.addr2line_path, u"-afipC", u"-e", firmware_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+        )
+        self.firmware_key = key
+
+    def _read_line(self):
+        line = self.proc.stdout.readline()
+        if not line:
+            raise OSError("%s exited unexpectedly" % self.addr2line_path)
+        return line.decode(self.encoding).rstrip("\r\n")
+
+    def resolve(self, firmware_path, addresses):
+        """Return {address: "func at file:line[\\n (inlined by) ...]"}.
+
+        Unresolvable addresses map to "?? ??:0", as with a plain addr2line call.
+        """
+        self._sync_firmware(firmware_path)
+
+        missing = []
+        for addr in addresses:
+            if not addr:
+                continue
+            if addr in self.cache:
+                self.cache.move_to_end(addr)
+            elif addr not in missing:
+                missing.append(addr)
+
+        if missing:
+            try:
+                request = "".join("%s\n" % addr for addr in missing)
+                request += "0x%x\n" % self.SENTINEL
+                self.proc.stdin.write(request.encode(self.encoding))
+                answers = self._read_answers(len(missing))
+            except (OSError, ValueError):
+                self.close()
+                raise
+            for addr, answer in zip(missing, answers):
+                self.cache[addr] = answer
+                if len(self.cache) > self.CACHE_SIZE:
+                    self.cache.popitem(last=False)
+
+        return {addr: self.cache[addr] for addr in addresses if addr in self.cache}
+
+    def _read_answers(self, count):
+        answers = []
+        while True:
+            line = self._read_line()
+            m = self.ANSWER_RE.match(line)
+            if m is None:
+                # "(inlined by)" continuation of the previous answer
+                if answers:
+                    answers[-1] += "\n" + line
+                continue
+            if len(answers) == count and int(m.group(1), 16) == self.SENTINEL:
+                return answers
+            answers.append(m.group(2))
+
+
 class Esp32ExceptionDecoder(DeviceMonitorFilterBase):
+    """Append symbolized frames to backtrace lines.
+
+    The backend is chosen with ``custom_exception_decoder_backend`` in the
+    project env: ``addr2line`` (toolchain coprocess), ``elf`` (in-process
+    ELF/DWARF index, no toolchain needed), or ``auto`` (default: addr2line
+    when the toolchain provides it, otherwise the ELF index).
+    """
+
     NAME = "esp32_exception_decoder"
+    BACKENDS = ("auto", "addr2line", "elf")
 
     ADDR_PATTERN = re.compile(r"((?:0x[0-9a-fA-F]{8}[: ]?)+)\s?$")
     ADDR_SPLIT = re.compile(r"[ :]")
@@ -41,6 +164,7 @@ class Esp32ExceptionDecoder(DeviceMonitorFilterBase):
 
         self.firmware_path = None
         self.addr2line_path = None
+        self.symbolizer = None
         self.enabled = self.setup_paths()
 
         if self.config.get("env:" + self.environment, "build_type") != "debug":
@@ -54,8 +178,22 @@ See https://docs.platformio.org/page/projectconf/build_configurations.html
 
         return self
 
+    def get_backend(self):
+        backend = self.config.get(
+            "env:" + self.environment, "custom_exception_decoder_backend", "auto"
+        )
+        backend = str(backend or "auto").strip().lower()
+        if backend not in self.BACKENDS:
+            sys.stderr.write(
+                "%s: unknown custom_exception_decoder_backend %r, using auto\n"
+                % (self.__class__.__name__, backend)
+            )
+            backend = "auto"
+        return backend
+
     def setup_paths(self):
         self.project_dir = os.path.abspath(self.project_dir)
+        backend = self.get_backend()
         try:
             data = load_build_metadata(self.project_dir, self.environment, cache=True)
 
@@ -68,10 +206,13 @@ See https://docs.platformio.org/page/projectconf/build_configurations.html
                 return False
 
             cc_path = data.get("cc_path", "")
-            if "-gcc" in cc_path:
+            if backend != "elf" and "-gcc" in cc_path:
                 path = cc_path.replace("-gcc", "-addr2line")
                 if os.path.isfile(path):
                     self.addr2line_path = path
+                    self.symbolizer = Addr2LineSymbolizer(
+                        path, "mbcs" if IS_WINDOWS else "utf-8"
+                    )
                     return True
         except PlatformioException as e:
             sys.stderr.write(
@@ -79,6 +220,9 @@ See https://docs.platformio.org/page/projectconf/build_configurations.html
                 % (self.__class__.__name__, e)
             )
             return False
+        if backend != "addr2line":
+            self.symbolizer = ElfSymbolizer()
+            return True
         sys.stderr.write(
             "%s: disabling, failed to find addr2line.\n" % self.__class__.__name__
         )
@@ -131,35 +275,32 @@ See https://docs.platformio.org/page/projectconf/build_configurations.html
         prefix = prefix_match.group(0) if prefix_match is not None else ""
 
         trace = ""
-        enc = "mbcs" if IS_WINDOWS else "utf-8"
-        args = [self.addr2line_path, u"-fipC", u"-e", self.firmware_path]
         try:
-            i = 0
-            for addr in addresses:
-                output = (
-                    subprocess.check_output(args + [addr])
-                    .decode(enc)
-                    .strip()
-                )
+            resolved = self.symbolizer.resolve(self.firmware_path, addresses)
+        except (OSError, ValueError) as e:
+            sys.stderr.write(
+                "%s: failed to resolve addresses with %s: %s\n"
+                % (self.__class__.__name__, self.addr2line_path or "ELF index", e)
+            )
+            return ""
 
-                # newlines happen with inlined methods
-                output = output.replace(
-                    "\n", "\n     "
-                )
+        i = 0
+        for addr in addresses:
+            output = resolved.get(addr, "?? ??:0")
 
-                # throw out addresses not from ELF
-                if output == "?? ??:0":
-                    continue
+            # throw out addresses not from ELF
+            if output == "?? ??:0":
+                continue
 
-                output = self.strip_project_dir(output)
-                trace += "%s  #%-2d %s in %s\n" % (prefix, i, addr, output)
-                i += 1
-        except subprocess.CalledProcessError as e:
-            sys.stderr.write(
-                "%s: failed to call %s: %s\n"
-                % (self.__class__.__name__, self.addr2line_path, e)
+            # newlines happen with inlined methods
+            output = output.replace(
+                "\n", "\n     "
             )
 
+            output = self.strip_project_dir(output)
+            trace += "%s  #%-2d %s in %s\n" % (prefix, i, addr, output)
+            i += 1
+
         return trace + "\n" if trace else ""
 
     def strip_project_dir(self, trace):
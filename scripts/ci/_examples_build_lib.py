@@ -3,11 +3,20 @@
 from __future__ import annotations
 
 import argparse
+import ast
+import configparser
+import hashlib
+import json
 import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
 
 
@@ -260,6 +269,7 @@ def run_build(
     verbose: bool,
     *,
     log_path: Path | None,
+    targets: tuple[str, ...] = (),
 ) -> int:
     cmd = ["platformio", "run", "-d", str(project_dir)]
 
@@ -269,6 +279,9 @@ def run_build(
     if env_name:
         cmd += ["-e", env_name]
 
+    for target in targets:
+        cmd += ["-t", target]
+
     # override_platform_to_local is handled via project_conf
 
     if verbose:
@@ -284,6 +297,664 @@ def run_build(
     return int(proc.returncode)
 
 
+def _parse_ini(ini_text: str) -> configparser.ConfigParser:
+    parser = configparser.ConfigParser(
+        inline_comment_prefixes=(";", "#"),
+        interpolation=None,
+        strict=False,
+    )
+    try:
+        parser.read_string(ini_text)
+    except configparser.Error:
+        pass
+    return parser
+
+
+def _env_option(parser: configparser.ConfigParser, env_name: str | None, option: str) -> str:
+    # Env sections inherit from the common [env] section, the same lookup
+    # order PlatformIO applies (``extends`` is not used by the examples).
+    for section in ((f"env:{env_name}",) if env_name else ()) + ("env",):
+        if parser.has_option(section, option):
+            return parser.get(section, option).strip()
+    return ""
+
+
+def _zephyr_package_by_board() -> dict[str, str]:
+    """Read platform.py's board -> Zephyr framework package map without importing it.
+
+    platform.py imports PlatformIO modules that are not available to these
+    scripts, so the literal dict is extracted with ``ast`` instead.
+    """
+    try:
+        tree = ast.parse((repo_root() / "platform.py").read_text(encoding="utf-8"))
+    except (OSError, SyntaxError):
+        return {}
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and any(isinstance(t, ast.Name) and t.id == "ZEPHYR_PACKAGE_BY_BOARD" for t in node.targets)
+        ):
+            try:
+                return dict(ast.literal_eval(node.value))
+            except ValueError:
+                return {}
+    return {}
+
+
+def _board_family(board: str) -> str:
+    # Mirrors the architecture selection in platform.py: boards of one family
+    # install and share the same framework/toolchain packages.
+    for token, family in (
+        ("esp32", "esp"),
+        ("ra4m1", "renesas"),
+        ("rp2", "rpi"),
+        ("nrf", "nrf"),
+        ("samd", "samd"),
+        ("mg24", "siliconlab"),
+        ("stm32", "stm32"),
+    ):
+        if token in board:
+            return family
+    return board
+
+
+def env_board_framework(ini_text: str, env_name: str | None) -> tuple[str, str]:
+    """Return the (board, primary framework) an env of platformio.ini selects."""
+    parser = _parse_ini(ini_text)
+    board = _env_option(parser, env_name, "board")
+    frameworks = [f.strip() for f in _env_option(parser, env_name, "framework").split(",") if f.strip()]
+    return board, (frameworks[0] if frameworks else "")
+
+
+def provisioning_key(board: str, framework: str, zephyr_packages: dict[str, str]) -> str:
+    """Return the key of the framework package an env provisions when it builds.
+
+    Builds with the same key install into, patch, or copy into the same
+    package directory (e.g. every nRF54LM20 and STM32C5 Zephyr example shares
+    ``framework-zephyr-nrf54lm20``), so the parallel scheduler never lets two
+    of them provision it at the same time.
+    """
+    if framework == "zephyr" and board in zephyr_packages:
+        return f"zephyr:{zephyr_packages[board]}"
+    return f"{framework or '-'}:{_board_family(board) or '-'}"
+
+
+FIRMWARE_ARTIFACTS = ("firmware.uf2", "firmware.hex")
+# Written by the platform's `sizereport` target (builder/sizereport.py).
+SIZE_REPORT = "sizereport.json"
+# Targets that build the firmware and record its size report. Explicit -t
+# targets replace PlatformIO's defaults, so checkprogsize is listed to keep
+# upload.maximum_size enforced.
+SIZE_REPORT_TARGETS = ("checkprogsize", "buildprog", "sizereport")
+
+# Project-tree entries that are build output or CI scratch, never build input.
+_CACHE_IGNORED_NAMES = {".pio", ".git", ".vscode", "__pycache__", ".pio-ci.platformio.ini"}
+_CACHE_FORMAT = "1"
+_CACHE_MAX_AGE_DAYS = 14
+
+
+def _hash_paths(digest: "hashlib._Hash", base: Path, paths: list[Path]) -> None:
+    for path in paths:
+        if path.is_dir():
+            files = []
+            for dirpath, dirnames, filenames in os.walk(path):
+                # Prune build output in place so .pio/ is never walked.
+                dirnames[:] = [d for d in dirnames if d not in _CACHE_IGNORED_NAMES]
+                files += [Path(dirpath, f) for f in filenames if f not in _CACHE_IGNORED_NAMES]
+            files.sort()
+        elif path.is_file():
+            files = [path]
+        else:
+            digest.update(f"missing:{path.relative_to(base).as_posix()}\0".encode())
+            continue
+        for file in files:
+            digest.update(file.relative_to(base).as_posix().encode() + b"\0")
+            with file.open("rb") as fp:
+                for chunk in iter(lambda: fp.read(1 << 16), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+
+
+def _built_env_dir(project_dir: Path, env_name: str | None) -> Path | None:
+    """The ``.pio/build`` directory of an env, preferring one with firmware."""
+    build_root = project_dir / ".pio" / "build"
+    if env_name:
+        candidates = [build_root / env_name]
+    elif build_root.is_dir():
+        candidates = sorted(p for p in build_root.glob("*") if p.is_dir())
+    else:
+        candidates = []
+    return next(
+        (d for d in candidates if any((d / name).is_file() for name in FIRMWARE_ARTIFACTS)),
+        candidates[0] if candidates else None,
+    )
+
+
+class SizeTrend:
+    """Per-board table of example firmware sizes, compared with the last run.
+
+    Every successful env contributes the totals of its ``sizereport.json``
+    (flash = text + data, RAM = data + bss). ``write()`` keeps the last
+    ``history`` runs in ``<out_dir>/size-trend.json``, so restoring that
+    directory between CI runs (e.g. with actions/cache) turns the table into
+    a trend, and renders the table as ``size-trend.md``.
+    """
+
+    def __init__(self, out_dir: Path, history: int = 20) -> None:
+        self.out_dir = out_dir
+        self.history = history
+        self.rows: list[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, job: BuildJob) -> None:
+        build_dir = _built_env_dir(job.project_dir, job.env_name)
+        if build_dir is None:
+            return
+        try:
+            report = json.loads((build_dir / SIZE_REPORT).read_text(encoding="utf-8"))
+            totals = report["totals"]
+            row = {
+                "board": job.board or build_dir.name,
+                "example": job.label,
+                "flash": int(totals["text"]) + int(totals["data"]),
+                "ram": int(totals["data"]) + int(totals["bss"]),
+            }
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            print(f"(warn) no size report for {job.label}: {exc}", file=sys.stderr)
+            return
+        with self._lock:
+            self.rows.append(row)
+
+    def _load_runs(self) -> list[dict]:
+        try:
+            runs = json.loads((self.out_dir / "size-trend.json").read_text(encoding="utf-8"))["runs"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+        return runs if isinstance(runs, list) else []
+
+    @staticmethod
+    def _delta(value: int, previous: int | None) -> str:
+        if previous is None:
+            return "new"
+        return f"{value - previous:+d}" if value != previous else "0"
+
+    def render(self, previous: list[dict]) -> list[str]:
+        before = {(r["board"], r["example"]): r for r in previous}
+        lines: list[str] = []
+        for board in sorted({r["board"] for r in self.rows}):
+            rows = sorted((r for r in self.rows if r["board"] == board), key=lambda r: r["example"])
+            lines += [
+                f"### {board}",
+                "",
+                "| Example | Flash | \u0394 Flash | RAM | \u0394 RAM |",
+                "|---|---:|---:|---:|---:|",
+            ]
+            for r in rows:
+                old = before.get((board, r["example"]))
+                lines.append(
+                    f"| {r['example']} | {r['flash']} | {self._delta(r['flash'], old and old['flash'])} "
+                    f"| {r['ram']} | {self._delta(r['ram'], old and old['ram'])} |"
+                )
+            lines.append("")
+        return lines
+
+    def write(self) -> Path | None:
+        if not self.rows:
+            return None
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        runs = self._load_runs()
+        lines = self.render(runs[-1]["rows"] if runs else [])
+        runs = (runs + [{"time": int(time.time()), "rows": self.rows}])[-self.history:]
+        (self.out_dir / "size-trend.json").write_text(json.dumps({"runs": runs}), encoding="utf-8")
+        table = self.out_dir / "size-trend.md"
+        table.write_text("\n".join(["## Firmware size by board", ""] + lines), encoding="utf-8")
+        return table
+
+
+class BuildCache:
+    """Content-addressed store of successful example builds.
+
+    The key of a project/env covers everything the build reads from this
+    repository: the project tree (sources, ``platformio.ini``), the board
+    manifest, the platform manifest (and so every framework package version
+    in ``platform.json``), and the builder/platform files of the board family
+    and framework. A hit restores the cached ``firmware.uf2``/``firmware.hex``
+    into ``.pio/build/<env>`` so firmware collection works unchanged, and
+    ``platformio run`` is skipped.
+
+    Layout: ``<cache_dir>/<key[:2]>/<key>/{meta.json,firmware.*,sizereport.json}``.
+    With ``size_reports``, entries stored without a size report are misses.
+    """
+
+    def __init__(self, cache_dir: Path, size_reports: bool = False) -> None:
+        self.cache_dir = cache_dir
+        self.size_reports = size_reports
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._platform_digests: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def _platform_inputs(self, framework: str, family: str) -> list[Path]:
+        root = repo_root()
+        inputs = [
+            root / "platform.json",
+            root / "platform.py",
+            root / "builder" / "main.py",
+            root / "builder" / "sizedata.py",
+            root / "builder" / "elfsize.py",
+            root / "builder" / "sizereport.py",
+            root / "builder" / "tools",
+            root / "builder" / "board_build" / family,
+            root / "platform_cfg" / f"{family}_cfg.py",
+        ]
+        inputs += sorted((root / "builder" / "frameworks").glob(f"{framework or '*'}*.py"))
+        if framework == "zephyr":
+            inputs.append(root / "zephyr")
+        elif family == "esp":
+            # Arduino on ESP32 builds through the ESP-IDF integration as well.
+            inputs.append(root / "builder" / "frameworks" / "espidf.py")
+            inputs.append(root / "builder" / "build_lib")
+        return inputs
+
+    def _platform_digest(self, framework: str, family: str) -> str:
+        with self._lock:
+            cached = self._platform_digests.get((framework, family))
+        if cached is not None:
+            return cached
+        digest = hashlib.sha256()
+        _hash_paths(digest, repo_root(), self._platform_inputs(framework, family))
+        value = digest.hexdigest()
+        with self._lock:
+            self._platform_digests[(framework, family)] = value
+        return value
+
+    def key(self, job: BuildJob) -> str:
+        root = repo_root()
+        digest = hashlib.sha256()
+        digest.update(f"format={_CACHE_FORMAT}\0env={job.env_name or ''}\0".encode())
+        digest.update(self._platform_digest(job.framework, _board_family(job.board)).encode())
+        _hash_paths(digest, root, [root / "boards" / f"{job.board}.json", job.project_dir])
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def restore(self, job: BuildJob, key: str) -> bool:
+        entry = self._entry_dir(key)
+        meta_path = entry / "meta.json"
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if not any(name in meta["artifacts"] for name in FIRMWARE_ARTIFACTS):
+                raise KeyError("artifacts")
+            if self.size_reports and SIZE_REPORT not in meta["artifacts"]:
+                raise KeyError(SIZE_REPORT)
+            build_dir = job.project_dir / ".pio" / "build" / meta["build_dir"]
+            build_dir.mkdir(parents=True, exist_ok=True)
+            for name in meta["artifacts"]:
+                shutil.copy2(entry / name, build_dir / name)
+            # Refresh the entry's age so pruning keeps entries still in use.
+            os.utime(meta_path)
+        except (OSError, ValueError, KeyError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return False
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += float(meta.get("elapsed", 0.0))
+        return True
+
+    def store(self, job: BuildJob, key: str, elapsed: float) -> None:
+        build_dir = _built_env_dir(job.project_dir, job.env_name)
+        if build_dir is None:
+            return
+
+        entry = self._entry_dir(key)
+        staging = entry.with_name(f"{key}.tmp-{os.getpid()}-{threading.get_ident()}")
+        try:
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+            artifacts = []
+            for name in FIRMWARE_ARTIFACTS + (SIZE_REPORT,):
+                if (build_dir / name).is_file():
+                    shutil.copy2(build_dir / name, staging / name)
+                    artifacts.append(name)
+            if not any(name in artifacts for name in FIRMWARE_ARTIFACTS):
+                # Nothing to restore (e.g. ESP32 builds produce .bin only):
+                # a hit would skip the build and leave no firmware behind.
+                shutil.rmtree(staging, ignore_errors=True)
+                return
+            meta = {
+                "project": job.rel.as_posix(),
+                "env": job.env_name,
+                "build_dir": build_dir.name,
+                "artifacts": artifacts,
+                "elapsed": round(elapsed, 1),
+            }
+            (staging / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        except OSError as exc:  # best-effort; a cache failure never fails the build
+            print(f"(warn) failed to cache {job.label}: {exc}", file=sys.stderr)
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def prune(self, max_age_days: int = _CACHE_MAX_AGE_DAYS) -> None:
+        """Drop entries that no build has hit or stored for ``max_age_days``."""
+        cutoff = time.time() - max_age_days * 86400
+        for meta_path in self.cache_dir.glob("*/*/meta.json"):
+            try:
+                if meta_path.stat().st_mtime < cutoff:
+                    shutil.rmtree(meta_path.parent, ignore_errors=True)
+            except OSError:
+                pass
+
+    def summary(self) -> str:
+        return (
+            f"Build cache: {self.hits} hit(s), {self.misses} miss(es), "
+            f"~{self.saved_seconds:.0f}s of build time saved"
+        )
+
+
+@dataclass
+class BuildJob:
+    project_dir: Path
+    rel: Path
+    env_name: str | None
+    project_conf: Path | None
+    override: bool
+    log_path: Path | None
+    board: str
+    framework: str
+    provision_key: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.rel}::{self.env_name}" if self.env_name else str(self.rel)
+
+    @property
+    def failure_key(self) -> str:
+        return f"{self.rel}::{self.env_name}" if self.env_name else f"{self.rel} (default)"
+
+
+class _BuildResults:
+    def __init__(
+        self,
+        root: Path,
+        firmware_dir: Path | None,
+        tail_lines: int,
+        size_trend: SizeTrend | None = None,
+    ) -> None:
+        self.root = root
+        self.firmware_dir = firmware_dir
+        self.tail_lines = tail_lines
+        self.size_trend = size_trend
+        self.failures: list[str] = []
+        self.failure_logs: dict[str, Path] = {}
+        self.collected_firmware: list[Path] = []
+
+    def record(self, job: BuildJob, rc: int, *, show_tail: bool = True, keep_log: bool = True) -> None:
+        if rc != 0:
+            self.failures.append(f"{job.label} (exit {rc})")
+            if job.log_path is not None:
+                if keep_log:
+                    self.failure_logs[job.failure_key] = job.log_path
+                if show_tail and self.tail_lines > 0:
+                    tail = _read_tail_lines(job.log_path, self.tail_lines)
+                    if tail:
+                        print(f"\n--- tail ({self.tail_lines} lines) {job.log_path} ---", file=sys.stderr)
+                        for line in tail:
+                            print(line, file=sys.stderr)
+            return
+        if self.firmware_dir is not None:
+            dst = collect_firmware(job.project_dir, job.env_name, job.rel, self.firmware_dir)
+            if dst is not None:
+                self.collected_firmware.append(dst)
+        if self.size_trend is not None:
+            self.size_trend.add(job)
+
+    def summarize(self) -> int:
+        if self.firmware_dir is not None and self.collected_firmware:
+            boards: dict[str, int] = {}
+            for p in self.collected_firmware:
+                board = p.parent.name
+                boards[board] = boards.get(board, 0) + 1
+            try:
+                shown_dir = str(self.firmware_dir.relative_to(self.root))
+            except ValueError:
+                shown_dir = str(self.firmware_dir)
+            print(f"\nCollected {len(self.collected_firmware)} firmware file(s) into {shown_dir}")
+            for board in sorted(boards):
+                print(f"  {board}: {boards[board]}")
+        elif self.firmware_dir is not None:
+            print("\nNo firmware collected.", file=sys.stderr)
+
+        if self.size_trend is not None:
+            table = self.size_trend.write()
+            if table is not None:
+                print(f"\nFirmware size trend: {len(self.size_trend.rows)} env(s) -> {table}")
+
+        if self.failures:
+            print("\nBuild failures:", file=sys.stderr)
+            for item in self.failures:
+                print("-", item, file=sys.stderr)
+            if self.failure_logs:
+                print("\nFailure logs:", file=sys.stderr)
+                for key, path in sorted(self.failure_logs.items()):
+                    print(f"- {key}: {path}", file=sys.stderr)
+            return 1
+
+        print("\nAll selected example projects built successfully.")
+        return 0
+
+
+def _execute_job(
+    job: BuildJob,
+    verbose: bool,
+    cache: BuildCache | None,
+    targets: tuple[str, ...] = (),
+) -> tuple[int, bool]:
+    """Build one job, or restore it from the cache. Returns (exit code, cache hit)."""
+    key: str | None = None
+    if cache is not None:
+        key = cache.key(job)
+        if cache.restore(job, key):
+            message = f"(cache hit) {job.label}: restored build {key[:12]}, skipping platformio run"
+            if job.log_path is not None:
+                job.log_path.parent.mkdir(parents=True, exist_ok=True)
+                job.log_path.write_text(message + "\n", encoding="utf-8")
+            else:
+                print(message, flush=True)
+            return 0, True
+
+    started = time.monotonic()
+    rc = run_build(
+        job.project_dir,
+        env_name=job.env_name,
+        project_conf=job.project_conf,
+        override_platform_to_local=job.override,
+        verbose=verbose,
+        log_path=job.log_path,
+        targets=targets,
+    )
+    if cache is not None and key is not None and rc == 0:
+        cache.store(job, key, time.monotonic() - started)
+    return rc, False
+
+
+def _prepare_jobs(
+    projects: list[Path],
+    log_dir: Path | None,
+    override_confs: list[Path],
+) -> list[BuildJob]:
+    root = repo_root()
+    zephyr_packages = _zephyr_package_by_board()
+    jobs: list[BuildJob] = []
+    for project_dir in projects:
+        rel = project_dir.relative_to(root)
+        ini_text = (project_dir / "platformio.ini").read_text(encoding="utf-8", errors="replace")
+        override = should_override_platform(ini_text) and can_use_local_platform_override()
+        override_conf: Path | None = None
+        if override:
+            override_conf = write_override_project_conf(project_dir, ini_text, local_platform_spec())
+            override_confs.append(override_conf)
+        for env in extract_env_names(ini_text) or [None]:
+            board, framework = env_board_framework(ini_text, env)
+            log_path: Path | None = None
+            if log_dir is not None:
+                log_path = log_dir / _sanitize_filename(f"{rel}__{env or 'default'}.log")
+            jobs.append(
+                BuildJob(
+                    project_dir=project_dir,
+                    rel=rel,
+                    env_name=env,
+                    project_conf=override_conf,
+                    override=override,
+                    log_path=log_path,
+                    board=board,
+                    framework=framework,
+                    provision_key=provisioning_key(board, framework, zephyr_packages),
+                )
+            )
+    return jobs
+
+
+def _run_sequential(
+    projects: list[Path],
+    results: _BuildResults,
+    *,
+    verbose: bool,
+    log_dir: Path | None,
+    quiet: bool,
+    cache: BuildCache | None,
+    targets: tuple[str, ...],
+) -> None:
+    root = repo_root()
+    for project_dir in projects:
+        rel = project_dir.relative_to(root)
+        ini_text = (project_dir / "platformio.ini").read_text(encoding="utf-8", errors="replace")
+        override_confs: list[Path] = []
+        try:
+            jobs = _prepare_jobs([project_dir], log_dir, override_confs)
+
+            if not quiet:
+                print("\n=== Building", str(rel), "===", flush=True)
+                if should_override_platform(ini_text) and not jobs[0].override:
+                    print("(note) local platform override disabled on this host", flush=True)
+                elif jobs[0].override:
+                    print("(CI override) platform -> local repo", flush=True)
+
+            for job in jobs:
+                if not quiet and job.env_name:
+                    print(f"--- env: {job.env_name} ---", flush=True)
+                rc, _ = _execute_job(job, verbose, cache, targets)
+                results.record(job, rc)
+        finally:
+            for conf in override_confs:
+                safe_unlink(conf)
+
+
+def _run_parallel(
+    projects: list[Path],
+    results: _BuildResults,
+    *,
+    jobs: int,
+    verbose: bool,
+    log_dir: Path | None,
+    quiet: bool,
+    cache: BuildCache | None,
+    targets: tuple[str, ...],
+) -> None:
+    """Build every project/env concurrently on up to ``jobs`` workers.
+
+    Each worker thread only waits on its own ``platformio run`` process, so a
+    thread pool is enough to keep ``jobs`` builds running. Output always goes
+    to a per-build log file and is printed as one block when the build ends,
+    so lines from different builds never interleave.
+
+    The very first build runs alone (it installs the local platform), and the
+    first build of each provisioning key runs before any other build with that
+    key: that one provisions the shared framework package (packages, venv,
+    west modules, board copies) while the rest of its group waits.
+    """
+    capture_dir: Path | None = None
+    if log_dir is None:
+        capture_dir = Path(tempfile.mkdtemp(prefix="pio-ci-logs-"))
+
+    override_confs: list[Path] = []
+    try:
+        pending = _prepare_jobs(projects, log_dir or capture_dir, override_confs)
+        total = len(pending)
+        if not quiet:
+            print(f"\n=== Building {total} project env(s) with {jobs} parallel job(s) ===", flush=True)
+
+        provisioned: set[str] = set()
+        provisioning: dict[Future[tuple[int, bool]], str] = {}
+        running: dict[Future[tuple[int, bool]], tuple[BuildJob, float]] = {}
+        first_done = False
+        done_count = 0
+
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                for job in list(pending):
+                    if len(running) >= jobs or (not first_done and running):
+                        break
+                    key = job.provision_key
+                    if key not in provisioned and key in provisioning.values():
+                        continue
+                    pending.remove(job)
+                    future = pool.submit(_execute_job, job, verbose, cache, targets)
+                    running[future] = (job, time.monotonic())
+                    if key not in provisioned:
+                        provisioning[future] = key
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, started = running.pop(future)
+                    cached = False
+                    try:
+                        rc, cached = future.result()
+                    except Exception as exc:  # never lose the summary over one worker
+                        print(f"(warn) {job.label}: {exc}", file=sys.stderr)
+                        rc = -1
+                    if future in provisioning:
+                        key = provisioning.pop(future)
+                        # A cache hit provisioned nothing; the next build of
+                        # its group takes over that role.
+                        if not cached:
+                            provisioned.add(key)
+                    # Likewise the local platform is only installed by a
+                    # real build, so a cache hit does not release the others.
+                    if not cached:
+                        first_done = True
+                    done_count += 1
+
+                    if not quiet:
+                        status = "ok" if rc == 0 else f"FAILED (exit {rc})"
+                        elapsed = time.monotonic() - started
+                        print(
+                            f"\n=== [{done_count}/{total}] {job.label}: {status} in {elapsed:.0f}s ===",
+                            flush=True,
+                        )
+                        if capture_dir is not None and job.log_path is not None:
+                            # No --log-dir: replay the whole build log as one block.
+                            for line in _read_tail_lines(job.log_path, sys.maxsize):
+                                print(line)
+                            sys.stdout.flush()
+                    # A temporary capture log is deleted after the run, so it is
+                    # neither listed as a failure log nor tailed a second time.
+                    results.record(
+                        job,
+                        rc,
+                        show_tail=capture_dir is None or quiet,
+                        keep_log=capture_dir is None,
+                    )
+    finally:
+        for conf in override_confs:
+            safe_unlink(conf)
+        if capture_dir is not None:
+            shutil.rmtree(capture_dir, ignore_errors=True)
+
+
 def build_projects(
     projects: list[Path],
     *,
@@ -292,9 +963,10 @@ def build_projects(
     tail_lines: int,
     quiet: bool,
     firmware_out: str | None = None,
+    jobs: int = 1,
+    cache_dir: str | None = None,
+    size_trend: str | None = None,
 ) -> int:
-    failures: list[str] = []
-    failure_logs: dict[str, Path] = {}
     root = repo_root()
 
     resolved_log_dir: Path | None = None
@@ -306,119 +978,43 @@ def build_projects(
     if firmware_out:
         resolved_firmware_dir = (root / firmware_out).resolve()
         resolved_firmware_dir.mkdir(parents=True, exist_ok=True)
-    collected_firmware: list[Path] = []
-
-    for project_dir in projects:
-        rel = project_dir.relative_to(root)
-        ini_path = project_dir / "platformio.ini"
-        ini_text = ini_path.read_text(encoding="utf-8", errors="replace")
-        override = should_override_platform(ini_text) and can_use_local_platform_override()
-        envs = extract_env_names(ini_text)
-
-        override_conf: Path | None = None
-        try:
-            if override:
-                override_conf = write_override_project_conf(project_dir, ini_text, local_platform_spec())
 
-            if not quiet:
-                print("\n=== Building", str(rel), "===", flush=True)
-                if should_override_platform(ini_text) and not override:
-                    print("(note) local platform override disabled on this host", flush=True)
-                elif override:
-                    print("(CI override) platform -> local repo", flush=True)
-
-            if not envs:
-                log_path: Path | None = None
-                failure_key = f"{rel} (default)"
-                if resolved_log_dir is not None:
-                    log_name = _sanitize_filename(f"{rel}__default.log")
-                    log_path = resolved_log_dir / log_name
-                rc = run_build(
-                    project_dir,
-                    env_name=None,
-                    project_conf=override_conf,
-                    override_platform_to_local=override,
-                    verbose=verbose,
-                    log_path=log_path,
-                )
-                if rc != 0:
-                    failures.append(f"{rel} (exit {rc})")
-                    if log_path is not None:
-                        failure_logs[failure_key] = log_path
-                        if tail_lines > 0:
-                            tail = _read_tail_lines(log_path, tail_lines)
-                            if tail:
-                                print(f"\n--- tail ({tail_lines} lines) {log_path} ---", file=sys.stderr)
-                                for line in tail:
-                                    print(line, file=sys.stderr)
-                elif resolved_firmware_dir is not None:
-                    dst = collect_firmware(project_dir, None, rel, resolved_firmware_dir)
-                    if dst is not None:
-                        collected_firmware.append(dst)
-                continue
-
-            for env in envs:
-                if not quiet:
-                    print(f"--- env: {env} ---", flush=True)
-
-                log_path = None
-                failure_key = f"{rel}::{env}"
-                if resolved_log_dir is not None:
-                    log_name = _sanitize_filename(f"{rel}__{env}.log")
-                    log_path = resolved_log_dir / log_name
-                rc = run_build(
-                    project_dir,
-                    env_name=env,
-                    project_conf=override_conf,
-                    override_platform_to_local=override,
-                    verbose=verbose,
-                    log_path=log_path,
-                )
-                if rc != 0:
-                    failures.append(f"{rel}::{env} (exit {rc})")
-                    if log_path is not None:
-                        failure_logs[failure_key] = log_path
-                        if tail_lines > 0:
-                            tail = _read_tail_lines(log_path, tail_lines)
-                            if tail:
-                                print(f"\n--- tail ({tail_lines} lines) {log_path} ---", file=sys.stderr)
-                                for line in tail:
-                                    print(line, file=sys.stderr)
-                elif resolved_firmware_dir is not None:
-                    dst = collect_firmware(project_dir, env, rel, resolved_firmware_dir)
-                    if dst is not None:
-                        collected_firmware.append(dst)
-        finally:
-            if override_conf is not None:
-                safe_unlink(override_conf)
-
-    if resolved_firmware_dir is not None and collected_firmware:
-        boards: dict[str, int] = {}
-        for p in collected_firmware:
-            board = p.parent.name
-            boards[board] = boards.get(board, 0) + 1
-        try:
-            shown_dir = str(resolved_firmware_dir.relative_to(root))
-        except ValueError:
-            shown_dir = str(resolved_firmware_dir)
-        print(f"\nCollected {len(collected_firmware)} firmware file(s) into {shown_dir}")
-        for board in sorted(boards):
-            print(f"  {board}: {boards[board]}")
-    elif resolved_firmware_dir is not None:
-        print("\nNo firmware collected.", file=sys.stderr)
-
-    if failures:
-        print("\nBuild failures:", file=sys.stderr)
-        for item in failures:
-            print("-", item, file=sys.stderr)
-        if failure_logs:
-            print("\nFailure logs:", file=sys.stderr)
-            for key, path in sorted(failure_logs.items()):
-                print(f"- {key}: {path}", file=sys.stderr)
-        return 1
-
-    print("\nAll selected example projects built successfully.")
-    return 0
+    trend: SizeTrend | None = None
+    targets: tuple[str, ...] = ()
+    if size_trend:
+        trend = SizeTrend((root / size_trend).resolve())
+        targets = SIZE_REPORT_TARGETS
+
+    cache: BuildCache | None = None
+    if cache_dir:
+        cache = BuildCache((root / cache_dir).resolve(), size_reports=trend is not None)
+
+    results = _BuildResults(root, resolved_firmware_dir, tail_lines, trend)
+    if jobs > 1:
+        _run_parallel(
+            projects,
+            results,
+            jobs=jobs,
+            verbose=verbose,
+            log_dir=resolved_log_dir,
+            quiet=quiet,
+            cache=cache,
+            targets=targets,
+        )
+    else:
+        _run_sequential(
+            projects,
+            results,
+            verbose=verbose,
+            log_dir=resolved_log_dir,
+            quiet=quiet,
+            cache=cache,
+            targets=targets,
+        )
+    if cache is not None:
+        cache.prune()
+        print(f"\n{cache.summary()}")
+    return results.summarize()
 
 
 def make_argparser(description: str) -> argparse.ArgumentParser:
@@ -452,4 +1048,33 @@ def make_argparser(description: str) -> argparse.ArgumentParser:
             "Output layout: <dir>/<env>/<sanitized-project-path>.<ext>."
         ),
     )
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help=(
+            "Persistent build result cache (relative to repo root). Envs whose "
+            "sources, platformio.ini, board manifest and platform files are "
+            "unchanged restore their cached firmware instead of building."
+        ),
+    )
+    parser.add_argument(
+        "--size-trend",
+        default=None,
+        help=(
+            "Also run the platform's sizereport target and write a per-board "
+            "firmware size table of all built envs into this directory "
+            "(relative to repo root), compared with the run recorded there before."
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Build up to N project envs concurrently (default: 1). Output is "
+            "grouped per build; builds sharing a framework package wait until "
+            "the first of them has provisioned it."
+        ),
+    )
     return parser
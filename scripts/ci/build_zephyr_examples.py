@@ -39,6 +39,9 @@ def main(argv: list[str]) -> int:
         log_dir=args.log_dir,
         tail_lines=args.tail,
         quiet=args.quiet,
+        jobs=args.jobs,
+        cache_dir=args.cache_dir,
+        size_trend=args.size_trend,
         firmware_out=args.firmware_out,
     )
 